@@ -140,21 +140,21 @@ add_status(package_info["NAME"], get_nvr(), package_info["COMMIT"])
 
 
 def process_dir(broker, root, graph, context, inventory=None, parallel=False):
-    ctx, broker = initialize_broker(root, context=context, broker=broker)
-    log.debug("Processing %s with %s" % (root, ctx))
+    with get_pool(parallel, "insights-run-pool", {"max_workers": None}) as pool:
+        ctx, broker = initialize_broker(root, context=context, broker=broker, pool=pool)
+        log.debug("Processing %s with %s" % (root, ctx))
 
-    if isinstance(ctx, ClusterArchiveContext):
-        from .core.cluster import process_cluster
+        if isinstance(ctx, ClusterArchiveContext):
+            from .core.cluster import process_cluster
 
-        archives = [f for f in ctx.all_files if f.endswith(COMPRESSION_TYPES)]
-        return process_cluster(graph, archives, broker=broker, inventory=inventory)
+            archives = [f for f in ctx.all_files if f.endswith(COMPRESSION_TYPES)]
+            return process_cluster(graph, archives, broker=broker, inventory=inventory)
 
-    graph = dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
-    if parallel:
-        with get_pool(parallel, "insights-run-pool", {"max_workers": None}) as pool:
-            broker = dr.run_all(graph, broker, pool)
-    else:
-        broker = dr.run(graph, broker=broker)
+        graph = dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
+        if pool:
+            broker = dr.run_parallel(graph, broker, pool)
+        else:
+            broker = dr.run(graph, broker=broker)
     return broker
 
 
@@ -188,7 +188,7 @@ def _run(broker, graph=None, root=None, context=None, inventory=None, parallel=F
         graph = dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
         if parallel:
             with get_pool(parallel, "insights-run-pool", {"max_workers": None}) as pool:
-                dr.run_all(graph, broker, pool)
+                return dr.run_parallel(graph, broker, pool)
         else:
             return dr.run(graph, broker=broker)
 
@@ -241,7 +241,7 @@ def apply_default_enabled(config):
     for k in dr.ENABLED:
         dr.ENABLED[k] = default_enabled
 
-    enabled = defaultdict(lambda: default_enabled)
+    enabled = dr.EnabledMap(default_enabled)
     enabled.update(dr.ENABLED)
     dr.ENABLED = enabled
 
@@ -0,0 +1,244 @@
+"""
+Batch Analysis
+==============
+
+Evaluates the loaded components against many archives or extracted
+directories. Plugins are imported once by the calling process, and each archive
+is analyzed in a forked child that shares the imported modules and the
+compiled :class:`insights.core.dr.ExecutionPlan` copy-on-write, so the cost of
+``load_components`` is only paid once per batch.
+
+Each archive runs in its own process, so an archive that crashes its worker or
+runs past its timeout only costs that archive's result.
+
+.. code-block:: python
+
+    from insights import batch, dr, load_default_plugins
+
+    load_default_plugins()
+    dr.load_components("my_rules")
+
+    results = list(batch.process_archives(paths, max_in_flight=8, timeout=300))
+    results[0]        # <BatchResult /tmp/a.tar.gz ok 1.52s>
+    results[0].value  # {"my_rules.report": {...}} when results[0].ok
+    results[1].error  # the traceback, timeout, or crash when it's not ok
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+
+from insights import process_dir
+from insights.core import dr
+from insights.core.archives import extract, open_archive
+from insights.core.hydration import get_member_filter
+from insights.core.plugins import rule
+
+try:
+    from multiprocessing.connection import wait as _wait
+except ImportError:
+    _wait = None
+
+log = logging.getLogger(__name__)
+
+
+class BatchResult(object):
+    """
+    The outcome of analyzing one archive.
+
+    Attributes:
+        archive (str): the archive or directory that was analyzed.
+        value: whatever ``result_fn`` returned for the archive's broker.
+            ``None`` if the analysis failed.
+        error (str): ``None`` if the analysis succeeded. Otherwise the
+            traceback of the failure or a description of the timeout or crash.
+        elapsed (float): wall clock seconds spent on the archive.
+    """
+
+    def __init__(self, archive, value=None, error=None, elapsed=0.0):
+        self.archive = archive
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else "failed"
+        return "<BatchResult %s %s %.2fs>" % (self.archive, status, self.elapsed)
+
+
+def rule_results(broker):
+    """
+    The default ``result_fn`` of :func:`process_archives`. Returns a dictionary
+    of fully qualified rule name to the response the rule returned.
+    """
+    return dict((dr.get_name(c), v) for c, v in broker.get_by_type(rule).items())
+
+
+def _get_multiprocessing():
+    # Workers must be forked so they inherit the loaded components.
+    try:
+        return multiprocessing.get_context("fork")
+    except AttributeError:
+        return multiprocessing
+
+
+def _analyze(conn, archive, graph, result_fn, context, extract_archives=True, members=None, parser_cache=None):
+    try:
+        broker = dr.Broker()
+        broker.parser_cache = parser_cache
+        if os.path.isdir(archive):
+            broker = process_dir(broker, archive, graph, context)
+            value = result_fn(broker)
+        elif not extract_archives:
+            with open_archive(archive) as index:
+                broker = process_dir(broker, index, graph, context)
+                value = result_fn(broker)
+        else:
+            with extract(archive, members=members) as ex:
+                broker = process_dir(broker, ex.tmp_dir, graph, context)
+                value = result_fn(broker)
+        conn.send((value, None))
+    except BaseException:
+        conn.send((None, traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def _ready(conns, timeout):
+    if _wait is not None:
+        return _wait(conns, timeout)
+
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+        ready = [c for c in conns if c.poll(0.05)]
+        if ready or (deadline is not None and time.time() >= deadline):
+            return ready
+
+
+def process_archives(
+    archives,
+    components=None,
+    result_fn=rule_results,
+    max_in_flight=None,
+    timeout=None,
+    context=None,
+    extract_archives=True,
+    filter_members=False,
+    parser_cache=None,
+):
+    """
+    Analyzes many archives with the components that are already loaded.
+
+    Archives are taken from ``archives`` only as worker slots free up, so it
+    can be a generator over an arbitrarily long stream of paths. Results are
+    yielded in the order the archives finish.
+
+    Args:
+        archives (iterable): paths of archives or extracted directories.
+        components: the components to evaluate. Can be anything
+            :func:`insights.core.dr.run` accepts. Defaults to everything in
+            ``GROUPS.single``.
+        result_fn (callable): called with each archive's broker in the worker
+            while the archive's files still exist. Whatever it returns must be
+            picklable since it's sent back to the calling process. Defaults to
+            :func:`rule_results`. Use :class:`insights.core.serde.Hydration` in
+            a custom function to keep serialized brokers.
+        max_in_flight (int): the maximum number of archives analyzed at the
+            same time. Defaults to the number of CPUs.
+        timeout (float): seconds an archive may take before its worker is
+            killed. No timeout by default.
+        context (ExecutionContext): the context to use instead of detecting
+            one for each archive.
+        extract_archives (bool): extract each archive to a temporary
+            directory. When ``False`` the specs are read from the archive
+            members directly with :func:`insights.core.archives.open_archive`,
+            which saves unpacking the files no component reads.
+        filter_members (bool): only extract the archive members that the
+            datasources of the components can read, as selected by
+            :func:`insights.core.hydration.get_member_filter`.
+        parser_cache (ParserCache): a
+            :class:`insights.core.parser_cache.ParserCache` the parsers of
+            every archive are looked up in. Since each archive is analyzed in
+            its own process, it should keep the parsers in a directory.
+
+    Yields:
+        BatchResult: the outcome of each archive.
+    """
+    components = components or dr.COMPONENTS[dr.GROUPS.single]
+    graph = dr.determine_components(components)
+    # compile the plan before forking so every worker inherits it
+    dr.get_execution_plan(
+        dict((k, v) for k, v in graph.items() if k in dr.COMPONENTS[dr.GROUPS.single])
+    )
+
+    members = get_member_filter(graph) if filter_members else None
+
+    max_in_flight = max_in_flight or multiprocessing.cpu_count()
+    mp = _get_multiprocessing()
+    archives = iter(archives)
+    running = {}
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(running) < max_in_flight:
+                try:
+                    archive = next(archives)
+                except StopIteration:
+                    exhausted = True
+                    break
+                recv, send = mp.Pipe(duplex=False)
+                proc = mp.Process(
+                    target=_analyze,
+                    args=(send, archive, graph, result_fn, context, extract_archives, members, parser_cache),
+                )
+                proc.daemon = True
+                proc.start()
+                send.close()
+                running[recv] = (proc, archive, time.time())
+
+            if not running:
+                break
+
+            wait_for = None
+            if timeout is not None:
+                oldest = min(start for _, _, start in running.values())
+                wait_for = max(0, oldest + timeout - time.time())
+
+            for conn in _ready(list(running), wait_for):
+                proc, archive, start = running.pop(conn)
+                try:
+                    value, error = conn.recv()
+                except EOFError:
+                    value, error = None, None
+                    crashed = True
+                else:
+                    crashed = False
+                conn.close()
+                proc.join()
+                if crashed:
+                    error = "Worker exited with code %s" % proc.exitcode
+                yield BatchResult(archive, value, error, time.time() - start)
+
+            if timeout is not None:
+                now = time.time()
+                for conn, (proc, archive, start) in list(running.items()):
+                    if now - start >= timeout:
+                        del running[conn]
+                        proc.terminate()
+                        proc.join()
+                        conn.close()
+                        log.warning("Analysis of %s timed out after %s seconds", archive, timeout)
+                        error = "Timed out after %s seconds" % timeout
+                        yield BatchResult(archive, None, error, now - start)
+    finally:
+        for conn, (proc, _, _) in running.items():
+            proc.terminate()
+            proc.join()
+            conn.close()
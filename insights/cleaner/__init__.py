@@ -31,6 +31,7 @@ specs during collection according to the user configuration and specs setting.
 import logging
 import json
 import os
+import shutil
 import tempfile
 
 from insights.cleaner.filters import AllowFilter
@@ -41,12 +42,14 @@ from insights.cleaner.keyword import Keyword
 from insights.cleaner.mac import Mac
 from insights.cleaner.password import Password
 from insights.cleaner.pattern import Pattern
-from insights.cleaner.utilities import write_report
+from insights.cleaner.utilities import reverse_lines, write_report
+from insights.core.filters import FilterMatcher
 from insights.util.hostname import determine_hostname
 from insights.util.posix_regex import replace_posix
 
 logger = logging.getLogger(__name__)
 MAX_LINE_LENGTH = 1048576  # 1MB
+BUFFER_SIZE = 4194304  # 4MB
 DEFAULT_OBFUSCATIONS = {
     'hostname',
     'ipv4',
@@ -61,9 +64,14 @@ class Cleaner(object):
     """
     Class to clean the content of Specs according to the user configuration and
     spec setting.
+
+    A Cleaner can be shared by the workers of a parallel collection.  Pass
+    `parallel=True` in that case, so that the obfuscated IPv4 addresses are
+    derived from the original addresses with a key secret to this Cleaner,
+    instead of being assigned in the order the workers happen to find them.
     """
 
-    def __init__(self, config, rm_conf, fqdn=None):
+    def __init__(self, config, rm_conf, fqdn=None, parallel=False):
         self.report_dir = tempfile.gettempdir()
         self.rhsm_facts_file = getattr(
             config, 'rhsm_facts_file', os.path.join(self.report_dir, 'insights-client.facts')
@@ -92,21 +100,47 @@ class Cleaner(object):
         obfs = config.obfuscation_list if config else None
         if config and obfs:
             # - IPv4 obfuscation
-            self.obfuscate.update(ipv4=IPv4()) if 'ipv4' in obfs else None
+            ipv4_key = os.urandom(16) if parallel else None
+            self.obfuscate.update(ipv4=IPv4(ipv4_key)) if 'ipv4' in obfs else None
             # - IPv6 obfuscation
             self.obfuscate.update(ipv6=IPv6()) if 'ipv6' in obfs else None
             # - Hostname obfuscation
             self.obfuscate.update(hostname=Hostname(self.fqdn)) if 'hostname' in obfs else None
             # - MAC obfuscation
             self.obfuscate.update(mac=Mac()) if 'mac' in obfs else None
+        # - Redaction and obfuscation parsers per configuration
+        self._pipelines = dict()
 
-    def clean_content(self, lines, no_obfuscate=None, no_redact=False, allowlist=None, width=False):
+    def _get_pipeline(self, no_obfuscate, no_redact, width):
         """
-        Clean lines one by one according to the configuration.
+        Returns the redaction parsers and the obfuscation parsers to be applied
+        with the configuration.  They are built only once per configuration.
+        """
+        key = (frozenset(no_obfuscate or []), bool(no_redact), bool(width))
+        if key not in self._pipelines:
+            # 1. Redact when NO "no_redact=True" is set
+            redactors = []
+            if self.redact['pattern'] and not no_redact:
+                redactors.append((self.redact['pattern'], {}))
+            # 3. Obfuscation entries
+            # - Hostname
+            # - IPv4
+            # - IPv6
+            # - Keyword
+            # - Mac
+            # - Password
+            obfuscators = []
+            for obf in set(self.obfuscate.keys()) - set(no_obfuscate or []):
+                if self.obfuscate[obf]:
+                    obfuscators.append((self.obfuscate[obf], {'width': width}))
+            self._pipelines[key] = (redactors, obfuscators)
+        return self._pipelines[key]
 
-        For some extra large files, e.g. logs, we want to keep the bottom
-        part of them.  So the lines are processed in reverse order.  But the
-        processed result is returned in the original order.
+    def _get_line_cleaner(self, no_obfuscate, no_redact, allowlist, width, matcher):
+        """
+        Returns the function to clean a line according to the configuration,
+        and the copy of the `allowlist` that the filter counts down.  No more
+        lines can pass the filter once that copy is empty.
         """
 
         def _clean_line(line):
@@ -120,26 +154,34 @@ class Cleaner(object):
             return line
 
         # List of parsers to be applied with Order
-        parsers = list()
-        # 1. Redact when NO "no_redact=True" is set
-        if self.redact['pattern'] and not no_redact:
-            parsers.append((self.redact['pattern'], {})) if not no_redact else None
+        redactors, obfuscators = self._get_pipeline(no_obfuscate, no_redact, width)
+        parsers = list(redactors)
         # 2. Filter as per allowlist got from add_filter  # copy it to avoid write back
-        (
-            parsers.append((self.redact['allow_filter'], {'allowlist': dict(allowlist)}))
-            if allowlist is not None
-            else None
-        )
-        # 3. Obfuscation entries
-        # - Hostname
-        # - IPv4
-        # - IPv6
-        # - Keyword
-        # - Mac
-        # - Password
-        for obf in set(self.obfuscate.keys()) - set(no_obfuscate or []):
-            if self.obfuscate[obf]:
-                parsers.append((self.obfuscate[obf], {'width': width}))
+        if allowlist is not None:
+            matcher = matcher or FilterMatcher(allowlist)
+            allowlist = dict(allowlist)
+            parsers.append(
+                (self.redact['allow_filter'], {'allowlist': allowlist, 'matcher': matcher})
+            )
+        parsers.extend(obfuscators)
+        return _clean_line, allowlist
+
+    def clean_content(
+        self, lines, no_obfuscate=None, no_redact=False, allowlist=None, width=False, matcher=None
+    ):
+        """
+        Clean lines one by one according to the configuration.
+
+        For some extra large files, e.g. logs, we want to keep the bottom
+        part of them.  So the lines are processed in reverse order.  But the
+        processed result is returned in the original order.
+
+        The `matcher` is the compiled
+        :class:`insights.core.filters.FilterMatcher` of the `allowlist`, e.g.
+        the one got from `filters.get_matcher`.  It's compiled from the
+        `allowlist` when not passed.
+        """
+        _clean_line, _ = self._get_line_cleaner(no_obfuscate, no_redact, allowlist, width, matcher)
 
         # handle single string
         if not isinstance(lines, list):
@@ -157,43 +199,84 @@ class Cleaner(object):
         # All lines blank
         return []
 
-    def clean_file(self, _file, no_obfuscate=None, no_redact=False, allowlist=None):
+    def clean_file(self, _file, no_obfuscate=None, no_redact=False, allowlist=None, matcher=None):
         """
         Clean a file according to the configuration, the file will be updated
         directly with the cleaned content.
+
+        Same as `clean_content`, the lines are processed in reverse order.  The
+        file is read backward chunk by chunk, and the cleaned lines are kept
+        in memory up to `BUFFER_SIZE` only, the rest are spilled to a
+        temporary file.  The cleaned content is written to a temporary file in
+        the same directory, which then replaces the file.
         """
         logger.debug('Cleaning %s ...' % _file)
 
         if os.path.exists(_file) and not os.path.islink(_file):
-            # Process the file
-            raw_data = content = None
+            _clean_line, allowlist = self._get_line_cleaner(
+                no_obfuscate,
+                no_redact,
+                allowlist,
+                _file.endswith("netstat_-neopa"),
+                matcher,
+            )
+            dirname = os.path.dirname(os.path.abspath(_file))
+            # the cleaned lines in reverse order, and the lengths of the
+            # blocks of them spilled to the "spill" file in right order
+            lines, size, blocks = [], 0, []
+            spill = tmp_file = None
+            raw_data = content = False
             try:
-                with open(_file, 'r') as fh:
-                    raw_data = fh.readlines()
-                    content = self.clean_content(
-                        raw_data,
-                        no_obfuscate=no_obfuscate,
-                        no_redact=no_redact,
-                        allowlist=allowlist,
-                        width=_file.endswith("netstat_-neopa"),
-                    )
+                with open(_file, 'rb') as fh:
+                    for line in reverse_lines(fh):
+                        raw_data = True
+                        if allowlist is not None and not allowlist:
+                            # enough lines were found for all the filters,
+                            # only empty lines pass the filter then and the
+                            # lines read from file are never empty
+                            break
+                        line = _clean_line(line)
+                        if line is None:
+                            continue
+                        content = content or bool(line)
+                        lines.append(line)
+                        size += len(line)
+                        if size >= BUFFER_SIZE:
+                            spill = spill or tempfile.TemporaryFile(dir=dirname)
+                            data = ''.join(reversed(lines)).encode('utf-8')
+                            spill.write(data)
+                            blocks.append(len(data))
+                            lines, size = [], 0
             except Exception as e:  # pragma: no cover
                 logger.warning(e)
+                spill.close() if spill else None
                 raise Exception("Error: Cannot Open File for Cleaning: %s" % _file)
             # Store it
             try:
                 if raw_data:
                     if content:
-                        with open(_file, 'wb') as fh:
-                            for line in content:
-                                fh.write(line.encode('utf-8'))
+                        fd, tmp_file = tempfile.mkstemp(dir=dirname, prefix='.insights-clean-')
+                        with os.fdopen(fd, 'wb') as fh:
+                            fh.write(''.join(reversed(lines)).encode('utf-8'))
+                            # the spilled blocks were written from the bottom
+                            offset = spill.tell() if spill else 0
+                            for length in reversed(blocks):
+                                offset -= length
+                                spill.seek(offset)
+                                fh.write(spill.read(length))
+                        shutil.copymode(_file, tmp_file)
+                        os.rename(tmp_file, _file)
                     else:
                         # Remove Empty file
                         logger.debug('Removing %s, as it\'s empty after cleaning' % _file)
                         os.remove(_file)
             except Exception as e:  # pragma: no cover
                 logger.warning(e)
+                if tmp_file and os.path.exists(tmp_file):
+                    os.remove(tmp_file)
                 raise Exception("Error: Cannot Write to File: %s" % _file)
+            finally:
+                spill.close() if spill else None
 
     def generate_rhsm_facts(self):
         logger.info('Writing RHSM facts to %s ...', self.rhsm_facts_file)
@@ -5,6 +5,8 @@ Filtering
 
 import logging
 
+from insights.core.filters import FilterMatcher
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,7 +20,14 @@ class AllowFilter(object):
         if not line:
             return line
         allowlist = kwargs.get('allowlist', {})
-        if allowlist:
+        matcher = kwargs.get('matcher')
+        if allowlist and matcher:
+            a_key = matcher.first_match(line, allowlist)
+            if a_key is not None:
+                allowlist[a_key] -= 1
+                allowlist.pop(a_key) if allowlist[a_key] == 0 else None
+                return line
+        elif allowlist:
             for a_key in list(allowlist.keys()):  # copy keys to avoid RuntimeError
                 # keep line when any filter match
                 # FIXME:
@@ -34,7 +43,7 @@ class AllowFilter(object):
         pass  # pragma: no cover
 
     @staticmethod
-    def filter_content(lines, allowlist):
+    def filter_content(lines, allowlist, matcher=None):
         """
         Filter content based on allowlist.
 
@@ -48,21 +57,11 @@ class AllowFilter(object):
 
         :param lines: list of lines
         :param allowlist: dictionary of allowlist
+        :param matcher: the compiled :class:`FilterMatcher` of the allowlist,
+                        it's compiled from the allowlist when not passed
         :return: list of lines
         """
-        allowlist = dict(allowlist)  # copy it to avoid write back
-        result = []
-        for idx in range(len(lines) - 1, -1, -1):
-            for a_key in list(allowlist.keys()):  # copy keys to avoid RuntimeError
-                if a_key in lines[idx]:
-                    allowlist[a_key] -= 1
-                    # stop checking it when enough lines contain the key were found
-                    allowlist.pop(a_key) if allowlist[a_key] == 0 else None
-                    result.append(lines[idx])
-                    # stop checking other keys when one key is found
-                    # it's sometimes not fair to other keys, but it's
-                    # the best we can do for performance
-                    break
-        # Return the result in right order
-        result.reverse()
-        return result
+        if not allowlist:
+            return []
+        matcher = matcher or FilterMatcher(allowlist)
+        return matcher.filter(lines, allowlist)
@@ -34,6 +34,9 @@ class Hostname(object):
             if len(fqdn_split) <= 1
             else r'(?![\W\-\:\ \.])[a-zA-Z0-9\-\_\.]*\.{0}'.format('.'.join(fqdn_split[1:]))
         )
+        self._regex = re.compile(self.pattern) if self.pattern else None
+        # the first label of the domain must be in lines the pattern matches
+        self._domain_label = fqdn_split[1] if self.pattern else None
         self._hostname = fqdn_split[0]
         self._hn2db(fqdn)
 
@@ -59,8 +62,8 @@ class Hostname(object):
         if not line:
             return line
         try:
-            if self.pattern:
-                hostnames = [each for each in re.findall(self.pattern, line)]
+            if self._regex and self._domain_label in line:
+                hostnames = [each for each in self._regex.findall(line)]
                 for hn in hostnames:
                     new_hn = self._hn2db(hn)
                     logger.debug("Obfuscating FQDN - {0} > {1}".format(hn, new_hn))
@@ -12,11 +12,13 @@ IPv6 Obfuscation
 """
 
 import hashlib
+import hmac
 import logging
 import os
 import re
 import socket
 import struct
+import threading
 
 from insights.cleaner.utilities import write_report
 
@@ -26,15 +28,29 @@ logger = logging.getLogger(__name__)
 class IPv4(object):
     """
     Class for obfuscating IPv4.
+
+    By default, the obfuscated IPs are assigned in sequence from
+    "10.230.230.1" in the order the IPs are found.  When a `key` is given,
+    the obfuscated IP is derived from the keyed hash of the IP instead, so it
+    doesn't depend on the order in which parallel workers find the IPs.  The
+    derived IPs are in "240.0.0.0/4", which is reserved and isn't used by
+    real hosts, so they can't be mistaken for the IPs being obfuscated.
     """
 
-    def __init__(self):
+    def __init__(self, key=None):
         # - IP obfuscate information
         self._ip_db = dict()  # IP database
+        self._ip_index = dict()  # reversed IP database for lookups
+        self._lock = threading.Lock()  # lock for adding IPs to the database
+        self._key = key
         self._start_ip = '10.230.230.1'
+        self._next_ip = self._ip2int(self._start_ip)
+        self._derive_net = self._ip2int('240.0.0.0')
+        self._broadcast = self._ip2int('255.255.255.255')
         self._ignore_list = ["127.0.0.1"]
         # self.pattern = r'((?<!(\.|\d))([0-9]{1,3}\.){3}([0-9]){1,3}(\/([0-9]{1,2}))?)'
         self.pattern = r"(((\b25[0-5]|\b2[0-4][0-9]|\b1[0-9][0-9]|\b[1-9][0-9]|\b[1-9]))(\.(\b25[0-5]|\b2[0-4][0-9]|\b1[0-9][0-9]|\b[1-9][0-9]|\b[0-9])){3})"
+        self._regex = re.compile(self.pattern)
 
     def _ip2int(self, ipstr):
         # converts a dotted decimal IP address into an integer that can be incremented
@@ -52,22 +68,50 @@ class IPv4(object):
         {$obfuscated_ip: $original_ip,}
         '''
         ip_num = self._ip2int(ip)
-        ip_found = False
-        db = self._ip_db
-        for k, v in db.items():
-            if v == ip_num:
-                ret_ip = self._int2ip(k)
-                ip_found = True
-        if ip_found:  # the entry already existed
-            return ret_ip
-        else:  # the entry did not already exist
-            if len(self._ip_db) > 0:
-                new_ip = max(db.keys()) + 1
-            else:
-                new_ip = self._ip2int(self._start_ip)
-            db[new_ip] = ip_num
-
-            return self._int2ip(new_ip)
+        new_ip = self._ip_index.get(ip_num)
+        if new_ip is None:  # the entry did not already exist
+            with self._lock:
+                new_ip = self._ip_index.get(ip_num)
+                if new_ip is None:
+                    if self._key:
+                        new_ip = self._derive_ip(ip_num)
+                    else:
+                        new_ip = self._next_ip
+                        self._next_ip += 1
+                    self._ip_db[new_ip] = ip_num
+                    self._ip_index[ip_num] = new_ip
+        return self._int2ip(new_ip)
+
+    def _derive_ip(self, ip_num):
+        # derive an IP in 240.0.0.0/4 from the keyed hash of the IP and a
+        # counter, which only goes up in the rare case that the derived IP is
+        # taken or is one of the original IPs, so the retries depend on
+        # nothing but the IP
+        counter = 0
+        while True:
+            msg = struct.pack('!II', ip_num, counter)
+            digest = hmac.new(self._key, msg, hashlib.sha256).digest()
+            new_ip = self._derive_net | (struct.unpack('!I', digest[:4])[0] & 0xFFFFFFF)
+            if new_ip != self._broadcast and new_ip not in self._ip_db and new_ip not in self._ip_index:
+                return new_ip
+            counter += 1
+
+    def _spans(self, line, ips):
+        # the spans of the line to replace with the obfuscated IPs: longer IPs
+        # are found first, and the IPs are only found in the original line, so
+        # an obfuscated IP is never replaced again
+        spans = []
+        for ip in sorted(ips, key=len, reverse=True):
+            new_ip = ips[ip]
+            pos = line.find(ip)
+            while pos != -1:
+                end = pos + len(ip)
+                if any(pos < e and s < end for s, e, _ in spans):
+                    pos = line.find(ip, pos + 1)
+                else:
+                    spans.append((pos, end, new_ip))
+                    pos = line.find(ip, end)
+        return sorted(spans)
 
     def parse_line(self, line, **kwargs):
         '''
@@ -75,63 +119,51 @@ class IPv4(object):
         It scans a given line and if an IP exists, it obfuscates the IP using _ip2db and returns the altered line
         '''
 
-        def _sub_ip(line, ip):
-            new_ip = self._ip2db(ip)
-            logger.debug("Obfuscating IPv4 - %s > %s", ip, new_ip)
-            return line.replace(ip, new_ip)
-
-        def _sub_ip_keep_width(line, ip):
-            ip_len = len(ip)
-            new_ip = self._ip2db(ip)
-            new_ip_len = len(new_ip)
-            logger.debug("Obfuscating IPv4 - %s > %s", ip, new_ip)
-            # pad or remove spaces to allow for the new length
-            if ip_len > new_ip_len:
-                numspaces = ip_len - new_ip_len
-                line = line.replace(ip, new_ip)
-                # shift past port specification to add spaces
-                idx = line.index(new_ip) + new_ip_len
-                c = line[idx]
-                while c != " ":
-                    idx += 1
-                    if idx == len(line):
-                        idx = len(line) - 1
-                        break
-                    c = line[idx]
+        def _sub_ip_keep_width(line, start, end, new_ip):
+            line = line[:start] + new_ip + line[end:]
+            numspaces = (end - start) - len(new_ip)
+            if not numspaces:
+                return line
+            # shift past port specification to add or remove spaces
+            idx = start + len(new_ip)
+            while idx < len(line) and line[idx] != " ":
+                idx += 1
+            if numspaces > 0:
+                idx = min(idx, max(len(line) - 1, start + len(new_ip)))
                 return line[0:idx] + numspaces * " " + line[idx:]
-            elif new_ip_len > ip_len:
-                numspaces = new_ip_len - ip_len
-                line = line.replace(ip, new_ip)
-                # shift past port specification to skip spaces
-                idx = line.index(new_ip) + new_ip_len
-                c = line[idx]
-                while c != " ":
-                    idx += 1
-                    if idx == len(line):
-                        break
-                    c = line[idx]
-                return line[0:idx] + line[(idx + numspaces) :]
-            else:
-                return line.replace(ip, new_ip)
+            return line[0:idx] + line[(idx - numspaces):]
 
-        if not line:
+        if not line or line.count('.') < 3:
+            # an IPv4 address contains 3 dots
             return line
         try:
-            ips = [each[0] for each in re.findall(self.pattern, line)]
+            ips = [each[0] for each in self._regex.findall(line)]
+            subs = dict()
             for ip in sorted(ips or [], key=len, reverse=True):
-                if ip not in self._ignore_list:  # ip must in line
-                    if kwargs.get('width', False):
-                        line = _sub_ip_keep_width(line, ip)
-                    else:
-                        line = _sub_ip(line, ip)
-            return line
+                if ip not in self._ignore_list and ip not in subs:  # ip must in line
+                    subs[ip] = self._ip2db(ip)
+                    logger.debug("Obfuscating IPv4 - %s > %s", ip, subs[ip])
+            spans = self._spans(line, subs)
+            if kwargs.get('width', False):
+                # from the right, so the spans to the left stay in place
+                for start, end, new_ip in reversed(spans):
+                    line = _sub_ip_keep_width(line, start, end, new_ip)
+                return line
+            parts = []
+            last = 0
+            for start, end, new_ip in spans:
+                parts.append(line[last:start])
+                parts.append(new_ip)
+                last = end
+            parts.append(line[last:])
+            return "".join(parts)
         except Exception as e:  # pragma: no cover
             logger.warning(e)
             raise Exception('SubIPError: Unable to Substitute IPv4 Address - %s', ips)
 
     def mapping(self):
         mapping = []
-        for k, v in self._ip_db.items():
+        for k, v in sorted(self._ip_db.items()):
             mapping.append({'original': self._int2ip(v), 'obfuscated': self._int2ip(k)})
         return mapping
 
@@ -140,7 +172,7 @@ class IPv4(object):
             ip_report_file = os.path.join(report_dir, "%s-ipv4.csv" % archive_name)
             logger.info('Creating IPv4 Report - %s', ip_report_file)
             lines = ['Obfuscated IPv4,Original IPv4']
-            for k, v in self._ip_db.items():
+            for k, v in sorted(self._ip_db.items()):
                 lines.append('{0},{1}'.format(self._int2ip(k), self._int2ip(v)))
         except Exception as e:  # pragma: no cover
             logger.exception(e)
@@ -160,6 +192,7 @@ class IPv6(object):
         self._ipv6_db = dict()  # IPv6 database
         # Ignore list for IPv6
         self._ignore_list = [r'\s+']  # ignore whitespace
+        self._ignore_regexes = [re.compile(i, re.I) for i in self._ignore_list]
         # IPv6 pattern, stolen from sos
         # FIXME:
         #   This pattern is not perfect, e.g. it cannot match "::1" perfectly.
@@ -170,6 +203,7 @@ class IPv6(object):
             r"(([0-9a-f]{1,4}(:[0-9a-f]{0,4}){0,5}))([^.])::(([0-9a-f]{1,4}"
             r"(:[0-9a-f]{1,4}){0,5})?))(/\d{1,3})?(?![:\\a-z0-9])"
         )
+        self._regex = re.compile(self.pattern, re.I)
 
     def _ip2db(self, ip):
         '''
@@ -211,11 +245,11 @@ class IPv6(object):
             # it's an obfuscated IP
             return line
 
-        if not line:
+        if not line or ':' not in line:
             return line
 
-        for ip in re.findall(self.pattern, line, re.I):
-            if any(re.search(_i, ip[0], re.I) for _i in self._ignore_list):
+        for ip in self._regex.findall(line):
+            if any(_i.search(ip[0]) for _i in self._ignore_regexes):
                 continue
             line = _sub_ip(line, ip[0])
         return line
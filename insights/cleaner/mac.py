@@ -24,8 +24,10 @@ class Mac(object):
         # - 00:00:00:00:00:00
         # - FF:FF:FF:FF:FF:FF
         self._ignore_list = [r'\b(?:(?:00:){5}00|(?:ff:){5}ff)\b']
+        self._ignore_regexes = [re.compile(i, re.I) for i in self._ignore_list]
         # MAC address patterns
         self.pattern = r'(?<![0-9a-fA-F:-])([0-9a-fA-F]{2}([:-])(?:[0-9a-fA-F]{2}\2){4}[0-9a-fA-F]{2})(?![0-9a-fA-F:-])'
+        self._regex = re.compile(self.pattern, re.I)
 
     def _mac2db(self, mac):
         '''
@@ -64,11 +66,11 @@ class Mac(object):
             # it's an obfuscated MAC address
             return line
 
-        if not line:
+        if not line or (':' not in line and '-' not in line):
             return line
 
-        for mac in re.findall(self.pattern, line, re.I):
-            if not any(re.search(_i, mac[0], re.I) for _i in self._ignore_list):
+        for mac in self._regex.findall(line):
+            if not any(_i.search(mac[0]) for _i in self._ignore_regexes):
                 line = _sub_mac(line, mac[0])
 
         return line
@@ -13,6 +13,7 @@ DEFAULT_PASSWORD_REGEXS = [
     r"(password[a-zA-Z0-9_]*)(\s*\:\s*\"*\s*|\s*\"*\s*=\s*\"\s*|\s*=+\s*|\s*--md5+\s*|\s*)([a-zA-Z0-9_!@#$%^&*()+=/-]+)",
     r"(password[a-zA-Z0-9_]*)(\s*\*+\s+)(.+)",
 ]
+_PASSWORD_REGEXS = [re.compile(r) for r in DEFAULT_PASSWORD_REGEXS]
 
 
 class Password(object):
@@ -26,12 +27,13 @@ class Password(object):
     """
 
     def parse_line(self, line, **kwargs):
-        if not line:
+        if not line or 'password' not in line:
+            # all the regexs start with "password"
             return line
         # password obfuscation
-        for regex in DEFAULT_PASSWORD_REGEXS:
+        for regex in _PASSWORD_REGEXS:
             tmp_line = line
-            line = re.sub(regex, r"\1\2********", tmp_line)
+            line = regex.sub(r"\1\2********", tmp_line)
             if line != tmp_line:
                 break
         return line
@@ -8,6 +8,51 @@ import json
 import os
 
 logger = logging.getLogger(__name__)
+CHUNK_SIZE = 65536  # 64KB
+
+
+def reverse_lines(fh, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+    """
+    Yields the lines of the file opened in binary mode `fh` from the last one
+    to the first one.  Only a chunk of the file is read at a time.
+
+    The lines are decoded and keep their line breaks as the lines iterated from
+    a file opened in text mode do, i.e. "\\r\\n" and "\\r" are translated to
+    "\\n".
+    """
+
+    def _decode(piece):
+        line = piece.decode(encoding)
+        if '\r' not in line:
+            return [line]
+        lines = [l + '\n' for l in line.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+        # the piece ends with a line break or it's the last line
+        lines[-1] = lines[-1][:-1]
+        return reversed(lines if lines[-1] else lines[:-1])
+
+    fh.seek(0, os.SEEK_END)
+    pos = fh.tell()
+    pending = b''
+    last = True  # the piece after the last line break has no line break
+    while pos > 0:
+        size = min(chunk_size, pos)
+        pos -= size
+        fh.seek(pos)
+        pieces = (fh.read(size) + pending).split(b'\n')
+        # the first piece may continue in the previous chunk
+        pending = pieces[0]
+        for piece in reversed(pieces[1:]):
+            if last:
+                last = False
+                if piece:
+                    for line in _decode(piece):
+                        yield line
+            else:
+                for line in _decode(piece + b'\n'):
+                    yield line
+    if pending or not last:
+        for line in _decode(pending if last else pending + b'\n'):
+            yield line
 
 
 def write_report(report, report_file, mode=0o644):
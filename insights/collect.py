@@ -243,28 +243,30 @@ def collect(
     fs.ensure_path(output_path)
     fs.touch(os.path.join(output_path, "insights_archive.txt"))
 
+    # run in "serial" mode by default
+    run_strategy = client.get("run_strategy", {"name": "serial"})
+    parallel = run_strategy.get("name") == "parallel"
+    to_persist = get_to_persist(client.get("persist", set()))
+
     broker = dr.Broker()
     ctx = create_context(client.get("context", {}))
-    cleaner = Cleaner(client_config, black_list) if client_config else None
+    cleaner = Cleaner(client_config, black_list, parallel=parallel) if client_config else None
     broker[ctx.__class__] = ctx
     broker['cleaner'] = cleaner
     broker['redact_config'] = black_list
     broker['client_config'] = client_config
 
-    # run in "serial" mode by default
-    run_strategy = client.get("run_strategy", {"name": "serial"})
-    parallel = run_strategy.get("name") == "parallel"
-    to_persist = get_to_persist(client.get("persist", set()))
-
-    if client_config and client_config.obfuscate and parallel:
-        log.warning("Parallel collection is not supported when 'obfuscate' is enabled")
-        parallel = False
-
     pool_args = run_strategy.get("args", {})
+    limits = dict(
+        (dr.get_component(k), v) for k, v in run_strategy.get("limits", {}).items()
+    )
     with get_pool(parallel, "insights-collector-pool", pool_args) as pool:
         h = Hydration(output_path, ctx, pool=pool)
         broker.add_observer(h.make_persister(to_persist))
-        dr.run_all(broker=broker, pool=pool)
+        if pool:
+            dr.run_parallel(broker=broker, pool=pool, limits=limits)
+        else:
+            dr.run_all(broker=broker)
 
     collect_errors = _parse_broker_exceptions(broker, EXCEPTIONS_TO_REPORT)
 
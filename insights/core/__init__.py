@@ -7,7 +7,8 @@ import re
 import shlex
 import yaml
 
-from collections import OrderedDict
+from bisect import bisect_left
+from collections import OrderedDict, deque
 from fnmatch import fnmatch
 
 from insights.core.exceptions import (
@@ -17,6 +18,7 @@ from insights.core.exceptions import (
     ParseException,
     SkipComponent,
 )  # noqa: F401
+from insights.core.line_index import LineIndex
 from insights.core.serde import deserializer, serializer
 from insights.parsr import iniparser
 from insights.parsr.query import Directive, Entry, Result, Section, compile_queries
@@ -906,9 +908,20 @@ class Scannable(Parser, metaclass=ScanMeta):
 
     """
 
+    streaming = False
+    """
+    bool: Set to ``True`` in a subclass to have :meth:`parse` receive the
+    content as a stream of lines from the datasource instead of a list, so the
+    whole file is never held in memory. Only do this when :meth:`parse` makes a
+    single pass over its input.
+    """
+
     def __init__(self, *args, **kwargs):
         super(Scannable, self).__init__(*args, **kwargs)
 
+    def _handle_content(self, context):
+        self.parse_content(context.stream() if self.streaming else context.content)
+
     @classmethod
     def _scan(cls, result_key, scanner):
         """
@@ -961,11 +974,155 @@ class Scannable(Parser, metaclass=ScanMeta):
             yield line
 
     def parse_content(self, content):
+        scanners = list(self.scanners.values())
         for obj in self.parse(content):
-            for scanner in self.scanners.values():
+            for scanner in scanners:
                 scanner(self, obj)
 
 
+class _LineScanner(object):
+    """
+    Base of the scanners registered by :meth:`TextFileOutput.token_scan`,
+    :meth:`TextFileOutput.keep_scan`, and :meth:`TextFileOutput.last_scan`.
+    Calling one with a parser scans ``parser.lines`` like any other scanner.
+    They can also be fed one line at a time with :meth:`start`, :meth:`feed`,
+    and :meth:`finish`, which is what lets a streaming parser evaluate all of
+    them in a single pass without keeping the lines.  Otherwise they're
+    evaluated together with :meth:`scan_index` from one index of the lines.
+    """
+
+    num = None
+    reverse = False
+
+    def __init__(self, result_key, token, check=all):
+        self.result_key = result_key
+        self.token = token
+        self.check = check
+
+    def __call__(self, parser):
+        setattr(parser, self.result_key, self.scan(parser))
+
+    def scan(self, parser):
+        raise NotImplementedError()
+
+    def start(self, parser):
+        """Returns the state for one pass over the lines of ``parser``."""
+        return [parser._valid_search(self.token, self.check)]
+
+    def feed(self, parser, state, line):
+        raise NotImplementedError()
+
+    def finish(self, parser, state):
+        raise NotImplementedError()
+
+    def scan_index(self, parser, index, cache):
+        """
+        Sets the result from the :class:`insights.core.line_index.LineIndex`
+        of the lines of ``parser``, sharing the lines found for each string
+        in ``cache`` with the other scanners.  Returns ``False`` if the index
+        can't answer.
+        """
+        if type(parser).get is not TextFileOutput.get:
+            # the scanners of a parser that changes get still use it
+            return False
+        parser._valid_search(self.token, self.check)
+        if self.num is not None and not isinstance(self.num, int):
+            raise TypeError('Required numbers must be given as a integer')
+        found = index.search(self.token, self.check, cache, self.num, self.reverse)
+        if found is None:
+            return False
+        self.resolve(parser, found)
+        return True
+
+    def resolve(self, parser, found):
+        """
+        Sets the result from ``found``, the indexes of the lines that match,
+        limited by ``num`` and ``reverse``.
+        """
+        raise NotImplementedError()
+
+
+class _TokenScanner(_LineScanner):
+    def scan(self, parser):
+        search_by_expression = parser._valid_search(self.token, self.check)
+        index = parser._line_index()
+        found = index.contains(self.token, self.check) if index else None
+        if found is not None:
+            return found
+        return any(search_by_expression(l) for l in parser.lines)
+
+    def start(self, parser):
+        return super(_TokenScanner, self).start(parser) + [False]
+
+    def feed(self, parser, state, line):
+        if not state[1] and state[0](line):
+            state[1] = True
+
+    def finish(self, parser, state):
+        setattr(parser, self.result_key, state[1])
+
+    def scan_index(self, parser, index, cache):
+        parser._valid_search(self.token, self.check)
+        found = index.contains(self.token, self.check, cache)
+        if found is None:
+            return False
+        setattr(parser, self.result_key, bool(found))
+        return True
+
+
+class _KeepScanner(_LineScanner):
+    def __init__(self, result_key, token, check=all, num=None, reverse=False):
+        super(_KeepScanner, self).__init__(result_key, token, check)
+        self.num = num
+        self.reverse = reverse
+
+    def scan(self, parser):
+        return parser.get(self.token, check=self.check, num=self.num, reverse=self.reverse)
+
+    def start(self, parser):
+        if self.num is not None and not isinstance(self.num, int):
+            raise TypeError('Required numbers must be given as a integer')
+        # the last ``num`` matches are kept when scanning from the tail
+        maxlen = self.num if self.reverse else None
+        return super(_KeepScanner, self).start(parser) + [deque(maxlen=maxlen)]
+
+    def feed(self, parser, state, line):
+        search_by_expression, found = state
+        if (self.reverse or self.num is None or len(found) < self.num) and search_by_expression(
+            line
+        ):
+            found.append(line)
+
+    def finish(self, parser, state):
+        setattr(parser, self.result_key, [parser._parse_line(l) for l in state[1]])
+
+    def resolve(self, parser, found):
+        setattr(parser, self.result_key, [parser._parse_line(parser.lines[i]) for i in found])
+
+
+class _LastScanner(_LineScanner):
+    num = 1
+    reverse = True
+
+    def scan(self, parser):
+        ret = parser.get(self.token, check=self.check, num=1, reverse=True)
+        return ret[0] if ret else dict()
+
+    def start(self, parser):
+        return super(_LastScanner, self).start(parser) + [None]
+
+    def feed(self, parser, state, line):
+        if state[0](line):
+            state[1] = line
+
+    def finish(self, parser, state):
+        last = state[1]
+        setattr(parser, self.result_key, parser._parse_line(last) if last is not None else dict())
+
+    def resolve(self, parser, found):
+        setattr(parser, self.result_key, parser._parse_line(parser.lines[found[0]]) if found else dict())
+
+
 class TextFileOutput(Parser, metaclass=ScanMeta):
     """
     Class for parsing general text file content.
@@ -1022,16 +1179,76 @@ class TextFileOutput(Parser, metaclass=ScanMeta):
         >>> my_texter.find_four_or_more
         True
 
+    A subclass that only needs the results of ``token_scan``, ``keep_scan``,
+    and ``last_scan`` scanners can set ``streaming = True``. Its content is
+    then read as a stream from the datasource, every scanner is evaluated in
+    a single pass, and the lines aren't kept, so ``lines`` is empty and
+    :meth:`get` finds nothing. If a scanner registered with :meth:`scan` is
+    present, the lines are kept as usual since it needs all of them.
+
+    The shipped log parsers, like
+    :class:`insights.parsers.messages.Messages` and the journal parsers in
+    :mod:`insights.parsers.journalctl`, don't set it since rules call
+    :meth:`get` and :meth:`LogFileOutput.get_after` on them.  Rules that
+    only need scanners can register their own subclass of one of them for
+    the same spec, with ``streaming = True`` and the scanners set on it::
+
+        @parser(Specs.messages)
+        class MessagesScan(Messages):
+            streaming = True
+
+        MessagesScan.keep_scan("oom", "Out of memory")
+
+    Otherwise the ``token_scan``, ``keep_scan``, and ``last_scan`` scanners
+    are evaluated together from one index of the lines, as described below,
+    so each string they search for is only looked for once.
+
+    A subclass whose lines are searched many times, by many scanners or by
+    rules calling :meth:`get`, can set ``search_index = True``.  The first
+    search then builds a :class:`insights.core.line_index.LineIndex` of the
+    lines, and each search for strings with ``check`` of ``all`` or ``any``
+    finds the lines containing them with ``str.find`` instead of testing every
+    line.  The results are the same, but the lines must not be changed in
+    place after they're first searched.
     """
 
+    streaming = False
+    """
+    bool: Whether to scan the content in a single pass without keeping it.
+    """
+
+    search_index = False
+    """
+    bool: Whether to index the lines the first time they're searched.
+    """
+
+    def _handle_content(self, context):
+        self.parse_content(context.stream() if self.streaming else context.content)
+
     def parse_content(self, content):
         """
         Use all the defined scanners to search the log file, setting the
         properties defined in the scanner.
         """
-        self.lines = content
-        for scanner in self.scanners.values():
-            scanner(self)
+        scanners = list(self.scanners.values())
+        if self.streaming and all(isinstance(s, _LineScanner) for s in scanners):
+            self.lines = []
+            states = [(s, s.start(self)) for s in scanners]
+            for line in content:
+                for scanner, state in states:
+                    scanner.feed(self, state, line)
+            for scanner, state in states:
+                scanner.finish(self, state)
+            return
+
+        self.lines = list(content) if self.streaming else content
+        # the lines found for each string are shared by all the scanners
+        line_scanners = sum(isinstance(s, _LineScanner) for s in scanners)
+        index = self._line_index(build=line_scanners > 1)
+        cache = {}
+        for scanner in scanners:
+            if not (index and isinstance(scanner, _LineScanner) and scanner.scan_index(self, index, cache)):
+                scanner(self)
 
     def __contains__(self, s):
         """
@@ -1039,8 +1256,42 @@ class TextFileOutput(Parser, metaclass=ScanMeta):
         strings in the given list.
         """
         search_by_expression = self._valid_search(s)
+        index = self._line_index()
+        found = index.contains(s) if index else None
+        if found is not None:
+            return found
         return any(search_by_expression(l) for l in self.lines)
 
+    def _line_index(self, build=False):
+        """
+        Returns the :class:`insights.core.line_index.LineIndex` of the lines,
+        built the first time, or ``None`` if ``search_index`` isn't set or the
+        lines can't be indexed.  With `build`, an index is built even if
+        ``search_index`` isn't set, but isn't kept.
+        """
+        if not (self.search_index or build):
+            return None
+        lines = self.lines
+        cached = self.__dict__.get("_search_index")
+        if cached is None or cached[0] is not lines or cached[1] != len(lines):
+            try:
+                index = LineIndex(lines)
+            except (TypeError, ValueError) as ex:
+                log.debug("Not indexing %s: %s", self.file_path, ex)
+                index = None
+            if not self.search_index:
+                return index
+            cached = self.__dict__["_search_index"] = (lines, len(lines), index)
+        return cached[2]
+
+    def __getstate__(self):
+        # the index is built again when needed rather than pickled
+        if "_search_index" not in self.__dict__:
+            return self.__dict__
+        state = self.__dict__.copy()
+        del state["_search_index"]
+        return state
+
     def _parse_line(self, line):
         """
         Parse the line into a dictionary and return it. Only wrap with
@@ -1083,6 +1334,10 @@ class TextFileOutput(Parser, metaclass=ScanMeta):
             raise TypeError('Required numbers must be given as a integer')
         ret = []
         search_by_expression = self._valid_search(s, check)
+        index = self._line_index()
+        found = index.search(s, check, num=num, reverse=reverse) if index else None
+        if found is not None:
+            return [self._parse_line(self.lines[i]) for i in found]
         lines = self.lines[::-1] if reverse else self.lines
         for l in lines:
             if (num is None or len(ret) < num) and search_by_expression(l):
@@ -1110,6 +1365,12 @@ class TextFileOutput(Parser, metaclass=ScanMeta):
 
         cls.scanners.update({result_key: scanner})
 
+    @classmethod
+    def _add_scanner(cls, scanner):
+        if scanner.result_key in cls.scanners:
+            raise ValueError("'%s' is already a registered scanner key" % scanner.result_key)
+        cls.scanners[scanner.result_key] = scanner
+
     @classmethod
     def token_scan(cls, result_key, token, check=all):
         """
@@ -1126,11 +1387,7 @@ class TextFileOutput(Parser, metaclass=ScanMeta):
             or all) of the tokens given.
         """
 
-        def _scan(self):
-            search_by_expression = self._valid_search(token, check)
-            return any(search_by_expression(l) for l in self.lines)
-
-        cls.scan(result_key, _scan)
+        cls._add_scanner(_TokenScanner(result_key, token, check))
 
     @classmethod
     def keep_scan(cls, result_key, token, check=all, num=None, reverse=False):
@@ -1149,10 +1406,7 @@ class TextFileOutput(Parser, metaclass=ScanMeta):
             (list): list of dictionaries corresponding to the parsed lines contain the `token`.
         """
 
-        def _scan(self):
-            return self.get(token, check=check, num=num, reverse=reverse)
-
-        cls.scan(result_key, _scan)
+        cls._add_scanner(_KeepScanner(result_key, token, check, num, reverse))
 
     @classmethod
     def last_scan(cls, result_key, token, check=all):
@@ -1169,11 +1423,203 @@ class TextFileOutput(Parser, metaclass=ScanMeta):
             (dict): dictionary corresponding to the last parsed line contains the `token`.
         """
 
-        def _scan(self):
-            ret = self.get(token, check=check, num=1, reverse=True)
-            return ret[0] if ret else dict()
+        cls._add_scanner(_LastScanner(result_key, token, check))
+
+
+# Annoyingly, strptime insists that it get the whole time string and
+# nothing but the time string.  However, for most logs we only have a
+# string with the timestamp in it.  We can't just catch the ValueError
+# because at that point we do not actually have a valid datetime
+# object.  So we convert the time format string to a regex, use that
+# to find just the timestamp, and then use strptime on that.  Thanks,
+# Python.  All these need to cope with different languages and
+# character sets.  Note that we don't include time zone or other
+# outputs (e.g. day-of-year) that don't usually occur in time stamps.
+_TIME_FORMAT_CONVERSIONS = {
+    'a': r'\w{3}',
+    'A': r'\w+',  # Week day name
+    'w': r'[0123456]',  # Week day number
+    'd': r'([0 ][123456789]|[12]\d|3[01])',  # Day of month
+    'b': r'\w{3}',
+    'B': r'\w+',  # Month name
+    'm': r'([0 ]\d|1[012])',  # Month number
+    'y': r'\d{2}',
+    'Y': r'\d{4}',  # Year
+    'H': r'([01 ]\d|2[0123])',  # Hour - 24 hour format
+    'I': r'([0 ]?\d|1[012])',  # Hour - 12 hour format
+    'p': r'\w{2}',  # AM / PM
+    'M': r'([012345]\d)',  # Minutes
+    'S': r'([012345]\d|60)',  # Seconds, including leap second
+    'f': r'\d{1,6}',  # Microseconds
+}
+_TIME_FORMAT_RE = re.compile(r'%(\w)')
+# Time stamps in these formats are parsed by fromisoformat, which is much
+# faster than strptime.  The ones it doesn't take, like hours padded with a
+# space, still go to strptime.
+_ISO_TIME_FORMATS = frozenset([
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S.%f',
+])
+_TIME_FORMATS = {}
+
+
+def _time_format_replacer(match):
+    if match.group(1) in _TIME_FORMAT_CONVERSIONS:
+        return _TIME_FORMAT_CONVERSIONS[match.group(1)]
+    else:
+        raise ParseException(
+            "get_after does not understand strptime format '{c}'".format(c=match.group(0))
+        )
+
+
+def _strptime_parser(time_format):
+    # fromisoformat isn't there before python 3.7
+    if time_format not in _ISO_TIME_FORMATS or not hasattr(datetime.datetime, "fromisoformat"):
+        # Curry strptime with time_format string.
+        def test_parser(logstamp):
+            return datetime.datetime.strptime(logstamp, time_format)
+
+        return test_parser
+
+    def iso_parser(logstamp):
+        try:
+            return datetime.datetime.fromisoformat(logstamp)
+        except ValueError:
+            return datetime.datetime.strptime(logstamp, time_format)
+
+    return iso_parser
+
+
+def _compile_time_format(time_format):
+    """
+    Returns the regular expression that finds the time stamps of
+    :attr:`LogFileOutput.time_format` in a line, the function that parses
+    them, and whether they have a year.  They're made once for each format.
+    """
+    # Check time_format - must be string or list.  Set the 'logs_have_year'
+    # flag and timestamp parser function appropriately.
+    # Grab values of dict as a list first
+    if isinstance(time_format, dict):
+        time_format = list(time_format.values())
+    key = tuple(time_format) if isinstance(time_format, list) else time_format
+    try:
+        compiled = _TIME_FORMATS.get(key)
+    except TypeError:
+        compiled = None
+    if compiled is not None:
+        return compiled
+
+    # Please do not attempt to be tricky and put a regular expression
+    # inside your time format, as we are going to also use it in
+    # strptime too and that may not work out so well.
+    if isinstance(time_format, str):
+        logs_have_year = '%Y' in time_format or '%y' in time_format
+        time_re = re.compile('(' + _TIME_FORMAT_RE.sub(_time_format_replacer, time_format) + ')')
+        parse_fn = _strptime_parser(time_format)
+    elif isinstance(time_format, list):
+        logs_have_year = all('%Y' in tf or '%y' in tf for tf in time_format)
+        time_re = re.compile(
+            '(' + '|'.join(_TIME_FORMAT_RE.sub(_time_format_replacer, tf) for tf in time_format) + ')'
+        )
+        formats = list(time_format)
+
+        def test_all_parsers(logstamp):
+            # One of these must match, because the regex has selected only
+            # strings that will match.
+            for tf in formats:
+                try:
+                    ts = datetime.datetime.strptime(logstamp, tf)
+                except ValueError:
+                    pass
+            return ts
+
+        parse_fn = test_all_parsers
+    else:
+        raise ParseException(
+            "get_after does not recognise time formats of type {t}".format(t=type(time_format))
+        )
+
+    compiled = _TIME_FORMATS[key] = (time_re, parse_fn, logs_have_year)
+    return compiled
 
-        cls.scan(result_key, _scan)
+
+_UNPARSED = object()
+
+
+class _TimestampIndex(object):
+    """
+    The time stamps of the lines of a :class:`LogFileOutput`, kept so they're
+    found and parsed once however many times the log is searched.  Each line
+    is parsed the first time its time stamp is needed.  Once all of them are,
+    the time stamps at the start of the log that are in order are kept too,
+    so the lines before a given time are skipped with a binary search.
+    """
+
+    def __init__(self, lines, time_format):
+        time_re, self.parse_fn, _ = _compile_time_format(time_format)
+        self.search = time_re.search
+        self.lines = lines
+        self.time_format = time_format
+        self.stamps = [_UNPARSED] * len(lines)
+        self.parsed = {}
+        self.keys = None
+        self.positions = None
+        self.ordered = 0
+        self.uses = 0
+
+    def get(self, i):
+        """
+        Returns the time stamp of line `i`, ``None`` if it doesn't have one,
+        or the exception raised while parsing it.
+        """
+        stamp = self.stamps[i]
+        if stamp is _UNPARSED:
+            match = self.search(self.lines[i])
+            if match is None:
+                stamp = None
+            else:
+                text = match.group(0)
+                # many lines of a log share a time stamp
+                stamp = self.parsed.get(text, _UNPARSED)
+                if stamp is _UNPARSED:
+                    try:
+                        stamp = self.parse_fn(text)
+                    except Exception as ex:
+                        stamp = ex
+                    self.parsed[text] = stamp
+            self.stamps[i] = stamp
+        return stamp
+
+    def complete(self):
+        """
+        Parses the lines up to the first one whose time stamp is earlier than
+        the one before it or can't be parsed.
+        """
+        if self.keys is None:
+            keys, positions = [], []
+            self.ordered = len(self.lines)
+            for i in range(len(self.lines)):
+                stamp = self.get(i)
+                if stamp is None:
+                    continue
+                if isinstance(stamp, Exception) or (keys and stamp < keys[-1]):
+                    self.ordered = i
+                    break
+                keys.append(stamp)
+                positions.append(i)
+            self.keys, self.positions = keys, positions
+            self.parsed = {}
+        return self
+
+    def start(self, timestamp):
+        """
+        Returns the index of the first line that can be at or after
+        `timestamp`.  Only valid after :meth:`complete`.
+        """
+        i = bisect_left(self.keys, timestamp)
+        return self.positions[i] if i < len(self.positions) else self.ordered
 
 
 class LogFileOutput(TextFileOutput):
@@ -1275,104 +1721,39 @@ class LogFileOutput(TextFileOutput):
         if time_format is None:
             raise RuntimeError('Not applied when time_format does not exist')
 
-        # Annoyingly, strptime insists that it get the whole time string and
-        # nothing but the time string.  However, for most logs we only have a
-        # string with the timestamp in it.  We can't just catch the ValueError
-        # because at that point we do not actually have a valid datetime
-        # object.  So we convert the time format string to a regex, use that
-        # to find just the timestamp, and then use strptime on that.  Thanks,
-        # Python.  All these need to cope with different languages and
-        # character sets.  Note that we don't include time zone or other
-        # outputs (e.g. day-of-year) that don't usually occur in time stamps.
-        format_conversion_for = {
-            'a': r'\w{3}',
-            'A': r'\w+',  # Week day name
-            'w': r'[0123456]',  # Week day number
-            'd': r'([0 ][123456789]|[12]\d|3[01])',  # Day of month
-            'b': r'\w{3}',
-            'B': r'\w+',  # Month name
-            'm': r'([0 ]\d|1[012])',  # Month number
-            'y': r'\d{2}',
-            'Y': r'\d{4}',  # Year
-            'H': r'([01 ]\d|2[0123])',  # Hour - 24 hour format
-            'I': r'([0 ]?\d|1[012])',  # Hour - 12 hour format
-            'p': r'\w{2}',  # AM / PM
-            'M': r'([012345]\d)',  # Minutes
-            'S': r'([012345]\d|60)',  # Seconds, including leap second
-            'f': r'\d{1,6}',  # Microseconds
-        }
-
-        # Construct the regex from the time string
-        timefmt_re = re.compile(r'%(\w)')
-
-        def replacer(match):
-            if match.group(1) in format_conversion_for:
-                return format_conversion_for[match.group(1)]
-            else:
-                raise ParseException(
-                    "get_after does not understand strptime format '{c}'".format(c=match.group(0))
-                )
-
-        # Please do not attempt to be tricky and put a regular expression
-        # inside your time format, as we are going to also use it in
-        # strptime too and that may not work out so well.
-
-        # Check time_format - must be string or list.  Set the 'logs_have_year'
-        # flag and timestamp parser function appropriately.
-        # Grab values of dict as a list first
-        if isinstance(time_format, dict):
-            time_format = list(time_format.values())
-        if isinstance(time_format, str):
-            logs_have_year = '%Y' in time_format or '%y' in time_format
-            time_re = re.compile('(' + timefmt_re.sub(replacer, time_format) + ')')
-
-            # Curry strptime with time_format string.
-            def test_parser(logstamp):
-                return datetime.datetime.strptime(logstamp, time_format)
-
-            parse_fn = test_parser
-        elif isinstance(time_format, list):
-            logs_have_year = all('%Y' in tf or '%y' in tf for tf in time_format)
-            time_re = re.compile(
-                '(' + '|'.join(timefmt_re.sub(replacer, tf) for tf in time_format) + ')'
-            )
-
-            def test_all_parsers(logstamp):
-                # One of these must match, because the regex has selected only
-                # strings that will match.
-                for tf in time_format:
-                    try:
-                        ts = datetime.datetime.strptime(logstamp, tf)
-                    except ValueError:
-                        pass
-                return ts
-
-            parse_fn = test_all_parsers
-        else:
-            raise ParseException(
-                "get_after does not recognise time formats of type {t}".format(t=type(time_format))
-            )
-
-        # Most logs will appear in string format, but some logs (e.g.
-        # Messages) are available in list-of-dicts format.  So we choose one
-        # of two 'date_compare' functions.  HOWEVER: we still have to check
-        # the string found for a valid date, because log parsing often fails.
-        # Because of generators, we check this per line
-
-        # Now try to find the time stamp in each log line and add lines to
-        # our output if they are currently being included in the log.
+        _, _, logs_have_year = _compile_time_format(time_format)
+        index = self._timestamp_index(time_format)
+
+        # Lines before the first time stamp that's not earlier than the given
+        # one, in the part of the log whose time stamps are in order, are all
+        # excluded.  That part is found once all the lines are parsed, which
+        # happens when the log is searched again or when all of it is
+        # searched anyway.  The year of logs without one depends on the given
+        # time stamp, so they're always searched from the start.
+        start = 0
+        if logs_have_year and (not s or index.uses):
+            try:
+                start = index.complete().start(timestamp)
+            except TypeError:
+                # not comparable, raised below if there's a time stamp
+                pass
+        index.uses += 1
 
         eleven_months = datetime.timedelta(days=330)
         including_lines = False
         search_by_expression = self._valid_search(s)
-        for line in self.lines:
+        lines = self.lines
+        get_stamp = index.get
+        for i in range(start, len(lines)):
+            line = lines[i]
             # If `s` is not None, keywords must be found in the line
             if s and not search_by_expression(line):
                 continue
             # Otherwise, search all lines
-            match = time_re.search(line)
-            if match:
-                logstamp = parse_fn(match.group(0))
+            logstamp = get_stamp(i)
+            if logstamp is not None:
+                if isinstance(logstamp, Exception):
+                    raise logstamp
                 if not logs_have_year:
                     # Substitute timestamp year for logstamp year
                     logstamp = logstamp.replace(year=timestamp.year)
@@ -1396,6 +1777,22 @@ class LogFileOutput(TextFileOutput):
                 if including_lines:
                     yield self._parse_line(line)
 
+    def _timestamp_index(self, time_format):
+        index = self.__dict__.get('_timestamps')
+        if index is None or index.lines is not self.lines or index.time_format != time_format:
+            index = self._timestamps = _TimestampIndex(self.lines, time_format)
+        return index
+
+    def __getstate__(self):
+        # the time stamp index holds the parse function of its format, which
+        # can't be pickled, so it's built again when needed
+        state = super(LogFileOutput, self).__getstate__()
+        if "_timestamps" not in state:
+            return state
+        state = state.copy()
+        del state["_timestamps"]
+        return state
+
 
 class Syslog(LogFileOutput):
     """Class for parsing syslog file content.
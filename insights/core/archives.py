@@ -1,12 +1,28 @@
 #!/usr/bin/env python
 
+import fnmatch
+import io
+import json
 import logging
+import mmap
 import os
+import posixpath
+import re
+import shutil
+import stat
+import struct
+import tarfile
 import tempfile
+import threading
+import zipfile
 
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from glob import has_magic
 
 from insights.core.exceptions import InvalidContentType
+from insights.core.path_index import PathIndex
 from insights.util import fs, subproc, which
 from insights.util.content_type import from_file as content_type_from_file
 
@@ -14,6 +30,145 @@ logger = logging.getLogger(__name__)
 
 
 COMPRESSION_TYPES = ("zip", "tar", "gz", "bz2", "xz")
+CACHE_SIZE = 67108864  # 64 MB
+""" The default number of bytes of member content an ArchiveIndex keeps. """
+PACK_MAGIC = b"INSIGHTS-PACK\x00\x00\x01"
+""" The first and last bytes of a pack written by :class:`PackWriter`. """
+PACK_CONTENT_TYPE = "application/x-insights-pack"
+_PACK_FOOTER = struct.Struct("<QQ16s")
+
+
+def _translate_glob(pattern):
+    """
+    Returns a regular expression for the glob `pattern` in which, as with
+    ``glob``, the wildcards don't match ``/``.  ``**`` matches any path.
+    """
+    res = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            if pattern[i:i + 1] == "*":
+                i += 1
+                res.append(".*")
+            else:
+                res.append("[^/]*")
+        elif c == "?":
+            res.append("[^/]")
+        elif c == "[":
+            j = i + 1 if pattern[i:i + 1] == "!" else i
+            j = pattern.find("]", j + 1 if pattern[j:j + 1] == "]" else j)
+            if j < 0:
+                res.append("\\[")
+            else:
+                stuff = pattern[i:j].replace("\\", "\\\\")
+                i = j + 1
+                res.append("[%s]" % ("^" + stuff[1:] if stuff.startswith("!") else stuff))
+        else:
+            res.append(re.escape(c))
+    return "".join(res)
+
+
+def _compile_members(patterns):
+    floating = [_translate_glob(p) for p in patterns if not p.startswith("/")]
+    anchored = [_translate_glob(p.lstrip("/")) for p in patterns if p.startswith("/")]
+    regex = "(?:.*/)?(?:%s)" % "|".join(floating) if floating else "(?!)"
+    if anchored:
+        regex = "(?:%s)|(?:%s)" % ("|".join(anchored), regex)
+    return re.compile("(?:%s)\\Z" % regex, re.DOTALL).match
+
+
+class MemberFilter(object):
+    """
+    Selects the members of an archive to extract.  A member is extracted if
+    its path matches one of the glob `patterns` below any directory of the
+    archive, since the root of the context isn't known before extraction.
+    Patterns that start with ``/`` only match from the top of the archive.
+
+    Since a context is identified by its marker, the first member found for
+    each of the `markers` under a directory is extracted as well.
+    Directories and symbolic links are always extracted.
+    """
+
+    def __init__(self, patterns, markers=()):
+        self.patterns = patterns
+        self.markers = markers
+        # most patterns end with a literal file name, only the few of them
+        # with the name of a member are tried
+        groups = defaultdict(list)
+        for p in patterns:
+            base = posixpath.basename(p)
+            groups[None if has_magic(base) else base].append(p)
+        self._matchers = dict((k, _compile_members(v)) for k, v in groups.items())
+        self._markers = re.compile(
+            "(.*?(?:^|/)(?:%s))(?:/|\\Z)" % "|".join(re.escape(m.strip("/")) for m in markers) if markers else "(?!)"
+        ).match
+        self._seen = set()
+
+    def __call__(self, name):
+        """
+        Returns whether the regular file `name` should be extracted.
+        """
+        name = posixpath.normpath(name.lstrip("/"))
+        for key in (posixpath.basename(name), None):
+            match = self._matchers.get(key)
+            if match is not None and match(name):
+                return True
+        m = self._markers(name)
+        if m and m.group(1) not in self._seen:
+            self._seen.add(m.group(1))
+            return True
+        return False
+
+
+def _safe_name(name):
+    name = posixpath.normpath(name.lstrip("/"))
+    return None if name in (".", "..") or name.startswith("../") else name
+
+
+def _is_under(root, path):
+    """
+    Returns whether `path` is the real path `root` or under it once symbolic
+    links are resolved.
+    """
+    path = os.path.realpath(path)
+    return path == root or path.startswith(root + os.sep)
+
+
+def _safe_target(name, target):
+    """
+    Returns whether the relative symbolic link `target` of the member `name`
+    stays in the archive.
+    """
+    if posixpath.isabs(target):
+        return False
+    return _safe_name(posixpath.join(posixpath.dirname(name), target)) is not None
+
+
+def _make_links(root, links):
+    """
+    Creates the symbolic links of the (name, target) pairs `links` under the
+    real path `root`, after everything else has been written.  Links with an
+    absolute target, or that lead outside `root`, are left out.
+    """
+    created = []
+    for name, target in links:
+        dst = os.path.join(root, name)
+        if not _safe_target(name, target) or not _is_under(root, os.path.dirname(dst)):
+            logger.warning("Skipping link outside the archive: %s -> %s", name, target)
+            continue
+        try:
+            fs.ensure_path(os.path.dirname(dst))
+            os.symlink(target, dst)
+            created.append(dst)
+        except OSError as e:
+            logger.warning("Skipping link %s: %s", name, e)
+    # a link created later can take an earlier one outside
+    for dst in created:
+        if not _is_under(root, dst):
+            logger.warning("Removing link outside the archive: %s", dst)
+            os.unlink(dst)
 
 
 class ZipExtractor(object):
@@ -23,13 +178,48 @@ class ZipExtractor(object):
         self.tmp_dir = None
         self.created_tmp_dir = False
 
-    def from_path(self, path, extract_dir=None, content_type=None):
+    def from_path(self, path, extract_dir=None, content_type=None, members=None):
         self.tmp_dir = tempfile.mkdtemp(prefix="insights-", dir=extract_dir)
         self.created_tmp_dir = True
+        if members is not None:
+            self._extract_members(path, members)
+            return self
         command = "unzip -n -q -d %s %s" % (self.tmp_dir, path)
         subproc.call(command, timeout=self.timeout)
         return self
 
+    def _extract_members(self, path, members):
+        """
+        Extracts the members selected by `members`.  The members of a zip
+        archive are compressed separately, so they're decompressed in
+        parallel.
+        """
+        root = os.path.realpath(self.tmp_dir)
+        with zipfile.ZipFile(path) as zf:
+            files = []
+            links = []
+            for info in zf.infolist():
+                name = _safe_name(info.filename)
+                if name is None:
+                    continue
+                dst = os.path.join(root, name)
+                if info.is_dir():
+                    fs.ensure_path(dst)
+                elif stat.S_ISLNK(info.external_attr >> 16):
+                    links.append((name, zf.read(info).decode("utf-8", "surrogateescape")))
+                elif members(name) and _is_under(root, os.path.dirname(dst)):
+                    fs.ensure_path(os.path.dirname(dst))
+                    files.append((info, dst))
+
+            def write(item):
+                info, dst = item
+                with zf.open(info) as src, open(dst, "wb") as f:
+                    shutil.copyfileobj(src, f)
+
+            with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+                list(pool.map(write, files))
+        _make_links(root, links)
+
 
 class TarExtractor(object):
 
@@ -52,7 +242,7 @@ class TarExtractor(object):
             raise InvalidContentType(content_type)
         return flag
 
-    def from_path(self, path, extract_dir=None, content_type=None):
+    def from_path(self, path, extract_dir=None, content_type=None, members=None):
         if os.path.isdir(path):
             self.tmp_dir = path
         else:
@@ -60,11 +250,70 @@ class TarExtractor(object):
             tar_flag = self._tar_flag_for_content_type(self.content_type)
             self.tmp_dir = tempfile.mkdtemp(prefix="insights-", dir=extract_dir)
             self.created_tmp_dir = True
+            if members is not None:
+                self._extract_members(path, members)
+                return self
             command = "tar --delay-directory-restore %s -x --exclude=*/dev/* -f %s -C %s" % (tar_flag, path, self.tmp_dir)
             logging.debug("Extracting files in '%s'", self.tmp_dir)
             subproc.call(command, timeout=self.timeout)
         return self
 
+    def _extract_members(self, path, members):
+        """
+        Extracts the members selected by `members` in one pass over the
+        archive.  Like the ``tar`` command, members under ``*/dev/*`` are left
+        out.  Members are only written under the temporary directory, even by
+        the versions of ``tarfile`` without extraction filters, and symbolic
+        links are created last, like :func:`_make_links` does.
+        """
+        kwargs = {"filter": "tar"} if hasattr(tarfile, "tar_filter") else {}
+        root = os.path.realpath(self.tmp_dir)
+        links = []
+
+        def selected(tf):
+            for member in tf:
+                name = _safe_name(member.name)
+                if name is None or fnmatch.fnmatch(member.name, "*/dev/*"):
+                    continue
+                if member.issym():
+                    links.append((name, member.linkname))
+                    continue
+                if not (member.isdir() or ((member.isfile() or member.islnk()) and members(name))):
+                    continue
+                if not _is_under(root, os.path.dirname(os.path.join(root, name))):
+                    logger.warning("Skipping member outside the archive: %s", member.name)
+                    continue
+                if member.islnk():
+                    target = None if posixpath.isabs(member.linkname) else _safe_name(member.linkname)
+                    if target is None or not _is_under(root, os.path.join(root, target)):
+                        logger.warning("Skipping link outside the archive: %s -> %s", member.name, member.linkname)
+                        continue
+                    member.linkname = target
+                member.name = name
+                yield member
+
+        with tarfile.open(path, "r:*") as tf:
+            tf.extractall(root, members=selected(tf), **kwargs)
+        _make_links(root, links)
+
+
+class PackExtractor(object):
+    def __init__(self, timeout=None):
+        self.content_type = PACK_CONTENT_TYPE
+        self.timeout = timeout
+        self.tmp_dir = None
+        self.created_tmp_dir = False
+
+    def from_path(self, path, extract_dir=None, content_type=None, members=None):
+        self.tmp_dir = tempfile.mkdtemp(prefix="insights-", dir=extract_dir)
+        self.created_tmp_dir = True
+        index = PackIndex(path)
+        try:
+            index.unpack(self.tmp_dir, members=members)
+        finally:
+            index.close()
+        return self
+
 
 class Extraction(object):
     def __init__(self, tmp_dir, content_type):
@@ -73,7 +322,7 @@ class Extraction(object):
 
 
 @contextmanager
-def extract(path, timeout=None, extract_dir=None, content_type=None):
+def extract(path, timeout=None, extract_dir=None, content_type=None, members=None):
     """
     Extract path into a temporary directory in `extract_dir`.
 
@@ -82,17 +331,378 @@ def extract(path, timeout=None, extract_dir=None, content_type=None):
 
     If the extraction takes longer than `timeout` seconds, the temporary path
     is removed, and an exception is raised.
+
+    If `members` is given, a :class:`MemberFilter` or any callable that takes
+    the path of a file in the archive, only the files it returns True for
+    are extracted, with the Python ``tarfile`` or ``zipfile`` modules
+    instead of the ``tar`` or ``unzip`` commands.  `timeout` doesn't apply
+    then.
     """
+    if content_type is None and is_pack(path):
+        content_type = PACK_CONTENT_TYPE
     content_type = content_type or content_type_from_file(path)
-    if content_type == "application/zip":
+    if content_type == PACK_CONTENT_TYPE:
+        extractor = PackExtractor(timeout=timeout)
+    elif content_type == "application/zip":
         extractor = ZipExtractor(timeout=timeout)
     else:
         extractor = TarExtractor(timeout=timeout)
 
     try:
-        ctx = extractor.from_path(path, extract_dir=extract_dir, content_type=content_type)
+        ctx = extractor.from_path(path, extract_dir=extract_dir, content_type=content_type, members=members)
         content_type = extractor.content_type
         yield Extraction(ctx.tmp_dir, content_type)
     finally:
         if extractor.created_tmp_dir:
             fs.remove(extractor.tmp_dir, chmod=True)
+
+
+class ArchiveIndex(PathIndex):
+    """
+    A :class:`insights.core.path_index.PathIndex` of the members of an
+    archive, used in place of an extracted directory.
+
+    The archive is presented as a read-only directory at ``root``, the
+    absolute path of the archive file itself, so the paths of its members are
+    ``os.path.join(root, member)``.
+
+    Member content is only read when it's asked for, and the last
+    `cache_size` bytes read are kept.  Nothing is written to the filesystem
+    unless a real path is asked for with :meth:`realpath`.
+    """
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        super(ArchiveIndex, self).__init__(os.path.abspath(path))
+        self.path = path
+        self.cache_size = cache_size
+        self.tmp_dir = None
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.RLock()
+
+    def getsize(self, path):
+        name = self._member(path)
+        return self._member_size(self._members[name])
+
+    def read(self, path):
+        name = self._member(path)
+        with self._lock:
+            if name in self._cache:
+                self._cache[name] = self._cache.pop(name)
+                return self._cache[name]
+            content = self._read_member(self._members[name])
+            self._keep(name, content)
+        return content
+
+    def open(self, path):
+        return io.BytesIO(self.read(path))
+
+    def _keep(self, name, content):
+        if len(content) > self.cache_size:
+            return
+        self._cache[name] = content
+        self._cached_bytes += len(content)
+        while self._cached_bytes > self.cache_size:
+            _, dropped = self._cache.popitem(last=False)
+            self._cached_bytes -= len(dropped)
+
+    def realpath(self, path):
+        """
+        Writes the member file or the directory at `path` to a temporary
+        directory and returns the path of the copy.  The temporary directory
+        is removed by :meth:`close`.
+        """
+        name = self._relative(path)
+        if name is None or not self.exists(path):
+            raise IOError("No such file in %s: '%s'" % (self.path, path))
+        with self._lock:
+            if self.tmp_dir is None:
+                self.tmp_dir = tempfile.mkdtemp(prefix="insights-")
+            if name in self._members:
+                names = [name]
+            else:
+                prefix = name + "/" if name else ""
+                names = [n for n in self._members if n.startswith(prefix)]
+            for n in names:
+                dst = os.path.join(self.tmp_dir, n)
+                if not os.path.exists(dst):
+                    fs.ensure_path(os.path.dirname(dst))
+                    with open(dst, "wb") as f:
+                        f.write(self.read(os.path.join(self.root, n)))
+            dst = os.path.join(self.tmp_dir, name)
+            if name not in self._members:
+                fs.ensure_path(dst)
+        return dst
+
+    def close(self):
+        if self.tmp_dir is not None:
+            fs.remove(self.tmp_dir, chmod=True)
+            self.tmp_dir = None
+        self._cache.clear()
+        self._cached_bytes = 0
+
+    def _member_size(self, member):
+        raise NotImplementedError()
+
+    def _read_member(self, member):
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return "<%s('%s', %d files)>" % (self.__class__.__name__, self.path, len(self._members))
+
+
+class TarIndex(ArchiveIndex):
+    """
+    An :class:`ArchiveIndex` of a tar archive, built by one sequential pass
+    over the archive.  Compressed archives have to be decompressed completely
+    for that pass, so the content of their members is kept while the cache
+    has room for it.  A member that isn't cached is read again from the
+    archive, which means decompressing from its beginning when the member is
+    before the current position.
+    """
+
+    def __init__(self, path, content_type=None, cache_size=CACHE_SIZE):
+        super(TarIndex, self).__init__(path, cache_size=cache_size)
+        self.content_type = content_type or content_type_from_file(path)
+        if self.content_type not in TarExtractor.TAR_FLAGS:
+            raise InvalidContentType(self.content_type)
+        compressed = self.content_type != "application/x-tar"
+        self._tar = tarfile.open(path, "r:*")
+        for member in self._tar:
+            if fnmatch.fnmatch(member.name, "*/dev/*"):
+                # same as the "--exclude=*/dev/*" of the extraction
+                continue
+            if member.isdir():
+                self._add(member.name, is_dir=True)
+            elif member.issym():
+                self._add(member.name, link=member.linkname)
+            elif member.isfile() or member.islnk():
+                self._add(member.name, member)
+                name = posixpath.normpath(member.name.lstrip("/"))
+                if compressed and self._members.get(name) is member:
+                    if self._cached_bytes + member.size <= self.cache_size:
+                        self._keep(name, self._read_member(member))
+
+    def _member_size(self, member):
+        return member.size
+
+    def _read_member(self, member):
+        with self._lock:
+            return self._tar.extractfile(member).read()
+
+    def close(self):
+        super(TarIndex, self).close()
+        self._tar.close()
+
+
+class ZipIndex(ArchiveIndex):
+    """
+    An :class:`ArchiveIndex` of a zip archive, built from its central
+    directory.
+    """
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        super(ZipIndex, self).__init__(path, cache_size=cache_size)
+        self.content_type = "application/zip"
+        self._zip = zipfile.ZipFile(path)
+        for info in self._zip.infolist():
+            if info.is_dir():
+                self._add(info.filename, is_dir=True)
+            elif stat.S_ISLNK(info.external_attr >> 16):
+                link = self._zip.read(info).decode("utf-8", "surrogateescape")
+                self._add(info.filename, link=link)
+            else:
+                self._add(info.filename, info)
+
+    def _member_size(self, member):
+        return member.file_size
+
+    def _read_member(self, member):
+        with self._lock:
+            return self._zip.read(member)
+
+    def close(self):
+        super(ZipIndex, self).close()
+        self._zip.close()
+
+
+class PackWriter(object):
+    """
+    Writes a pack to `path`: a single file of the content of the members one
+    after the other, followed by a table of their names, offsets and sizes
+    kept as columns.  A :class:`PackIndex` reads the members in place, without
+    unpacking anything.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(PACK_MAGIC)
+        self._table = dict((k, []) for k in ("names", "offsets", "sizes", "links", "targets", "dirs"))
+
+    def _add(self, name, offset):
+        self._table["names"].append(name)
+        self._table["offsets"].append(offset)
+        self._table["sizes"].append(self._file.tell() - offset)
+
+    def add(self, name, content):
+        """
+        Adds a member `name` with the bytes `content`.
+        """
+        offset = self._file.tell()
+        self._file.write(content)
+        self._add(name, offset)
+
+    def add_file(self, name, path):
+        """
+        Adds a member `name` with the content of the file at `path`.
+        """
+        offset = self._file.tell()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self._file)
+        self._add(name, offset)
+
+    def add_link(self, name, target):
+        self._table["links"].append(name)
+        self._table["targets"].append(target)
+
+    def add_dir(self, name):
+        self._table["dirs"].append(name)
+
+    def close(self):
+        if self._file.closed:
+            return
+        table = json.dumps(self._table, separators=(",", ":")).encode("utf-8")
+        offset = self._file.tell()
+        self._file.write(table)
+        self._file.write(_PACK_FOOTER.pack(offset, len(table), PACK_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def is_pack(path):
+    """
+    Returns whether the file at `path` is a pack written by
+    :class:`PackWriter`.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(PACK_MAGIC)) == PACK_MAGIC
+    except (IOError, OSError):
+        return False
+
+
+class PackIndex(ArchiveIndex):
+    """
+    An :class:`ArchiveIndex` of a pack written by :class:`PackWriter`.  The
+    pack is mapped into memory, so reading a member costs no system call and
+    :meth:`view` returns the content of a member without copying it.  Since
+    the content is already in memory, none of it is cached.
+    """
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        super(PackIndex, self).__init__(path, cache_size=cache_size)
+        self.content_type = PACK_CONTENT_TYPE
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            size = len(self._map)
+            if size < len(PACK_MAGIC) + _PACK_FOOTER.size or self._map[:len(PACK_MAGIC)] != PACK_MAGIC:
+                raise InvalidContentType(self.content_type)
+            offset, length, magic = _PACK_FOOTER.unpack(self._map[size - _PACK_FOOTER.size:])
+            if magic != PACK_MAGIC:
+                raise InvalidContentType(self.content_type)
+            table = json.loads(self._map[offset:offset + length].decode("utf-8"))
+        except Exception:
+            self.close()
+            raise
+
+        for name in table["dirs"]:
+            self._add(name, is_dir=True)
+        for name, target in zip(table["links"], table["targets"]):
+            self._add(name, link=target)
+        for name, offset, size in zip(table["names"], table["offsets"], table["sizes"]):
+            self._add(name, (offset, size))
+
+    def read(self, path):
+        return self._read_member(self._members[self._member(path)])
+
+    def view(self, path):
+        """
+        Returns a ``memoryview`` of the content of the member at `path`.  It
+        can't be used after the index is closed.
+        """
+        offset, size = self._members[self._member(path)]
+        return memoryview(self._map)[offset:offset + size]
+
+    def unpack(self, dst, members=None):
+        """
+        Writes the members of the pack to the directory `dst`, only the files
+        selected by `members` if it's given.  Symbolic links that point outside
+        the pack are left out.
+        """
+        root = os.path.realpath(dst)
+        for name in self._dirs:
+            fs.ensure_path(os.path.join(root, name))
+        for name, (offset, size) in self._members.items():
+            if members is not None and not members(name):
+                continue
+            path = os.path.join(root, name)
+            if not _is_under(root, os.path.dirname(path)):
+                logger.warning("Skipping member outside the pack: %s", name)
+                continue
+            with open(path, "wb") as f:
+                f.write(self._map[offset:offset + size])
+        # the targets are kept relative to the root
+        _make_links(root, [
+            (name, posixpath.relpath(target, posixpath.dirname(name) or "."))
+            for name, target in self._links.items() if target is not None
+        ])
+
+    def _member_size(self, member):
+        return member[1]
+
+    def _read_member(self, member):
+        offset, size = member
+        return self._map[offset:offset + size]
+
+    def close(self):
+        super(PackIndex, self).close()
+        if getattr(self, "_map", None) is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # a view is still in use, the map is closed when it's freed
+                pass
+        self._file.close()
+
+
+@contextmanager
+def open_archive(path, content_type=None, cache_size=CACHE_SIZE):
+    """
+    Indexes the archive at `path` instead of extracting it.
+
+    Yields an :class:`ArchiveIndex` which can be passed to
+    :func:`insights.core.hydration.create_context` in place of the path of an
+    extracted directory.  The index is closed and any file it wrote is removed
+    on exit.
+    """
+    if content_type is None and is_pack(path):
+        content_type = PACK_CONTENT_TYPE
+    content_type = content_type or content_type_from_file(path)
+    if content_type == PACK_CONTENT_TYPE:
+        index = PackIndex(path, cache_size=cache_size)
+    elif content_type == "application/zip":
+        index = ZipIndex(path, cache_size=cache_size)
+    else:
+        index = TarIndex(path, content_type=content_type, cache_size=cache_size)
+
+    try:
+        yield index
+    finally:
+        index.close()
@@ -147,16 +147,41 @@ class ExecutionContextMeta(type):
     # Remember that contexts are tried *in reverse order* so that they
     # may be overridden by just loading a plugin.
     @classmethod
-    def identify(cls, files):
+    def identify(cls, files, index=None):
+        """
+        Returns the root and the class of the context the `files` belong to.
+
+        When the :class:`insights.core.path_index.PathIndex` of the files is
+        given, the markers of all the contexts are looked up with one pass over
+        its directories instead of scanning the files for each context.
+        """
+        roots = cls.find_markers(index) if index is not None else {}
         for e in reversed(cls.registry):
-            root, ctx = e.handles(files)
+            root, ctx = e.handles_markers(files, roots)
             if ctx is not None:
                 return (root, ctx)
         return (None, None)
 
+    @classmethod
+    def find_markers(cls, index, contexts=None):
+        """
+        Returns a dictionary of the markers of the `contexts`, the registered
+        contexts by default, to the directories in the `index` that contain
+        them.  Contexts that override ``handles`` are left out.
+        """
+        markers = set(
+            c.marker
+            for c in contexts or cls.registry
+            if c.marker and c.handles.__func__ is ExecutionContext.handles.__func__
+        )
+        return index.find_markers(markers) if markers else {}
+
 
 class ExecutionContext(object, metaclass=ExecutionContextMeta):
     marker = None
+    # the insights.core.path_index.PathIndex the files are looked up and read
+    # with, instead of the filesystem
+    index = None
 
     def __init__(self, root="/", timeout=None, all_files=None):
         self.root = root
@@ -177,15 +202,24 @@ class ExecutionContext(object, metaclass=ExecutionContextMeta):
                 if f.endswith(m) or f[i + len(m)] == sep:
                     root = os.path.dirname(f[: i + 1])
                     marker_root.add(root)
-        if len(marker_root) == 1:
-            return (marker_root.pop(), cls)
-        if len(marker_root) > 1:
+        return cls._closest_root(marker_root)
+
+    @classmethod
+    def handles_markers(cls, files, roots):
+        """
+        Same as :meth:`handles`, but uses the directories of the marker in
+        `roots`, as returned by :meth:`ExecutionContextMeta.find_markers`,
+        when they were looked up.
+        """
+        if cls.marker in roots and cls.handles.__func__ is ExecutionContext.handles.__func__:
+            return cls._closest_root(roots[cls.marker]) if files else (None, None)
+        return cls.handles(files)
+
+    @classmethod
+    def _closest_root(cls, marker_root):
+        if marker_root:
             # when more marker found, return the one which is closest to root
-            closest_root = marker_root.pop()
-            for left_one in marker_root:
-                if len(left_one) < len(closest_root):
-                    closest_root = left_one
-            return (closest_root, cls)
+            return (min(marker_root, key=len), cls)
         return (None, None)
 
     def check_output(self, cmd, timeout=None, keep_rc=False, env=None, signum=None):
@@ -49,8 +49,11 @@ instead of at the end.
 
 from __future__ import print_function
 
+import hashlib
+import heapq
 import importlib
 import inspect
+import itertools
 import json
 import logging
 import os
@@ -66,7 +69,7 @@ from functools import reduce as _reduce
 from insights.contrib.toposort import toposort_flatten
 from insights.core.blacklist import BLACKLISTED_SPECS
 from insights.core.context import SerializedArchiveContext
-from insights.core.exceptions import BlacklistedSpec, MissingRequirements, SkipComponent
+from insights.core.exceptions import BlacklistedSpec, MissingRequirements, SkipComponent, TimeoutException
 from insights.util import defaults, enum, KeyPassingDefaultDict
 
 log = logging.getLogger(__name__)
@@ -86,7 +89,56 @@ COMPONENTS = defaultdict(lambda: defaultdict(set))
 DELEGATES = {}
 HIDDEN = set()
 IGNORE = defaultdict(set)
-ENABLED = defaultdict(lambda: True)
+
+_STAMPS = itertools.count(1)
+
+
+class EnabledMap(defaultdict):
+    """
+    The ``defaultdict`` that backs :data:`ENABLED`. Every change stamps it with
+    a new ``version`` so cached :class:`ExecutionPlan` objects can tell when
+    the enabled state they were compiled against is stale. Looking up a
+    component that isn't in the map doesn't count as a change.
+
+    Args:
+        default (bool): whether components not explicitly configured are
+            enabled.
+    """
+
+    def __init__(self, default=True):
+        super(EnabledMap, self).__init__(lambda: default)
+        self.version = next(_STAMPS)
+
+    def __missing__(self, key):
+        value = self.default_factory()
+        dict.__setitem__(self, key, value)
+        return value
+
+    def _touch(self):
+        self.version = next(_STAMPS)
+
+    def __setitem__(self, key, value):
+        super(EnabledMap, self).__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super(EnabledMap, self).__delitem__(key)
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super(EnabledMap, self).update(*args, **kwargs)
+        self._touch()
+
+    def pop(self, *args):
+        self._touch()
+        return super(EnabledMap, self).pop(*args)
+
+    def clear(self):
+        super(EnabledMap, self).clear()
+        self._touch()
+
+
+ENABLED = EnabledMap()
 
 
 def set_enabled(component, enabled=True):
@@ -176,13 +228,8 @@ def get_component(name):
     return COMPONENT_IMPORT_CACHE[name]
 
 
-def _find_component(name):
-    for d in DELEGATES:
-        if get_name(d) == name:
-            return d
-
-
-COMPONENTS_BY_NAME = KeyPassingDefaultDict(_find_component)
+COMPONENTS_BY_NAME = {}
+_COMPONENTS_BY_NAME_KEY = None
 
 
 def get_component_by_name(name):
@@ -190,7 +237,15 @@ def get_component_by_name(name):
     Look up a component by its fully qualified name. Return None if the
     component hasn't been loaded.
     """
-    return COMPONENTS_BY_NAME[name]
+    global COMPONENTS_BY_NAME, _COMPONENTS_BY_NAME_KEY
+    key = (id(DELEGATES), len(DELEGATES))
+    if key != _COMPONENTS_BY_NAME_KEY:
+        # Components were loaded since the names were mapped.  The names are
+        # mapped lazily since datasources of spec sets are only named after
+        # they're registered.  The first component with a name wins.
+        COMPONENTS_BY_NAME = dict((get_name(d), d) for d in reversed(list(DELEGATES)))
+        _COMPONENTS_BY_NAME_KEY = key
+    return COMPONENTS_BY_NAME.get(name)
 
 
 @defaults(None)
@@ -617,6 +672,7 @@ def _register_component(delegate):
 
     MODULE_NAMES[component] = get_module_name(component)
     BASE_MODULE_NAMES[component] = get_base_module_name(component)
+    invalidate_execution_plans()
 
 
 class ComponentType(object):
@@ -788,7 +844,7 @@ class ComponentType(object):
         Gets required and at-least-one dependencies not provided by the broker.
         """
         missing_required = [r for r in self.requires if r not in broker]
-        missing_at_least_one = [d for d in self.at_least_one if not set(d).intersection(broker)]
+        missing_at_least_one = [d for d in self.at_least_one if not any(i in broker for i in d)]
         if missing_required or missing_at_least_one:
             return (missing_required, missing_at_least_one)
 
@@ -803,6 +859,14 @@ class ComponentType(object):
             raise MissingRequirements(missing)
         return self.invoke(broker)
 
+    def get_timeout(self, broker):
+        """
+        Returns the seconds :meth:`ExecutionPlan.run_parallel` waits for the
+        component before it records a :class:`TimeoutException` for it, or
+        ``None`` to wait as long as it takes.
+        """
+        return None
+
     def get_dependencies(self):
         return self.dependencies
 
@@ -815,6 +879,7 @@ class ComponentType(object):
 
         DEPENDENCIES[self.component].add(dep)
         COMPONENTS[group][self.component].add(dep)
+        invalidate_execution_plans()
 
 
 class Broker(object):
@@ -848,6 +913,11 @@ class Broker(object):
             the execution time here is the sum of their individual execution
             times.
         store_skips (bool): Weather to store skips in the broker or not.
+        parser_cache (ParserCache): a
+            :class:`insights.core.parser_cache.ParserCache` that parsers are
+            looked up in before they're invoked. None by default.
+        fingerprints (dict): component -> the :func:`fingerprint` of its
+            value, for the components evaluated by :func:`run_changed`.
     """
 
     def __init__(self, seed_broker=None):
@@ -857,6 +927,8 @@ class Broker(object):
         self.tracebacks = {}
         self.exec_times = {}
         self.store_skips = False
+        self.parser_cache = seed_broker.parser_cache if seed_broker else None
+        self.fingerprints = {}
 
         self.observers = defaultdict(set)
         if seed_broker is not None:
@@ -982,6 +1054,60 @@ class Broker(object):
         )
 
 
+class LazyBroker(Broker):
+    """
+    A :class:`Broker` that evaluates components when they're asked for instead
+    of ahead of time. Looking up a component with ``broker[component]`` or
+    :meth:`get` evaluates it and its transitive dependencies if that hasn't
+    been attempted yet. Nothing else is evaluated, so only the parsers and
+    combiners a caller actually reads are run.
+
+    ``component in broker`` doesn't trigger evaluation. It only reports whether
+    the component has a value so far.
+
+    .. code-block:: python
+
+        broker = dr.LazyBroker()
+        broker[HostArchiveContext] = ctx
+        rpms = broker[InstalledRpms]  # evaluates only what InstalledRpms needs
+
+    Attributes:
+        attempted (set): components this broker has evaluated on demand.
+    """
+
+    def __init__(self, seed_broker=None):
+        super(LazyBroker, self).__init__(seed_broker)
+        self.attempted = set()
+
+    def _is_attempted(self, component):
+        return (
+            component in self.attempted
+            or component in self.instances
+            or component in self.exceptions
+            or component in self.missing_requirements
+        )
+
+    def evaluate(self, component):
+        """
+        Evaluates ``component`` and whatever it depends on that hasn't been
+        attempted yet.
+        """
+        if component not in DELEGATES or self._is_attempted(component):
+            return
+
+        plan = get_execution_plan(component)
+        registry_points = plan.get_registry_points
+        for c, delegate in zip(plan.order, plan.delegates):
+            if not self._is_attempted(c):
+                self.attempted.add(c)
+                _run_component(c, delegate, self, registry_points)
+
+    def __getitem__(self, component):
+        if component not in self.instances:
+            self.evaluate(component)
+        return super(LazyBroker, self).__getitem__(component)
+
+
 def get_missing_requirements(func, requires, d):
     """
     .. deprecated:: 1.x
@@ -1070,54 +1196,560 @@ def determine_components(components):
 _determine_components = determine_components
 
 
+def _format_traceback(ex, broker):
+    # Tracebacks are expensive and are never kept for missing requirements or
+    # for skips unless the broker asks for them.
+    if isinstance(ex, MissingRequirements):
+        return None
+    if isinstance(ex, SkipComponent) and not broker.store_skips:
+        return None
+    return traceback.format_exc()
+
+
+def _record_exception(component, ex, tb, broker, registry_points=get_registry_points):
+    if isinstance(ex, BlacklistedSpec):
+        for x in registry_points(component):
+            BLACKLISTED_SPECS.append(str(x).split('.')[-1])
+        broker.add_exception(component, ex, tb)
+    elif isinstance(ex, MissingRequirements):
+        if log.isEnabledFor(logging.DEBUG):
+            name = get_name(component)
+            reqs = stringify_requirements(ex.requirements)
+            log.debug("%s missing requirements %s" % (name, reqs))
+        broker.add_exception(component, ex)
+    elif isinstance(ex, SkipComponent):
+        if broker.store_skips:
+            log.debug(ex)
+            broker.add_exception(component, ex, tb)
+    else:
+        log.debug(ex)
+        broker.add_exception(component, ex, tb)
+        for reg_spec in registry_points(component):
+            broker.add_exception(reg_spec, ex, tb)
+
+
+def _run_component(component, delegate, broker, registry_points=get_registry_points):
+    """
+    Attempts a single component with the broker. ``delegate`` is ``None`` for
+    components that shouldn't be evaluated; their execution time is still
+    recorded and observers still fire.
+    """
+    start = time.time()
+    try:
+        if delegate is not None and component not in broker:
+            log.info("Trying %s" % get_name(component))
+            result = delegate.process(broker)
+            broker[component] = result
+    except Exception as ex:
+        _record_exception(component, ex, _format_traceback(ex, broker), broker, registry_points)
+    finally:
+        broker.exec_times[component] = time.time() - start
+        broker.fire_observers(component)
+
+
+def _attempt_component(component, delegate, broker):
+    """
+    The part of a component evaluation that :meth:`ExecutionPlan.run_parallel`
+    runs in a worker. Nothing is written to the broker here; the result, any
+    exception with its traceback, and the execution time are returned so the
+    coordinating thread can record them.
+    """
+    start = time.time()
+    try:
+        log.info("Trying %s" % get_name(component))
+        return delegate.process(broker), None, None, time.time() - start
+    except Exception as ex:
+        return None, ex, _format_traceback(ex, broker), time.time() - start
+
+
+def _update_fingerprint(h, value):
+    if value is None or isinstance(value, (bool, int, float)):
+        h.update(repr(value).encode("utf-8"))
+        return
+    h.update(type(value).__name__.encode("utf-8"))
+    if isinstance(value, str):
+        h.update(value.encode("utf-8", "surrogateescape"))
+    elif isinstance(value, bytes):
+        h.update(value)
+    elif isinstance(value, (list, tuple)):
+        h.update(str(len(value)).encode("utf-8"))
+        for v in value:
+            _update_fingerprint(h, v)
+    elif isinstance(value, (set, frozenset)):
+        h.update("".join(sorted(_fingerprint(v) for v in value)).encode("utf-8"))
+    elif isinstance(value, dict):
+        items = sorted(_fingerprint(k) + _fingerprint(v) for k, v in value.items())
+        h.update("".join(items).encode("utf-8"))
+    elif callable(getattr(value, "fingerprint", None)) and not isinstance(value, type):
+        digest = value.fingerprint()
+        if digest is None:
+            raise TypeError("No fingerprint for %r" % value)
+        h.update(digest.encode("utf-8"))
+    else:
+        raise TypeError("Can't fingerprint %s" % type(value).__name__)
+
+
+def _fingerprint(value):
+    h = hashlib.sha256()
+    _update_fingerprint(h, value)
+    return h.hexdigest()
+
+
+def fingerprint(value):
+    """
+    Returns a digest of a component's value that's the same for equal values,
+    or ``None`` if one can't be computed.  Strings, bytes, numbers, and lists,
+    tuples, sets, and dictionaries of them are supported, along with objects
+    that have a ``fingerprint()`` method, like the content providers returned
+    by datasources.
+    """
+    try:
+        return _fingerprint(value)
+    except (TypeError, RecursionError):
+        return None
+
+
+def _attempted(component, broker):
+    return (
+        component in broker.instances
+        or component in broker.exceptions
+        or component in broker.missing_requirements
+        or component in broker.exec_times
+    )
+
+
+def _changed(component, broker, previous):
+    """
+    Returns whether the value of `component` in `broker` differs from the one
+    in the `previous` broker.  Components that are missing from both haven't
+    changed.
+    """
+    if component not in broker:
+        return component in previous
+    if component not in previous:
+        return True
+    new = broker.fingerprints[component]
+    if new is None:
+        return True
+    old = previous.fingerprints.get(component)
+    if old is None:
+        old = fingerprint(previous[component])
+    return new != old
+
+
+def _reuse_component(component, broker, previous):
+    """
+    Copies the result of `component` from the `previous` broker, then fires
+    the observers like :func:`_run_component` does.
+    """
+    try:
+        if component in previous.instances and component not in broker:
+            broker[component] = previous.instances[component]
+        if component in previous.fingerprints:
+            broker.fingerprints[component] = previous.fingerprints[component]
+        if component in previous.missing_requirements:
+            broker.missing_requirements[component] = previous.missing_requirements[component]
+        if component not in broker.exceptions:
+            for ex in previous.exceptions.get(component, ()):
+                broker.add_exception(component, ex, previous.tracebacks.get(ex))
+    finally:
+        broker.exec_times[component] = 0.0
+        broker.fire_observers(component)
+
+
 def run_components(ordered_components, components, broker):
     """
     Runs a list of preordered components using the provided broker.
 
     This function allows callers to order components themselves and cache the
-    result so they don't incur the toposort overhead on every run.
+    result so they don't incur the toposort overhead on every run. See
+    :class:`ExecutionPlan` for a cache that's managed for you.
     """
     for component in ordered_components:
-        start = time.time()
-        try:
-            if (
-                component not in broker
-                and component in components
-                and component in DELEGATES
-                and is_enabled(component)
-            ):
-                log.info("Trying %s" % get_name(component))
-                result = DELEGATES[component].process(broker)
-                broker[component] = result
-        except BlacklistedSpec as bs:
-            for x in get_registry_points(component):
-                BLACKLISTED_SPECS.append(str(x).split('.')[-1])
-            broker.add_exception(component, bs, traceback.format_exc())
-        except MissingRequirements as mr:
-            if log.isEnabledFor(logging.DEBUG):
-                name = get_name(component)
-                reqs = stringify_requirements(mr.requirements)
-                log.debug("%s missing requirements %s" % (name, reqs))
-            broker.add_exception(component, mr)
-        except SkipComponent as sc:
-            if broker.store_skips:
-                log.debug(sc)
-                broker.add_exception(component, sc, traceback.format_exc())
-            else:
-                pass
-        except Exception as ex:
-            log.debug(ex)
-            tb = traceback.format_exc()
-            broker.add_exception(component, ex, tb)
-            for reg_spec in get_registry_points(component):
-                broker.add_exception(reg_spec, ex, tb)
-        finally:
-            broker.exec_times[component] = time.time() - start
-            broker.fire_observers(component)
+        delegate = None
+        if component in components and component in DELEGATES and is_enabled(component):
+            delegate = DELEGATES[component]
+        _run_component(component, delegate, broker)
 
     return broker
 
 
+class ExecutionPlan(object):
+    """
+    A dependency graph compiled into the order its components are evaluated.
+    The toposort, delegate lookups, and enabled checks happen once when the
+    plan is built, so the same plan can run any number of brokers. Plans
+    should be treated as read only. Use :func:`get_execution_plan` to get a
+    cached plan instead of creating one directly.
+
+    Args:
+        graph (dict): a dependency graph like the ones returned by
+            :func:`determine_components`.
+
+    Attributes:
+        graph (dict): the dependency graph the plan was compiled from.
+        order (list): every component of the graph in evaluation order.
+        delegates (list): the delegate of each component in ``order``, or
+            ``None`` if the component isn't loaded, is disabled, or only shows
+            up as a dependency of something in the graph.
+        index (dict): component -> its position in ``order``.
+        dependencies (list): the positions in ``order`` of the dependencies
+            of each component in ``order``.
+        dependents (list): the positions in ``order`` of the components that
+            depend on each component in ``order``.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.order = run_order(graph)
+        self.index = dict((c, i) for i, c in enumerate(self.order))
+        self.delegates = [
+            DELEGATES[c] if c in graph and c in DELEGATES and is_enabled(c) else None
+            for c in self.order
+        ]
+
+        index = self.index
+        self.dependencies = [
+            tuple(index[d] for d in graph.get(c, ()) if d in index) for c in self.order
+        ]
+        dependents = [[] for _ in self.order]
+        for i, deps in enumerate(self.dependencies):
+            for d in deps:
+                dependents[d].append(i)
+        self.dependents = [tuple(d) for d in dependents]
+        self._registry_points = {}
+        self._priorities = None
+
+    def __len__(self):
+        return len(self.order)
+
+    def get_registry_points(self, component):
+        """
+        Same as :func:`get_registry_points` but remembered for the life of the
+        plan.
+        """
+        try:
+            return self._registry_points[component]
+        except KeyError:
+            points = get_registry_points(component)
+            self._registry_points[component] = points
+            return points
+
+    def run(self, broker=None):
+        """
+        Evaluates the plan.
+
+        Args:
+            broker (Broker): Optionally pass a broker to use for evaluation.
+                One is created by default.
+
+        Returns:
+            Broker: The broker after evaluation.
+        """
+        broker = broker or Broker()
+        registry_points = self.get_registry_points
+        for component, delegate in zip(self.order, self.delegates):
+            _run_component(component, delegate, broker, registry_points)
+        return broker
+
+    def run_changed(self, broker=None, previous=None):
+        """
+        Evaluates the plan, reusing the results of the `previous` broker for
+        the components that only depend on components whose values haven't
+        changed since then.
+
+        Components without dependencies, like datasources seeded in the
+        broker, and the dependents of a changed component are evaluated, and
+        the :func:`fingerprint` of each value is kept in
+        ``broker.fingerprints``.  A value changes when its fingerprint
+        differs from the one in the `previous` broker, or when it can't be
+        computed, so a new context changes and the datasources depending on it
+        are evaluated again.  Only their downstream cone is evaluated past
+        that.
+
+        Fingerprinting a datasource reads all of its content.  Files are
+        digested in chunks without being loaded, see
+        :meth:`insights.core.spec_factory.FileProvider.fingerprint`, other
+        providers are loaded.
+
+        Reused instances are shared with the `previous` broker, and their
+        execution times are recorded as zero.
+
+        Args:
+            broker (Broker): Optionally pass a broker to use for evaluation.
+                One is created by default.
+            previous (Broker): the broker of an earlier evaluation, for
+                instance one loaded by
+                :meth:`insights.core.serde.Hydration.hydrate`.  Everything is
+                evaluated if it's ``None``.
+
+        Returns:
+            Broker: The broker after evaluation.
+        """
+        broker = broker or Broker()
+        registry_points = self.get_registry_points
+        dirty = [previous is None] * len(self.order)
+        for i, (component, delegate) in enumerate(zip(self.order, self.delegates)):
+            if not dirty[i] and self.dependencies[i] and _attempted(component, previous):
+                _reuse_component(component, broker, previous)
+                continue
+            _run_component(component, delegate, broker, registry_points)
+            if component in broker:
+                broker.fingerprints[component] = fingerprint(broker[component])
+            if previous is not None and _changed(component, broker, previous):
+                for d in self.dependents[i]:
+                    dirty[d] = True
+        return broker
+
+    @property
+    def priorities(self):
+        """
+        list: The "prio" of each component in ``order``, taken from its
+        registry point and lowered to the smallest prio of its dependencies
+        so a component never outranks something it depends on.
+        """
+        if self._priorities is None:
+            prios = []
+            for i, c in enumerate(self.order):
+                points = self.get_registry_points(c)
+                prio = getattr(next(iter(points or [object])), "prio", 0)
+                for d in self.dependencies[i]:
+                    prio = min(prio, prios[d])
+                prios.append(prio)
+            self._priorities = prios
+        return self._priorities
+
+    def _get_slots(self, limits):
+        slots = []
+        for delegate in self.delegates:
+            slot = None
+            if delegate is not None:
+                for t in limits:
+                    if issubclass(delegate.type, t) and (
+                        slot is None or issubclass(t, slot)
+                    ):
+                        slot = t
+            slots.append(slot)
+        return slots
+
+    def run_parallel(self, broker=None, pool=None, limits=None):
+        """
+        Evaluates the plan with a pool of workers. Every component is handed
+        to the pool as soon as all of its dependencies have been attempted, so
+        independent components run concurrently even when they're part of the
+        same connected graph. Components with a lower "prio" aren't started
+        until everything with a higher one has finished.
+
+        Workers only read from the broker. Results, exceptions, and execution
+        times are recorded, and observers are fired, by the calling thread, so
+        observers never run concurrently.
+
+        Signal based timeouts only work in the main thread, so a component
+        that runs longer than its :meth:`ComponentType.get_timeout` gets a
+        :class:`TimeoutException` instead, and evaluation goes on without it.
+        Its worker can't be interrupted, so whatever it returns later is
+        dropped.
+
+        Args:
+            broker (Broker): Optionally pass a broker to use for evaluation.
+                One is created by default.
+            pool (concurrent.futures.Executor): the pool components are
+                submitted to. A ``ThreadPoolExecutor`` is expected since
+                brokers and contexts generally can't be pickled. If ``None``,
+                the plan is evaluated serially with :meth:`run`.
+            limits (dict): :class:`ComponentType` -> the maximum number of
+                components of that type (or its subclasses) allowed to run at
+                the same time. The most specific type applies. Types that
+                aren't listed are only bounded by the pool.
+
+        Returns:
+            Broker: The broker after evaluation.
+
+        Raises:
+            ValueError: if a limit is less than 1, since the components it
+                applies to could never run.
+        """
+        limits = limits or {}
+        for t, limit in limits.items():
+            if limit < 1:
+                raise ValueError("The limit for %s must be at least 1, not %r." % (get_name(t), limit))
+
+        broker = broker or Broker()
+        if pool is None:
+            return self.run(broker)
+
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        slots = self._get_slots(limits)
+        prios = self.priorities
+        registry_points = self.get_registry_points
+
+        waiting = [len(d) for d in self.dependencies]
+        unfinished = defaultdict(int)
+        for p in prios:
+            unfinished[p] += 1
+        ready = [(-prios[i], i) for i, w in enumerate(waiting) if not w]
+        heapq.heapify(ready)
+        running = defaultdict(int)
+        held = defaultdict(list)
+        in_flight = {}
+        deadlines = {}
+
+        def finish(i):
+            unfinished[prios[i]] -= 1
+            for d in self.dependents[i]:
+                waiting[d] -= 1
+                if not waiting[d]:
+                    heapq.heappush(ready, (-prios[d], d))
+
+        while ready or in_flight:
+            while ready:
+                top = max(p for p, n in unfinished.items() if n)
+                neg_prio, i = ready[0]
+                if -neg_prio < top:
+                    break
+                heapq.heappop(ready)
+                component, delegate = self.order[i], self.delegates[i]
+                if delegate is None or component in broker:
+                    _run_component(component, delegate, broker, registry_points)
+                    finish(i)
+                    continue
+                slot = slots[i]
+                if slot is not None and running[slot] >= limits[slot]:
+                    held[slot].append((neg_prio, i))
+                    continue
+                running[slot] += 1
+                future = pool.submit(_attempt_component, component, delegate, broker)
+                in_flight[future] = i
+                timeout = delegate.get_timeout(broker)
+                if timeout is not None:
+                    deadlines[future] = (time.time() + timeout, timeout)
+
+            if not in_flight:
+                break
+
+            timeout = None
+            if deadlines:
+                timeout = max(min(d for d, _ in deadlines.values()) - time.time(), 0)
+            done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            now = time.time()
+            expired = [f for f, (d, _) in deadlines.items() if f not in done and d <= now]
+            for future in list(done) + expired:
+                i = in_flight.pop(future)
+                _, timeout = deadlines.pop(future, (None, None))
+                component = self.order[i]
+                if future in done:
+                    result, ex, tb, elapsed = future.result()
+                else:
+                    log.warning("%s timed out after %s seconds" % (get_name(component), timeout))
+                    result, tb, elapsed = None, None, timeout
+                    ex = TimeoutException(
+                        "{0} timed out after {1} seconds!".format(get_name(component), timeout)
+                    )
+                try:
+                    if ex is None:
+                        broker[component] = result
+                    else:
+                        _record_exception(component, ex, tb, broker, registry_points)
+                except Exception as e:
+                    _record_exception(component, e, traceback.format_exc(), broker, registry_points)
+                finally:
+                    broker.exec_times[component] = elapsed
+                    broker.fire_observers(component)
+
+                slot = slots[i]
+                running[slot] -= 1
+                for item in held.pop(slot, []):
+                    heapq.heappush(ready, item)
+                finish(i)
+
+        return broker
+
+
+_EXECUTION_PLANS = {}
+MAX_CACHED_PLANS = 64
+"""
+The number of compiled :class:`ExecutionPlan` objects to keep around.
+"""
+
+
+def invalidate_execution_plans():
+    """
+    Throws away every cached :class:`ExecutionPlan`. It's called automatically
+    whenever a component is registered or gains a dependency.
+    """
+    _EXECUTION_PLANS.clear()
+
+
+def _enabled_state():
+    version = getattr(ENABLED, "version", None)
+    if version is not None:
+        return version
+    # ENABLED was replaced with something that doesn't track its changes
+    return frozenset(k for k, v in ENABLED.items() if not v)
+
+
+def _plan_key(components):
+    try:
+        if isinstance(components, dict):
+            for group, graph in COMPONENTS.items():
+                if graph is components:
+                    # The cached plan keeps the graph alive, so its id can't
+                    # be reused by a replacement group dict.
+                    return ("group", group, id(graph))
+            return ("graph", frozenset((k, frozenset(v)) for k, v in components.items()))
+        if isinstance(components, (list, set)):
+            return ("components", frozenset(components))
+        hash(components)
+        return ("component", components)
+    except TypeError:
+        return None
+
+
+def get_execution_plan(components=None):
+    """
+    Returns the :class:`ExecutionPlan` for ``components``, compiling it if it
+    isn't already cached. Plans are keyed by the set of components and the
+    enabled state of :data:`ENABLED`, so changes made with
+    :func:`set_enabled` or by loading new components are always picked up.
+
+    Keyword Args:
+        components: Can be one of a dependency graph, a single component, a
+            component group, or a component type. Defaults to the components
+            in ``GROUPS.single``.
+
+    Returns:
+        ExecutionPlan: the compiled plan.
+    """
+    components = components or COMPONENTS[GROUPS.single]
+    key = _plan_key(components)
+    if key is None:
+        return ExecutionPlan(determine_components(components))
+
+    key = (key, _enabled_state())
+    plan = _EXECUTION_PLANS.get(key)
+    if plan is None:
+        plan = ExecutionPlan(determine_components(components))
+        if len(_EXECUTION_PLANS) >= MAX_CACHED_PLANS:
+            _EXECUTION_PLANS.pop(next(iter(_EXECUTION_PLANS)), None)
+        _EXECUTION_PLANS[key] = plan
+    return plan
+
+
+def _get_plan(components, broker):
+    components = components or COMPONENTS[GROUPS.single]
+    # If a SerializedArchiveContext then data found in the archive's
+    # ./meta_data directory are prepopulated in the broker as Specs so
+    # no need to collect them again
+    if broker.get(SerializedArchiveContext) is not None:
+        components = dict(determine_components(components))
+        for comp in list(components):
+            if comp in broker:
+                for dep in components.get(comp, ()):
+                    components.pop(dep, None)
+    return get_execution_plan(components)
+
+
 def run(components=None, broker=None):
     """
     Executes components in an order that satisfies their dependency
@@ -1134,18 +1766,55 @@ def run(components=None, broker=None):
     Returns:
         Broker: The broker after evaluation.
     """
-    components = components or COMPONENTS[GROUPS.single]
-    components = determine_components(components)
     broker = broker or Broker()
-    # If a SerializedArchiveContext then data found in the archive's
-    # ./meta_data directory are prepopulated in the broker as Specs so
-    # no need to collect them again
-    if broker.get(SerializedArchiveContext) is not None:
-        for comp in list(components):
-            if comp in broker:
-                for dep in components[comp]:
-                    components.pop(dep, None)
-    return run_components(run_order(components), components, broker)
+    return _get_plan(components, broker).run(broker)
+
+
+def run_parallel(components=None, broker=None, pool=None, limits=None):
+    """
+    Executes components concurrently as soon as their dependencies have been
+    attempted. See :meth:`ExecutionPlan.run_parallel`.
+
+    Keyword Args:
+        components: Can be one of a dependency graph, a single component, a
+            component group, or a component type. If it's anything other than a
+            dependency graph, the appropriate graph is built for you and before
+            evaluation.
+        broker (Broker): Optionally pass a broker to use for evaluation. One is
+            created by default, but it's often useful to seed a broker with an
+            initial dependency.
+        pool (concurrent.futures.Executor): the pool used to run components.
+            Components run serially if it's ``None``.
+        limits (dict): :class:`ComponentType` -> the maximum number of
+            components of that type allowed to run at the same time.
+    Returns:
+        Broker: The broker after evaluation.
+    """
+    broker = broker or Broker()
+    return _get_plan(components, broker).run_parallel(broker, pool=pool, limits=limits)
+
+
+def run_changed(components=None, broker=None, previous=None):
+    """
+    Executes components like :func:`run`, but only the ones downstream of a
+    datasource whose content changed since the `previous` broker was
+    evaluated. The results of the others are reused. See
+    :meth:`ExecutionPlan.run_changed`.
+
+    Keyword Args:
+        components: Can be one of a dependency graph, a single component, a
+            component group, or a component type. If it's anything other than a
+            dependency graph, the appropriate graph is built for you and before
+            evaluation.
+        broker (Broker): Optionally pass a broker to use for evaluation. One is
+            created by default, but it's often useful to seed a broker with an
+            initial dependency.
+        previous (Broker): the broker of an earlier evaluation.
+    Returns:
+        Broker: The broker after evaluation.
+    """
+    broker = broker or Broker()
+    return _get_plan(components, broker).run_changed(broker, previous=previous)
 
 
 def generate_incremental(components=None, broker=None):
@@ -37,11 +37,12 @@ Filtering can be disabled globally by setting the environment variable
 filtered even if filters are defined for them.
 """
 
+import io
 import os
 import pkgutil
 import yaml as ser
 
-from collections import defaultdict
+from collections import defaultdict, deque
 
 import insights
 
@@ -49,9 +50,170 @@ from insights.core import dr, plugins
 from insights.util import parse_bool
 
 _CACHE = {}
+_MATCHERS = {}
 FILTERS = defaultdict(dict)
 ENABLED = parse_bool(os.environ.get("INSIGHTS_FILTERS_ENABLED"), default=True)
 MAX_MATCH = 10000
+AUTOMATON_THRESHOLD = 100
+"""
+The number of filters at which a :class:`FilterMatcher` switches from one
+substring test per filter to a single pass automaton.
+"""
+
+
+class FilterMatcher(object):
+    """
+    Finds which of a fixed set of filters are contained in a line.
+
+    Small sets of filters are checked with one substring test per filter.
+    Sets of ``AUTOMATON_THRESHOLD`` filters or more are compiled into an
+    Aho-Corasick automaton, so each line is scanned once no matter how many
+    filters there are.
+
+    Args:
+        patterns (iterable): the filters to match. A dict of filters to
+            their max matches, like the one returned by ``get_filters(ds,
+            with_matches=True)``, can be passed directly.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        self._goto = None
+        if len(self.patterns) >= AUTOMATON_THRESHOLD:
+            self._compile()
+
+    def _compile(self):
+        goto, out = [{}], [set()]
+        for pat in self.patterns:
+            state = 0
+            for ch in pat:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    out.append(set())
+                state = nxt
+            out[state].add(pat)
+
+        # breadth first, so the failure state of every state is final before
+        # the states below it are visited
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        for state in queue:
+            out[state] |= out[0]
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [frozenset(o) for o in out]
+
+    def search(self, line):
+        """
+        Returns True if any of the filters is contained in ``line``.
+        """
+        if self._goto is None:
+            return any(p in line for p in self.patterns)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in line:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return bool(out[0])
+
+    def matches(self, line):
+        """
+        Returns the set of filters contained in ``line``.
+        """
+        if self._goto is None:
+            return set(p for p in self.patterns if p in line)
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(out[0])
+        state = 0
+        for ch in line:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+    def grep(self, text):
+        """
+        Returns the lines of ``text`` that contain any of the filters, in
+        order and with their line breaks.  Lines are separated by "\\n" only.
+
+        Without an automaton, each filter is searched through the whole text,
+        which is much faster than checking line by line when there are only a
+        few filters.
+        """
+        if self._goto is not None:
+            return [l for l in io.StringIO(text, newline="\n") if self.search(l)]
+
+        size = len(text)
+        starts = set()
+        for pat in self.patterns:
+            idx = text.find(pat)
+            while idx != -1:
+                start = text.rfind("\n", 0, idx) + 1
+                if start < size:
+                    starts.add(start)
+                end = text.find("\n", idx)
+                if end == -1:
+                    break
+                # the rest of the line doesn't matter
+                idx = text.find(pat, end + 1)
+
+        lines = []
+        for start in sorted(starts):
+            end = text.find("\n", start)
+            lines.append(text[start:] if end == -1 else text[start : end + 1])
+        return lines
+
+    def first_match(self, line, allowlist):
+        """
+        Returns the first key of ``allowlist``, in its order, that is
+        contained in ``line``, or None if there is no such key.
+        """
+        found = self.matches(line)
+        if len(found) > 1:
+            return next((k for k in allowlist if k in found), None)
+        for key in found:
+            return key if key in allowlist else None
+
+    def filter(self, lines, allowlist):
+        """
+        Returns the lines that contain at least one filter, keeping at most
+        as many lines per filter as its count in ``allowlist``.
+
+        The lines are checked from the last to the first, so the last lines
+        are kept when a filter matches more lines than allowed. Each line is
+        counted against the first filter of ``allowlist`` it contains that
+        still has lines left. The result is in the original order.
+        """
+        allowlist = dict(allowlist)  # copy it to avoid write back
+        result = []
+        for idx in range(len(lines) - 1, -1, -1):
+            if not allowlist:
+                break
+            key = self.first_match(lines[idx], allowlist)
+            if key is not None:
+                allowlist[key] -= 1
+                # stop checking it when enough lines contain the key were found
+                allowlist.pop(key) if allowlist[key] == 0 else None
+                result.append(lines[idx])
+        result.reverse()
+        return result
 
 
 def add_filter(component, patterns, max_match=MAX_MATCH):
@@ -194,16 +356,39 @@ def get_filters(component, with_matches=False):
     return _CACHE[component] if with_matches else set(_CACHE[component].keys())
 
 
+def get_matcher(component):
+    """
+    Get the :class:`FilterMatcher` for the filters of the given datasource.
+
+    The matcher is compiled once and reused until the filters returned by
+    :func:`get_filters` for the datasource change.
+
+    Args:
+        component (a datasource): The target datasource
+
+    Returns:
+        FilterMatcher: the matcher, or None if the datasource has no filters.
+    """
+    filters = get_filters(component, with_matches=True)
+    if not filters:
+        return None
+
+    cached = _MATCHERS.get(component)
+    if cached is None or cached[0] is not filters:
+        cached = _MATCHERS[component] = (filters, FilterMatcher(filters))
+    return cached[1]
+
+
 def apply_filters(target, lines):
     """
     Applys filters to the lines of a datasource. This function is used only in
     integration tests. Filters are applied in an equivalent but more performant
     way at run time.
     """
-    filters = get_filters(target)
-    if filters:
+    matcher = get_matcher(target)
+    if matcher:
         for l in lines:
-            if any(f in l for f in filters):
+            if matcher.search(l):
                 yield l
     else:
         for l in lines:
@@ -9,7 +9,9 @@ from insights.core.context import (
     SerializedArchiveContext,
 )
 from insights.core.exceptions import InvalidArchive
+from insights.core.path_index import DirectoryIndex, PathIndex
 from insights.core.serde import Hydration
+from insights.core.spec_factory import get_path_patterns
 
 log = logging.getLogger(__name__)
 
@@ -37,6 +39,27 @@ else:
                     yield full_path
 
 
+def get_member_filter(components):
+    """
+    Returns a :class:`insights.core.archives.MemberFilter` of the archive
+    members that the datasources in `components` can read, to pass to
+    :func:`insights.core.archives.extract`.  Returns ``None`` if they can read
+    any member.
+
+    The members of serialized archives, the archives in a cluster archive and
+    a member under each context marker are selected as well.  An archive
+    without any marker is only identified correctly if the selected members
+    are under its root directory.
+    """
+    patterns = get_path_patterns(components)
+    if patterns is None:
+        return None
+    patterns += ["meta_data/**", "meta_data.jsonl", "data/**"]
+    patterns += ["/*." + t for t in archives.COMPRESSION_TYPES]
+    markers = [c.marker for c in ExecutionContextMeta.registry if c.marker]
+    return archives.MemberFilter(patterns, markers)
+
+
 def _identify_fallback(files):
     common_path = os.path.dirname(os.path.commonprefix(files))
     if not common_path:
@@ -45,33 +68,38 @@ def _identify_fallback(files):
     return common_path, HostArchiveContext
 
 
-def identify(files):
-    common_path, context = ExecutionContextMeta.identify(files)
+def identify(files, index=None):
+    common_path, context = ExecutionContextMeta.identify(files, index)
     if context:
         return common_path, context
 
     return _identify_fallback(files)
 
 
-def _create_cluster_archive_context(path):
-    top = os.listdir(path)
+def _create_cluster_archive_context(path, index=None):
+    isfile = index.isfile if index else os.path.isfile
+    top = index.listdir(path) if index else os.listdir(path)
     arc = [
         os.path.join(path, f)
         for f in top
-        if f.endswith(archives.COMPRESSION_TYPES) and os.path.isfile(os.path.join(path, f))
+        if f.endswith(archives.COMPRESSION_TYPES) and isfile(os.path.join(path, f))
     ]
+    if index:
+        # the archives are read from the filesystem
+        arc = [index.realpath(a) for a in arc]
 
     return ClusterArchiveContext(path, all_files=arc) if arc else None
 
 
-def _create_user_defined_context(path, context, all_files):
+def _create_user_defined_context(path, context, all_files, index=None):
     ctx = None
 
     if context is ClusterArchiveContext:
         # ClusterArchiveContext does not support the handles() method
-        ctx = _create_cluster_archive_context(path)
+        ctx = _create_cluster_archive_context(path, index)
     else:
-        common_path, _context = context.handles(all_files)
+        roots = ExecutionContextMeta.find_markers(index, [context]) if index else {}
+        common_path, _context = context.handles_markers(all_files, roots)
         if _context:
             ctx = _context(common_path, all_files=all_files)
 
@@ -87,33 +115,51 @@ def _create_user_defined_context(path, context, all_files):
     return ctx
 
 
-def _create_autodetected_context(path, all_files):
+def _create_autodetected_context(path, all_files, index=None):
     if not all_files:
         raise InvalidArchive(
             "Cannot detect execution context: No files in path: {0}".format(path)
         )
 
     # ClusterArchiveContext does not support the handles() method
-    ctx = _create_cluster_archive_context(path)
+    ctx = _create_cluster_archive_context(path, index)
     if ctx:
         return ctx
 
     # use standard auto-detection (falls back to HostArchiveContext if nothing else is detected)
-    common_path, context = identify(all_files)
+    common_path, context = identify(all_files, index)
     return context(common_path, all_files=all_files)
 
 
 def create_context(path, context=None):
-    all_files = list(get_all_files(path))
+    """
+    Creates the context of the extracted archive or directory at `path`.
+    `path` can also be an :class:`insights.core.archives.ArchiveIndex`, the
+    files of the context are then read from the archive directly.
+
+    The paths in the directory are indexed by a
+    :class:`insights.core.path_index.DirectoryIndex`, so the datasources look
+    them up in memory instead of the filesystem.
+    """
+    if isinstance(path, PathIndex):
+        index = path
+    else:
+        index = DirectoryIndex(path)
+    path = index.root
+    all_files = index.all_files()
 
     if context:
-        return _create_user_defined_context(path, context, all_files)
+        ctx = _create_user_defined_context(path, context, all_files, index)
 
     else:
-        return _create_autodetected_context(path, all_files)
+        ctx = _create_autodetected_context(path, all_files, index)
+
+    if not isinstance(ctx, ClusterArchiveContext):
+        ctx.index = index
+    return ctx
 
 
-def initialize_broker(path, context=None, broker=None):
+def initialize_broker(path, context=None, broker=None, pool=None):
     ctx = create_context(path, context=context)
     broker = broker or dr.Broker()
     if isinstance(ctx, ClusterArchiveContext):
@@ -121,6 +167,6 @@ def initialize_broker(path, context=None, broker=None):
 
     broker[ctx.__class__] = ctx
     if isinstance(ctx, SerializedArchiveContext):
-        h = Hydration(root=ctx.root, ctx=ctx)
+        h = Hydration(root=ctx.root, ctx=ctx, pool=pool)
         broker = h.hydrate(broker=broker)
     return ctx, broker
@@ -0,0 +1,138 @@
+"""
+Line Index
+==========
+
+Rules often call :meth:`insights.core.TextFileOutput.get` or use ``in`` many
+times on the same large log, and each call loops over all of its lines in
+Python.  A :class:`LineIndex` joins the lines into one string once, so each
+search is a ``str.find`` over the whole log, and only the lines that contain
+the string are looked at in Python.
+"""
+import logging
+import sys
+
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, islice
+
+log = logging.getLogger(__name__)
+
+MAX_BYTES = 268435456  # 256 MB
+""" The largest amount of text a LineIndex is built for. """
+
+
+class LineIndex(object):
+    """
+    The `lines` joined into one string with the offset of each line in it.
+    ``nbytes`` is the memory it takes besides the lines themselves.
+
+    Raises:
+        TypeError: when a line isn't a string.
+        ValueError: when the lines are more than `max_bytes` or contain a new
+            line, so they can't be indexed.
+    """
+
+    def __init__(self, lines, max_bytes=MAX_BYTES):
+        if sum(map(len, lines)) + len(lines) > max_bytes:
+            raise ValueError("Too large to index: %d lines" % len(lines))
+        self.text = "\n".join(lines)
+        if self.text.count("\n") != max(len(lines) - 1, 0):
+            raise ValueError("Can't index lines that contain a new line")
+        self.lines = lines
+        self.starts = array("q", [0])
+        self.starts.extend(accumulate(len(l) + 1 for l in lines[:-1]))
+        self.nbytes = sys.getsizeof(self.text) + sys.getsizeof(self.starts)
+        log.debug("Indexed %d lines in %d bytes", len(lines), self.nbytes)
+
+    def _find(self, s, reverse=False):
+        text, starts = self.text, self.starts
+        if reverse:
+            pos = text.rfind(s)
+            while pos != -1:
+                i = bisect_right(starts, pos) - 1
+                yield i
+                if i == 0:
+                    return
+                pos = text.rfind(s, 0, starts[i])
+            return
+        last = len(starts) - 1
+        pos = text.find(s)
+        while pos != -1:
+            i = bisect_right(starts, pos) - 1
+            yield i
+            if i == last:
+                return
+            # the rest of the line can't add it again
+            pos = text.find(s, starts[i + 1])
+
+    def _words(self, s, check):
+        words = [s] if isinstance(s, str) else s
+        if check not in (all, any) or not words or any(not w or "\n" in w for w in words):
+            return None
+        return words
+
+    def find(self, s, cache=None):
+        """
+        Returns the indexes of the lines that contain the string `s`, kept in
+        the dictionary `cache` when it's given.
+        """
+        if cache is None:
+            return list(self._find(s))
+        found = cache.get(s)
+        if found is None:
+            found = cache[s] = list(self._find(s))
+        return found
+
+    def search(self, s, check=all, cache=None, num=None, reverse=False):
+        """
+        Returns the indexes of the lines that contain the string `s`, or with
+        a list of strings, of the lines that contain all of them, or any of
+        them when `check` is ``any``.  With `num`, only the first `num` lines
+        found are returned, or the last ones with `reverse`, and the rest of
+        the text isn't searched.  The lines found for each string are kept in
+        the dictionary `cache` when it's given, for searches that share them.
+
+        Returns ``None`` if the index can't answer, when a string is empty or
+        contains a new line, or `check` is neither ``all`` nor ``any``.
+        """
+        words = self._words(s, check)
+        if words is None:
+            return None
+        cache = {} if cache is None else cache
+        backwards = reverse and num is not None
+        if check is any and len(words) > 1:
+            found = set()
+            for w in words:
+                found.update(self.find(w, cache))
+            found = sorted(found)
+            candidates, rest = reversed(found) if backwards else found, None
+        else:
+            if len(words) > 1:
+                # only the lines of the rarest string are checked for the others
+                counts = dict((w, len(cache[w]) if w in cache else self.text.count(w)) for w in words)
+                words = sorted(words, key=counts.get)
+            first, rest = words[0], words[1:]
+            if num is not None and first not in cache:
+                candidates = self._find(first, backwards)
+            else:
+                found = self.find(first, cache)
+                candidates = reversed(found) if backwards else found
+        if rest:
+            lines = self.lines
+            candidates = (i for i in candidates if all(w in lines[i] for w in rest))
+        found = list(candidates if num is None else islice(candidates, max(num, 0)))
+        if backwards:
+            found.reverse()
+        return found
+
+    def contains(self, s, check=all, cache=None):
+        """
+        Returns whether any line contains `s` like :meth:`search`, or ``None``
+        if the index can't answer.
+        """
+        words = self._words(s, check)
+        if words is None:
+            return None
+        if len(words) == 1 or check is any:
+            return any(w in self.text for w in words)
+        return bool(self.search(words, check, cache, num=1))
@@ -0,0 +1,244 @@
+"""
+Parser Cache
+============
+
+Many archives of a fleet have byte for byte the same content for a spec, such
+as ``/etc/redhat-release`` or the list of installed packages, and each of them
+is parsed again from scratch.  A :class:`ParserCache` set as the
+``parser_cache`` of a :class:`insights.core.dr.Broker` keeps the parsers built
+from the content of a spec, and returns a copy of one instead of parsing the
+same content again.
+"""
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import tempfile
+import threading
+
+from collections import OrderedDict
+
+from insights import package_info
+from insights.core import StreamParser, dr
+
+log = logging.getLogger(__name__)
+
+MAX_BYTES = 268435456  # 256 MB
+""" The default number of bytes of pickled parsers a ParserCache keeps. """
+
+_CONTEXT_ATTRS = ("relative_path", "args", "cmd", "image", "engine", "container_id", "last_client_run")
+_SOURCE_DIGESTS = {}
+
+
+def _source_paths(component):
+    """
+    Returns the source files of `component`, of the classes it inherits from
+    and of the modules its own module imports from the same top level
+    package or from insights.
+    """
+    paths = []
+    for cls in getattr(component, "__mro__", (component,)):
+        try:
+            paths.append(inspect.getsourcefile(cls))
+        except TypeError:
+            # built in classes like object
+            continue
+    module = inspect.getmodule(component)
+    if module is not None:
+        packages = set(["insights", module.__name__.split(".")[0]])
+        for value in list(vars(module).values()):
+            mod = value if inspect.ismodule(value) else inspect.getmodule(value)
+            if mod is None or mod.__name__.split(".")[0] not in packages:
+                continue
+            try:
+                paths.append(inspect.getsourcefile(mod))
+            except TypeError:
+                continue
+    result = []
+    for path in paths:
+        if path and path not in result:
+            result.append(path)
+    return result
+
+
+def _source_digest(component):
+    """
+    Returns a digest of the insights-core release, and of the source files of
+    `component`, of the classes it inherits from and of the helper modules it
+    imports, so a parser is cached again when any of them changes.
+    """
+    digest = _SOURCE_DIGESTS.get(component)
+    if digest is None:
+        h = hashlib.sha256(dr.get_name(component).encode("utf-8"))
+        for name in ("NAME", "VERSION", "RELEASE", "COMMIT"):
+            h.update(str(package_info.get(name)).encode("utf-8"))
+        for path in _source_paths(component):
+            with open(path, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        digest = _SOURCE_DIGESTS[component] = h.hexdigest()
+    return digest
+
+
+class ParserCache(object):
+    """
+    A cache of the parsers built from the content of datasources, keyed on
+    the parser, a digest of its source and of the insights-core release, and
+    a digest of the content and the attributes of the datasource the parser
+    reads.
+
+    Parsers are kept pickled, so each hit returns a new copy that can't be
+    changed by the dependents of another.  With `path`, they're kept in files
+    under that directory, which can be shared by many processes, otherwise
+    in memory.  The least recently used are dropped when they take more than
+    `max_bytes`.  Only use a directory that can be trusted since its files are
+    unpickled.
+
+    Parsers that stream their content, that can't be pickled, or that raise
+    an exception aren't cached.
+    """
+
+    def __init__(self, path=None, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        if path:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self._bytes = sum(size for _, _, size in self._files())
+
+    def key(self, component, value):
+        """
+        Returns the key of the parser `component` of the datasource `value`,
+        or ``None`` if it can't be cached.
+        """
+        if isinstance(component, type) and issubclass(component, StreamParser):
+            return None
+        if getattr(component, "streaming", False):
+            # reading the content for the digest would load all of it
+            return None
+        content = getattr(value, "content", None)
+        if content is None:
+            return None
+
+        h = hashlib.sha256(_source_digest(component).encode("utf-8"))
+        path = getattr(value, "path", None)
+        attrs = [getattr(value, a, None) for a in _CONTEXT_ATTRS]
+        h.update(repr((os.path.basename(path) if path else None, attrs)).encode("utf-8"))
+        if isinstance(content, list):
+            for line in content:
+                h.update(line.encode("utf-8", "surrogateescape"))
+                h.update(b"\n")
+        elif isinstance(content, bytes):
+            h.update(content)
+        else:
+            h.update(content.encode("utf-8", "surrogateescape"))
+        return h.hexdigest()
+
+    def parse(self, component, value):
+        """
+        Returns the parser `component` of the datasource `value`, from the
+        cache if it's there.
+        """
+        key = self.key(component, value)
+        if key is None:
+            return component(value)
+        data = self._get(key)
+        if data is not None:
+            try:
+                result = pickle.loads(data)
+                self.hits += 1
+                return result
+            except Exception as ex:
+                log.debug("Dropping the cached %s: %r" % (dr.get_name(component), ex))
+
+        self.misses += 1
+        result = component(value)
+        try:
+            data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        except Exception as ex:
+            log.debug("Can't cache %s: %r" % (dr.get_name(component), ex))
+        else:
+            self._put(key, data)
+        return result
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def _files(self):
+        for top, _, files in os.walk(self.path):
+            for name in files:
+                p = os.path.join(top, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                yield p, st.st_mtime, st.st_size
+
+    def _get(self, key):
+        if not self.path:
+            with self._lock:
+                data = self._entries.pop(key, None)
+                if data is not None:
+                    self._entries[key] = data
+                return data
+        p = self._file(key)
+        try:
+            with open(p, "rb") as f:
+                data = f.read()
+            os.utime(p, None)
+            return data
+        except (IOError, OSError):
+            return None
+
+    def _put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        if not self.path:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = data
+                    self._bytes += len(data)
+                while self._bytes > self.max_bytes:
+                    _, dropped = self._entries.popitem(last=False)
+                    self._bytes -= len(dropped)
+            return
+
+        p = self._file(key)
+        try:
+            if not os.path.isdir(os.path.dirname(p)):
+                os.makedirs(os.path.dirname(p), exist_ok=True)
+            # written to a temporary file first, so other processes never
+            # read part of it
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(p))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.rename(tmp, p)
+        except (IOError, OSError) as ex:
+            log.debug("Can't write %s: %r" % (p, ex))
+            return
+        with self._lock:
+            self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used files until the rest take at most
+        three quarters of `max_bytes`.  The sizes are counted again, since
+        other processes may share the directory.
+        """
+        files = sorted(self._files(), key=lambda f: f[1])
+        self._bytes = sum(size for _, _, size in files)
+        for p, _, size in files:
+            if self._bytes <= self.max_bytes * 3 // 4:
+                break
+            try:
+                os.remove(p)
+                self._bytes -= size
+            except OSError:
+                pass
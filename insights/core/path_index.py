@@ -0,0 +1,296 @@
+"""
+Path Index
+==========
+
+In-memory indexes of the paths in an extracted archive or directory.  The
+datasources of an archive context look up hundreds of paths that mostly don't
+exist, and every lookup against the filesystem costs ``stat``, ``lstat`` and
+``getdents`` calls.  A :class:`PathIndex` answers those lookups from memory.
+"""
+import fnmatch
+import logging
+import os
+import posixpath
+import re
+
+from glob import has_magic
+
+log = logging.getLogger(__name__)
+
+MAX_SYMLINKS = 40
+_GLOB_PATTERNS = {}
+
+
+def _compile_glob(pattern):
+    match = _GLOB_PATTERNS.get(pattern)
+    if match is None:
+        match = _GLOB_PATTERNS[pattern] = re.compile(fnmatch.translate(pattern)).match
+    return match
+
+
+class PathIndex(object):
+    """
+    The files, directories and symbolic links under `root`.
+
+    The methods mirror the ``os.path``, ``os.listdir`` and ``glob`` calls the
+    datasources make, for paths under `root`.  Relative paths and a relative
+    `root` are taken from the current directory, and `root` is kept as an
+    absolute path.  Symbolic links are
+    followed while they stay under `root`, a link to anything outside it is
+    treated as missing.  Subclasses add the members and provide their content.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        # "/" already ends with the separator
+        self._prefix = self.root if self.root.endswith(os.sep) else self.root + os.sep
+        self._members = {}
+        self._links = {}
+        self._dirs = {"": set()}
+        self._globs = {}
+
+    def _add(self, name, member=None, link=None, is_dir=False):
+        name = posixpath.normpath(name.lstrip("/"))
+        if name in (".", "..") or name.startswith("../"):
+            return
+        if link is not None:
+            if posixpath.isabs(link):
+                target = None
+            else:
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(name), link))
+                target = None if target == ".." or target.startswith("../") else target
+            self._links[name] = target
+        elif is_dir:
+            self._dirs.setdefault(name, set())
+        else:
+            self._members[name] = member
+        parent, base = posixpath.split(name)
+        while True:
+            siblings = self._dirs.setdefault(parent, set())
+            if base in siblings:
+                break
+            siblings.add(base)
+            if not parent:
+                break
+            parent, base = posixpath.split(parent)
+
+    def _relative(self, path):
+        """
+        Returns the member name of `path` with symbolic links resolved,
+        ``""`` for the root, or ``None`` if it isn't under the root.
+        """
+        path = os.path.abspath(path)
+        if path == self.root:
+            return ""
+        if not path.startswith(self._prefix):
+            return None
+        parts = path[len(self._prefix):].split(os.sep)
+        resolved = ""
+        hops = 0
+        while parts:
+            part = parts.pop(0)
+            current = posixpath.join(resolved, part) if resolved else part
+            if current in self._links:
+                hops += 1
+                target = self._links[current]
+                if target is None or hops > MAX_SYMLINKS:
+                    return None
+                parts = target.split("/") + parts
+                resolved = ""
+            else:
+                resolved = current
+        return resolved
+
+    def _member(self, path):
+        name = self._relative(path)
+        if name is None or name not in self._members:
+            raise IOError("No such file: '%s'" % path)
+        return name
+
+    def all_files(self):
+        """
+        Returns the paths of all the regular files, the same as
+        :func:`insights.core.hydration.get_all_files` does for a directory.
+        """
+        return [os.path.join(self.root, n) for n in self._members]
+
+    def exists(self, path):
+        name = self._relative(path)
+        return name is not None and (name in self._members or name in self._dirs)
+
+    def isfile(self, path):
+        return self._relative(path) in self._members
+
+    def isdir(self, path):
+        return self._relative(path) in self._dirs
+
+    def access(self, path):
+        """
+        Returns whether the file at `path` can be read.
+        """
+        return True
+
+    def resolve(self, path):
+        """
+        Returns `path` with symbolic links resolved, like ``os.path.realpath``.
+        """
+        name = self._relative(path)
+        if name is None:
+            return os.path.realpath(path)
+        return os.path.join(self.root, name) if name else self.root
+
+    def listdir(self, path):
+        name = self._relative(path)
+        if name not in self._dirs:
+            raise OSError("No such directory: '%s'" % path)
+        return list(self._dirs[name])
+
+    def glob(self, pattern):
+        """
+        Returns the paths that match `pattern` like ``glob.glob`` does.  The
+        index doesn't change, so the result of each pattern is kept.
+        """
+        found = self._globs.get(pattern)
+        if found is None:
+            found = self._globs[pattern] = tuple(self._glob(pattern))
+        return list(found)
+
+    def _glob(self, pattern):
+        pattern = os.path.abspath(pattern)
+        if not pattern.startswith(self._prefix):
+            return []
+        found = [self.root]
+        for part in pattern[len(self._prefix):].split(os.sep):
+            matched = []
+            if has_magic(part):
+                match = _compile_glob(part)
+                hidden = part.startswith(".")
+                for path in found:
+                    name = self._relative(path)
+                    for n in self._dirs.get(name, ()) if name is not None else ():
+                        if (hidden or not n.startswith(".")) and match(n):
+                            matched.append(os.path.join(path, n))
+            else:
+                for path in found:
+                    path = os.path.join(path, part)
+                    if self.exists(path):
+                        matched.append(path)
+            found = matched
+        return found
+
+    def find_markers(self, markers):
+        """
+        Returns a dictionary of each of the `markers` to the set of the
+        directories that contain it, found with one pass over the directories.
+        A marker is a relative path, it's found where it's a file or a
+        directory with files in it, the same as
+        :meth:`insights.core.context.ExecutionContext.handles` finds it in the
+        list of all files.
+        """
+        found = dict((m, set()) for m in markers)
+        first = {}
+        for marker in markers:
+            parts = marker.strip("/").split("/")
+            first.setdefault(parts[0], []).append((marker, parts[1:]))
+
+        for name, children in self._dirs.items():
+            for child in first:
+                if child not in children:
+                    continue
+                for marker, rest in first[child]:
+                    path = posixpath.join(name, child, *rest)
+                    if path in self._members or (path in self._dirs and self._has_files(path)):
+                        full = os.path.join(self.root, path)
+                        m = os.sep + marker.lstrip(os.sep)
+                        # only the first occurrence of the marker in a path
+                        # counts
+                        if full.find(m) == len(full) - len(m):
+                            found[marker].add(os.path.join(self.root, name) if name else self.root)
+        return found
+
+    def _has_files(self, name):
+        for child in self._dirs[name]:
+            path = posixpath.join(name, child)
+            if path in self._members or (path in self._dirs and self._has_files(path)):
+                return True
+        return False
+
+    def getsize(self, path):
+        raise NotImplementedError()
+
+    def open(self, path):
+        """
+        Returns a binary file object over the content of the file at `path`.
+        """
+        raise NotImplementedError()
+
+    def read(self, path):
+        """
+        Returns the content of the file at `path` as bytes.
+        """
+        with self.open(path) as f:
+            return f.read()
+
+    def realpath(self, path):
+        """
+        Returns a path of the file or the directory at `path` in the
+        filesystem.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return "<%s('%s', %d files)>" % (self.__class__.__name__, self.root, len(self._members))
+
+
+class DirectoryIndex(PathIndex):
+    """
+    A :class:`PathIndex` of the directory at `root`, built by one walk of the
+    directory.  The content of the files is read from the directory.  Files
+    other than regular files, directories and symbolic links are left out,
+    as :func:`insights.core.hydration.get_all_files` does.
+
+    The index isn't updated when the directory changes.
+    """
+
+    def __init__(self, root):
+        super(DirectoryIndex, self).__init__(os.fspath(root))
+        self._walk(self.root, "")
+
+    def _walk(self, path, prefix):
+        with os.scandir(path) as it:
+            for ent in it:
+                name = prefix + ent.name
+                try:
+                    if ent.is_symlink():
+                        self._add(name, link=self._link_target(ent.path))
+                    elif ent.is_dir(follow_symlinks=False):
+                        self._add(name, is_dir=True)
+                        self._walk(ent.path, name + "/")
+                    elif ent.is_file(follow_symlinks=False):
+                        self._add(name)
+                except OSError as ex:
+                    log.exception(ex)
+
+    def _link_target(self, path):
+        target = os.readlink(path)
+        if os.path.isabs(target):
+            # links to absolute paths under the root are kept
+            target = os.path.normpath(target)
+            if target.startswith(self._prefix):
+                return os.path.relpath(target, os.path.dirname(os.path.abspath(path)))
+        return target
+
+    def access(self, path):
+        return os.access(path, os.R_OK)
+
+    def getsize(self, path):
+        return os.path.getsize(path)
+
+    def open(self, path):
+        return open(path, "rb")
+
+    def realpath(self, path):
+        return path
@@ -29,6 +29,7 @@ from __future__ import print_function
 
 import logging
 import signal
+import threading
 import traceback
 
 from pprint import pformat
@@ -48,6 +49,10 @@ from insights.core.exceptions import (
 log = logging.getLogger(__name__)
 
 
+def _in_main_thread():
+    return threading.current_thread() is threading.main_thread()
+
+
 class PluginType(dr.ComponentType):
     """
     PluginType is the base class of plugin types like datasource, rule, etc.
@@ -101,10 +106,22 @@ class datasource(PluginType):
             )
         )
 
+    def get_timeout(self, broker):
+        """
+        Returns the timeout from the decorator, or the default of 120, when
+        collecting from a host. :meth:`invoke` enforces it with an alarm in
+        the main thread, and :meth:`insights.core.dr.ExecutionPlan.run_parallel`
+        enforces it for its workers.
+        """
+        if HostContext in broker:
+            return getattr(self, "timeout", 120)
+
     def invoke(self, broker):
         # Grab the timeout from the decorator, or use the default of 120.
-
-        if HostContext in broker:
+        # Signals can only be handled in the main thread, so datasources
+        # evaluated by the workers of dr.run_parallel are timed out by it.
+        use_alarm = HostContext in broker and _in_main_thread()
+        if use_alarm:
             self.timeout = getattr(self, "timeout", 120)
             signal.signal(signal.SIGALRM, self._handle_timeout)
             signal.alarm(self.timeout)
@@ -129,7 +146,7 @@ class datasource(PluginType):
                 broker.add_exception(reg_spec, te, te_tb)
             raise SkipComponent()
         finally:
-            if HostContext in broker:
+            if use_alarm:
                 signal.alarm(0)
 
 
@@ -157,13 +174,17 @@ class parser(PluginType):
         self.continue_on_error = kwargs.get('continue_on_error', True)
         super(parser, self).__init__(*args, group=group)
 
+    def _parse(self, broker, value):
+        cache = broker.parser_cache
+        return cache.parse(self.component, value) if cache is not None else self.component(value)
+
     def invoke(self, broker):
         dep_value = broker[self.requires[0]]
         exception = False
 
         if not isinstance(dep_value, list):
             try:
-                return self.component(dep_value)
+                return self._parse(broker, dep_value)
             except ContentException as ce:
                 log.debug(ce)
                 broker.add_exception(self.component, ce, traceback.format_exc())
@@ -179,7 +200,7 @@ class parser(PluginType):
         results = []
         for d in dep_value:
             try:
-                r = self.component(d)
+                r = self._parse(broker, d)
                 if r is not None:
                     results.append(r)
             except ContentException as ce:
@@ -9,6 +9,7 @@ to register as an observer on a :py:class:`Broker`.
 import json as ser
 import logging
 import os
+import threading
 import time
 import traceback
 
@@ -16,6 +17,7 @@ from glob import glob
 from functools import partial
 
 from insights.core import dr
+from insights.core.archives import PackIndex, PackWriter
 from insights.core.exceptions import ContentException
 from insights.util import fs
 
@@ -135,21 +137,40 @@ def unmarshal(data, root=None, ctx=None, ds=None):
     return deserialize(data, root=root, ctx=ctx, ds=ds)
 
 
+def _hydrate_safely(func, arg):
+    try:
+        return func(arg)
+    except ContentException as ex:
+        log.debug(ex)
+    except ValueError as ve:
+        log.debug(ve)
+    except Exception as ex:
+        log.warning(ex)
+
+
 class Hydration(object):
     """
     The Hydration class is responsible for saving and loading insights
     components. It puts metadata about a component's evaluation in a metadata
     file for the component and allows the serializer for a component to put raw
     data beneath a working directory.
+
+    With `compact` set, the metadata of all the components is appended to a
+    single file of one document per line instead, next to the metadata
+    directory.  Both are loaded by :meth:`hydrate`.  If `pool` is set, the
+    metadata documents are loaded and deserialized with it.
     """
-    def __init__(self, root=None, ctx=None, meta_root="meta_data", data_root="data", pool=None):
+    def __init__(self, root=None, ctx=None, meta_root="meta_data", data_root="data", pool=None, compact=False):
         self.root = root
         self.ctx = ctx
         self.meta_root = os.path.join(root, meta_root) if root else None
         self.data_root = os.path.join(root, data_root) if root else None
         self.ser_name = dr.get_base_module_name(ser)
+        self.meta_file = self.meta_root + ".jsonl" if root else None
         self.created = False
         self.pool = pool
+        self.compact = compact
+        self.lock = threading.Lock()
 
     def _hydrate_one(self, doc):
         """ Returns (component, results, errors, duration) """
@@ -163,28 +184,67 @@ class Hydration(object):
         results = unmarshal(doc["results"], root=self.data_root, ctx=self.ctx, ds=key)
         return (key, results, exec_time, ser_time)
 
+    def _meta_paths(self):
+        """
+        Returns the paths of the metadata files.  They're looked up in the
+        index of the context when it has one.
+        """
+        index = getattr(self.ctx, "index", None)
+        pattern = os.path.join(self.meta_root, "*")
+        if index is not None and index.exists(self.root):
+            paths = index.glob(pattern)
+            return paths + [self.meta_file] if index.isfile(self.meta_file) else paths
+        paths = glob(pattern)
+        return paths + [self.meta_file] if os.path.isfile(self.meta_file) else paths
+
+    def _load(self, path):
+        """
+        Returns the metadata documents in the file at `path`.
+        """
+        index = getattr(self.ctx, "index", None)
+        if index is not None and index.isfile(path):
+            content = index.read(path).decode("utf-8")
+        else:
+            with open(path) as f:
+                content = f.read()
+        if path == self.meta_file:
+            return [ser.loads(line) for line in content.splitlines() if line]
+        return [ser.loads(content)]
+
+    def _load_docs(self):
+        paths = self._meta_paths()
+        if self.pool and len(paths) > 1:
+            loaded = self.pool.map(partial(_hydrate_safely, self._load), paths)
+        else:
+            loaded = map(partial(_hydrate_safely, self._load), paths)
+        return [doc for docs in loaded if docs for doc in docs]
+
     def hydrate(self, broker=None):
         """
         Loads a Broker from a previously saved one. A Broker is created if one
-        isn't provided.
+        isn't provided.  The fingerprints saved with the components are loaded
+        too, so the broker can be the `previous` one of
+        :func:`insights.core.dr.run_changed`.
         """
 
         broker = broker or dr.Broker()
-        for path in glob(os.path.join(self.meta_root, "*")):
-            try:
-                with open(path) as f:
-                    doc = ser.load(f)
-                    res = self._hydrate_one(doc)
-                    comp, results, exec_time, ser_time = res
-                    if results:
-                        broker[comp] = results
+        docs = self._load_docs()
+        if self.pool and len(docs) > 1:
+            hydrated = self.pool.map(partial(_hydrate_safely, self._hydrate_one), docs)
+        else:
+            hydrated = map(partial(_hydrate_safely, self._hydrate_one), docs)
+
+        for doc, res in zip(docs, hydrated):
+            if res:
+                comp, results, exec_time, ser_time = res
+                if results:
+                    broker[comp] = results
+                    if doc.get("fingerprint"):
+                        broker.fingerprints[comp] = doc["fingerprint"]
+                    try:
                         broker.exec_times[comp] = exec_time + ser_time
-            except ContentException as ex:
-                log.debug(ex)
-            except ValueError as ve:
-                log.debug(ve)
-            except Exception as ex:
-                log.warning(ex)
+                    except Exception as ex:
+                        log.warning(ex)
         return broker
 
     def dehydrate(self, comp, broker):
@@ -218,10 +278,15 @@ class Hydration(object):
                 "results": results if results else None,
                 "ser_time": time.time() - start
             }
+            if broker.fingerprints.get(comp):
+                doc["fingerprint"] = broker.fingerprints[comp]
         except Exception as ex:
             log.exception(ex)
         else:
             if doc is not None and (doc["results"] or doc["errors"]):
+                if self.compact:
+                    self._append(name, doc)
+                    return
                 path = None
                 try:
                     path = os.path.join(self.meta_root, name + "." + self.ser_name)
@@ -232,6 +297,64 @@ class Hydration(object):
                     if path:
                         fs.remove(path)
 
+    def _append(self, name, doc):
+        """
+        Appends the metadata document of a component to the compact metadata
+        file.
+        """
+        try:
+            line = ser.dumps(doc) + "\n"
+        except Exception as boom:
+            log.error("Could not serialize %s to %s: %r" % (name, self.ser_name, boom))
+            return
+        with self.lock:
+            with open(self.meta_file, "a") as f:
+                f.write(line)
+
+    def pack(self, path):
+        """
+        Writes the components saved under `root`, and the other files there,
+        to a single :class:`insights.core.archives.PackWriter` pack at `path`.
+        The metadata documents are written to it as the compact metadata file.
+        The pack can be hydrated without unpacking it, by passing it to
+        :func:`insights.core.archives.open_archive`.
+        """
+        docs = self._load_docs()
+        with PackWriter(path) as pack:
+            meta = "".join(ser.dumps(doc) + "\n" for doc in docs)
+            pack.add(os.path.relpath(self.meta_file, self.root), meta.encode("utf-8"))
+            for top, dirs, files in os.walk(self.root):
+                dirs[:] = [d for d in dirs if os.path.join(top, d) != self.meta_root]
+                rel = os.path.relpath(top, self.root)
+                for name in dirs + files:
+                    src = os.path.join(top, name)
+                    member = os.path.normpath(os.path.join(rel, name))
+                    if src == self.meta_file:
+                        continue
+                    if os.path.islink(src):
+                        pack.add_link(member, os.readlink(src))
+                    elif name in dirs:
+                        pack.add_dir(member)
+                    else:
+                        pack.add_file(member, src)
+
+    def unpack(self, path):
+        """
+        Writes the pack at `path` to `root`, with a metadata file for each
+        component as :meth:`dehydrate` writes them.
+        """
+        index = PackIndex(path)
+        try:
+            index.unpack(self.root)
+        finally:
+            index.close()
+        if os.path.isfile(self.meta_file):
+            fs.ensure_path(self.meta_root, mode=0o770)
+            for doc in self._load(self.meta_file):
+                with open(os.path.join(self.meta_root, doc["name"] + "." + self.ser_name), "w") as f:
+                    ser.dump(doc, f)
+            os.remove(self.meta_file)
+
     def make_persister(self, to_persist):
         """
         Returns a function that hydrates components as they are evaluated. The
@@ -1,3 +1,5 @@
+import hashlib
+import io
 import itertools
 import logging
 import os
@@ -28,6 +30,19 @@ from insights.util.mangle import mangle_command
 log = logging.getLogger(__name__)
 
 MAX_CONTENT_SIZE = 104857600 * 2  # 200 MB
+CHUNK_SIZE = 4194304  # 4 MB
+try:
+    GREP_PREFILTER_SIZE = int(os.environ.get("INSIGHTS_GREP_PREFILTER_SIZE", 2097152))
+except ValueError:
+    GREP_PREFILTER_SIZE = 2097152
+"""
+When collecting data, a filtered file is pre-filtered with ``grep`` if its
+size in bytes times the number of its filters is larger than this, 2 MB by
+default.  Other filtered files and the output of commands are pre-filtered
+in-process, which saves a ``grep`` process per spec.  Set by the
+``INSIGHTS_GREP_PREFILTER_SIZE`` environment variable, ``0`` means ``grep`` is
+never used.
+"""
 SAFE_ENV = {
     "PATH": os.path.pathsep.join(
         [
@@ -46,6 +61,53 @@ A minimal set of environment variables for use in subprocess calls
 if "LANG" in os.environ:
     SAFE_ENV["LANG"] = os.environ["LANG"]
 PATH_ENV_OVERRIDER = "PATH=%s:$PATH" % SAFE_ENV["PATH"]
+_FINGERPRINT_ATTRS = (
+    "relative_path", "cmd", "args", "rc", "image", "engine", "container_id", "last_client_run"
+)
+
+
+def _grep_lines(chunks, matcher):
+    """
+    Returns the lines that contain a filter, split the same as the output of
+    ``grep -F`` is split by ``str.splitlines``.  The `chunks` of text must
+    end at "\\n" and undecodable bytes must be escaped with
+    "surrogateescape".  These bytes are dropped from the result.
+    """
+    matched = []
+    for chunk in chunks:
+        for line in matcher.grep(chunk):
+            if not line.endswith("\n"):
+                line += "\n"
+            try:
+                line.encode("utf-8")
+            except UnicodeEncodeError:
+                line = line.encode("utf-8", "surrogateescape").decode("utf-8", "ignore")
+            matched.append(line)
+    return "".join(matched).splitlines()
+
+
+def _read_chunks(f, size=CHUNK_SIZE):
+    """
+    Yields the content of the file opened with ``newline="\\n"`` in chunks
+    of about `size` characters ending at "\\n".
+    """
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+        if not chunk.endswith("\n"):
+            chunk += f.readline()
+        yield chunk
+
+
+def _glob(ctx, pattern):
+    index = getattr(ctx, "index", None)
+    return index.glob(pattern) if index else glob(pattern)
+
+
+def _isdir(ctx, path):
+    index = getattr(ctx, "index", None)
+    return index.isdir(path) if index else os.path.isdir(path)
 
 
 class ContentProvider(object):
@@ -91,10 +153,11 @@ class ContentProvider(object):
             no_obf = getattr(self.ds, 'no_obfuscate', [])
             cleans.append("Obfuscate") if set(no_obf) != DEFAULT_OBFUSCATIONS else None
             # Filtering?
-            allowlist = None
+            allowlist = matcher = None
             if self._filterable:
                 cleans.append("Filter")
                 allowlist = self._filters
+                matcher = filters.get_matcher(self.ds)
             # Cleaning - Entry
             if cleans:
                 log.debug("Cleaning (%s) %s", "/".join(cleans), self.relative_path)
@@ -104,6 +167,7 @@ class ContentProvider(object):
                     allowlist=allowlist,
                     no_redact=no_red,
                     width=self.relative_path.endswith("netstat_-neopa"),
+                    matcher=matcher,
                 )
                 if len(content) == 0:
                     log.debug("Skipping %s due to empty after cleaning", self.path)
@@ -136,6 +200,29 @@ class ContentProvider(object):
 
         return self._content
 
+    def fingerprint(self):
+        """
+        Returns a digest of the content and of the attributes parsers read,
+        or ``None`` if the content can't be loaded.  It doesn't depend on the
+        root, so the same file in two archives has the same fingerprint.  The
+        content is loaded to compute it, and kept.
+        """
+        try:
+            content = self.content
+        except Exception:
+            return None
+        attrs = [getattr(self, a, None) for a in _FINGERPRINT_ATTRS]
+        h = hashlib.sha256(repr((self.__class__.__name__, attrs)).encode("utf-8"))
+        if isinstance(content, bytes):
+            h.update(content)
+        elif isinstance(content, list):
+            for line in content:
+                h.update(line.encode("utf-8", "surrogateescape"))
+                h.update(b"\n")
+        else:
+            h.update(str(content).encode("utf-8", "surrogateescape"))
+        return h.hexdigest()
+
     def write(self, dst):
         fs.ensure_path(os.path.dirname(dst))
         # Clean Spec Content when writing it down to disk before uploading
@@ -200,6 +287,8 @@ class FileProvider(ContentProvider):
         self.relative_path = relative_path.lstrip("/")
         self.save_as = save_as
         self.file_name = os.path.basename(self.path)
+        # the path index of the context the file is looked up and read with
+        self._index = getattr(ctx, "index", None)
         self._filterable = (
             any(s.filterable for s in dr.get_registry_points(self.ds))
             if self.ds and filters.ENABLED
@@ -211,10 +300,11 @@ class FileProvider(ContentProvider):
 
     def _is_inside_root(self):
         """Checks that `self.relative_path` does not point outside `self.root`."""
-        resolved = os.path.realpath(self.path)
+        realpath = self._index.resolve if self._index else os.path.realpath
+        resolved = realpath(self.path)
 
         # pathlib.Path.is_relative_to() has been added only in Python 3.9
-        resolved_root = os.path.realpath(self.root)
+        resolved_root = realpath(self.root)
         if not resolved_root.endswith(os.sep):
             resolved_root += os.sep
 
@@ -226,7 +316,7 @@ class FileProvider(ContentProvider):
             raise ValueError(msg % (self.path))
 
         # 1. No Such File
-        if not os.path.exists(self.path):
+        if not (self._index.exists(self.path) if self._index else os.path.exists(self.path)):
             raise ContentException("%s does not exist." % self.path)
         # 2. Check only when collecting
         if isinstance(self.ctx, HostContext):
@@ -238,9 +328,39 @@ class FileProvider(ContentProvider):
                 log.warning("WARNING: Skipping file %s", os.sep + self.relative_path)
                 raise BlacklistedSpec()
 
-        if not os.access(self.path, os.R_OK):
+        if not (self._index.access(self.path) if self._index else os.access(self.path, os.R_OK)):
             raise ContentException("Cannot access %s" % self.path)
 
+    def _open(self, mode="r", **kwargs):
+        """
+        Opens the file, with the path index of the context when it has one.
+        """
+        if not self._index:
+            return open(self.path, mode, **kwargs)
+        f = self._index.open(self.path)
+        return f if "b" in mode else io.TextIOWrapper(f, **kwargs)
+
+    def fingerprint(self):
+        """
+        Returns a digest of the bytes of the file, of the filters applied to
+        it, and of the attributes parsers read, or ``None`` if the file can't
+        be read.  The file is read in chunks and its content isn't loaded, so
+        a large file that's only streamed by its parsers isn't held in memory,
+        but it's still read in full each time.  The modification time isn't
+        used since an archive collected again rewrites every file.
+        """
+        # rc is only set by a grep pre-filter when the content is loaded
+        attrs = [getattr(self, a, None) for a in _FINGERPRINT_ATTRS if a != "rc"]
+        filters = sorted(self._filters.items())
+        h = hashlib.sha256(repr((self.__class__.__name__, attrs, filters)).encode("utf-8"))
+        try:
+            with self._open("rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+        except Exception:
+            return None
+        return h.hexdigest()
+
     def __repr__(self):
         return '%s(%r)' % (self.__class__.__name__, self.path)
 
@@ -257,11 +377,15 @@ class RawFileProvider(FileProvider):
 
     def load(self):
         self.loaded = True
-        with open(self.path, 'rb') as f:
+        with self._open('rb') as f:
             return f.read()
 
     def write(self, dst):
         fs.ensure_path(os.path.dirname(dst))
+        if self._index:
+            with open(dst, "wb") as f:
+                f.write(self._index.read(self.path))
+            return
         call([which("cp", env=SAFE_ENV), self.path, dst], env=SAFE_ENV)
 
 
@@ -271,15 +395,25 @@ class TextFileProvider(FileProvider):
     lines. Each line is filtered if filters are defined for the datasource.
     """
 
+    def _prefilter(self):
+        # Pre-filtering ONLY when collecting data
+        return isinstance(self.ctx, HostContext) and bool(self._filters)
+
     def create_args(self):
         """
-        The "grep" is faster and can be used shrink the size of file.
+        The "grep" is faster for large files, it's used to pre-filter the files
+        of which the size times the number of filters is larger than
+        ``GREP_PREFILTER_SIZE``.  Other files are pre-filtered in-process.
         """
         args = []
-        if isinstance(self.ctx, HostContext) and self._filters:
-            # Pre-filtering ONLY when collecting data
-            log.debug("Pre-filtering %s", self.relative_path)
-            args.append(["grep", "-F", "--", "\n".join(self._filters.keys()), self.path])
+        if self._prefilter() and GREP_PREFILTER_SIZE:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                size = 0
+            if size * len(self._filters) > GREP_PREFILTER_SIZE:
+                log.debug("Pre-filtering %s with grep", self.relative_path)
+                args.append(["grep", "-F", "--", "\n".join(self._filters.keys()), self.path])
 
         return args
 
@@ -292,19 +426,38 @@ class TextFileProvider(FileProvider):
             self.rc = rc
             return out
 
-        fsize = os.stat(self.path).st_size
-        with open(self.path, "r", encoding="utf-8", errors="surrogateescape") as f:
-            if fsize > MAX_CONTENT_SIZE:
-                # read the last ``MAX_CONTENT_SIZE`` MB only
-                f.seek(fsize - MAX_CONTENT_SIZE)
-                log.debug("Extra-huge file is truncated %s", self.relative_path)
-                content = [l.rstrip("\n") for l in f][1:]  # discard the first line which is broken
-            else:
-                content = [l.rstrip("\n") for l in f]
-            if not isinstance(self.ctx, HostContext) and self._filters:
-                # Post-filtering ONLY when processing data
-                content = AllowFilter.filter_content(content, self._filters)
-            return content
+        if self._prefilter():
+            log.debug("Pre-filtering %s", self.relative_path)
+            # read it as grep does: "\n" separated lines
+            with self._open(encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+                return _grep_lines(_read_chunks(f), filters.get_matcher(self.ds))
+
+        with self._open(encoding="utf-8", errors="surrogateescape") as f:
+            return [l.rstrip("\n") for l in self._read_lines(f)]
+
+    def _read_lines(self, f):
+        """
+        Returns an iterator over the lines of the opened file ``f``. Only the
+        last ``MAX_CONTENT_SIZE`` bytes of huge files are read. When processing
+        data, the lines are post-filtered; only the lines that contain a filter
+        are buffered for that, so memory is bounded by the filtered result.
+        """
+        if self._index:
+            fsize = self._index.getsize(self.path)
+        else:
+            fsize = os.fstat(f.fileno()).st_size
+        lines = iter(f)
+        if fsize > MAX_CONTENT_SIZE:
+            # read the last ``MAX_CONTENT_SIZE`` MB only
+            f.seek(fsize - MAX_CONTENT_SIZE)
+            log.debug("Extra-huge file is truncated %s", self.relative_path)
+            next(lines, None)  # discard the first line which is broken
+        if not isinstance(self.ctx, HostContext) and self._filters:
+            # Post-filtering ONLY when processing data
+            matcher = filters.get_matcher(self.ds)
+            candidates = [l for l in lines if matcher.search(l)]
+            return iter(AllowFilter.filter_content(candidates, self._filters, matcher))
+        return lines
 
     def _stream(self):
         """
@@ -320,9 +473,13 @@ class TextFileProvider(FileProvider):
                 if args:
                     with streams.connect(*args, env=SAFE_ENV) as s:
                         yield s
+                elif self._prefilter():
+                    matcher = filters.get_matcher(self.ds)
+                    with self._open(encoding="utf-8", errors="surrogateescape") as f:
+                        yield (l for l in f if matcher.search(l))
                 else:
-                    with open(self.path, "r", encoding="utf-8", errors="surrogateescape") as f:
-                        yield f
+                    with self._open(encoding="utf-8", errors="surrogateescape") as f:
+                        yield self._read_lines(f)
         except StopIteration:
             raise
         except Exception as ex:
@@ -406,13 +563,15 @@ class CommandOutputProvider(ContentProvider):
                 log.warning("WARNING: Skipping command %s", self.cmd)
                 raise BlacklistedSpec()
 
+    def _prefilter(self):
+        return bool(self.split and self._filters)
+
     def create_args(self):
         command = [shlex.split(self.cmd)]
 
-        if self.split and self._filters:
-            log.debug("Pre-filtering  %s", self.relative_path)
-            command.append(["grep", "-F", "--", "\n".join(self._filters.keys())])
-            # "keep_rc = True" to ignore failure of 'grep'
+        if self._prefilter():
+            # the output is pre-filtered in-process, failures are ignored as
+            # they were when it was piped to 'grep'
             self.keep_rc = True
 
         return command
@@ -431,10 +590,11 @@ class CommandOutputProvider(ContentProvider):
 
     def load(self):
         command = self.create_args()
+        prefilter = self._prefilter()
 
         raw = self.ctx.shell_out(
             command,
-            split=self.split,
+            split=self.split and not prefilter,
             keep_rc=self.keep_rc,
             timeout=self.timeout,
             env=self._env,
@@ -444,6 +604,9 @@ class CommandOutputProvider(ContentProvider):
             self.rc, output = raw
         else:
             output = raw
+        if prefilter:
+            log.debug("Pre-filtering %s", self.relative_path)
+            output = _grep_lines([output], filters.get_matcher(self.ds))
         return output
 
     def _stream(self):
@@ -458,7 +621,11 @@ class CommandOutputProvider(ContentProvider):
             else:
                 command = self.create_args()
                 with self.ctx.connect(*command, env=self._env, timeout=self.timeout) as s:
-                    yield s
+                    if self._prefilter():
+                        matcher = filters.get_matcher(self.ds)
+                        yield (l for l in s if matcher.search(l))
+                    else:
+                        yield s
         except StopIteration:
             raise
         except Exception as ex:
@@ -800,8 +967,8 @@ class glob_file(object):
         results = []
         for pattern in self.patterns:
             pattern = ctx.locate_path(pattern)
-            for path in sorted(glob(os.path.join(root, pattern.lstrip('/')))):
-                if self.ignore_func(path) or os.path.isdir(path):
+            for path in sorted(_glob(ctx, os.path.join(root, pattern.lstrip('/')))):
+                if self.ignore_func(path) or _isdir(ctx, path):
                     continue
                 try:
                     results.append(
@@ -933,7 +1100,8 @@ class listdir(object):
         p = os.path.join(ctx.root, self.path.lstrip('/'))
         p = ctx.locate_path(p)
         try:
-            result = os.listdir(p)
+            index = getattr(ctx, "index", None)
+            result = index.listdir(p) if index else os.listdir(p)
         except OSError as e:
             raise ContentException(str(e))
         return sorted([r for r in result if not self.ignore_func(r)])
@@ -958,7 +1126,7 @@ class listglob(listdir):
         ctx = _get_context(self.context, broker)
         p = os.path.join(ctx.root, self.path.lstrip('/'))
         p = ctx.locate_path(p)
-        result = glob(p)
+        result = _glob(ctx, p)
         # generator expression; we don't need the full list at this step
         result = (os.path.relpath(r, start=ctx.root) for r in result)
         result = sorted([r for r in result if not self.ignore_func(r)])
@@ -1301,8 +1469,8 @@ class foreach_collect(object):
             source = [source]
         for e in source:
             pattern = ctx.locate_path(self.path % e)
-            for p in glob(os.path.join(root, pattern.lstrip('/'))):
-                if self.ignore_func(p) or os.path.isdir(p):
+            for p in _glob(ctx, os.path.join(root, pattern.lstrip('/'))):
+                if self.ignore_func(p) or _isdir(ctx, p):
                     continue
                 try:
                     result.append(
@@ -1559,6 +1727,7 @@ class find(object):
 
         self.spec = spec
         self.pattern = pattern if isinstance(pattern, list) else [pattern]
+        self._matcher = filters.FilterMatcher(self.pattern)
         self.__name__ = self.__class__.__name__
         self.__module__ = self.__class__.__module__
 
@@ -1584,7 +1753,7 @@ class find(object):
             stream = d.content if d.loaded else d.stream()
             lines = []
             for line in stream:
-                if any(p in line for p in self.pattern):
+                if self._matcher.search(line):
                     lines.append(line)
             if lines:
                 results[origin] = lines
@@ -1593,6 +1762,49 @@ class find(object):
         return dict(results)
 
 
+_PATH_SUBSTITUTION = re.compile(r"%(\([^)]*\))?[#0 +-]*\d*(\.\d+)?[sdirfx]|\$\{?\w+\}?")
+
+
+def _reads_fs_root(comp):
+    """
+    Returns whether `comp` depends on a filesystem context other than
+    :class:`insights.core.context.HostContext`.
+    """
+    for dep in dr.get_dependencies(comp):
+        if dep in FSRoots or getattr(dep, "marker", None):
+            if not issubclass(dep, HostContext):
+                return True
+    return False
+
+
+def get_path_patterns(components):
+    """
+    Returns the glob patterns of the paths that the file datasources in
+    `components` can read from an archive, relative to the root of the
+    context.  Template substitutions and environment variables in the paths
+    become ``*``.
+
+    Returns ``None`` if another of the `components` depends on an archive
+    context directly, since it can read any path.
+    """
+    patterns = set()
+    for comp in components:
+        if not _reads_fs_root(comp):
+            continue
+        if isinstance(comp, listdir) and not isinstance(comp, listglob):
+            paths = [os.path.join(comp.path, "*")]
+        elif isinstance(comp, (simple_file, listglob, foreach_collect)):
+            paths = [comp.path]
+        elif isinstance(comp, glob_file):
+            paths = comp.patterns
+        elif isinstance(comp, first_file):
+            paths = comp.paths
+        else:
+            return None
+        patterns.update(_PATH_SUBSTITUTION.sub("*", p).lstrip("/") for p in paths)
+    return sorted(patterns)
+
+
 @serializer(CommandOutputProvider)
 def serialize_command_output(obj, root):
     rel = os.path.join("insights_commands", obj.relative_path)
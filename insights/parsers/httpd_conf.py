@@ -11,7 +11,8 @@ from insights.parsr import (Char, EOF, EOL, EndTagName, Forward, FS, GT, InSet,
                             LT, Letters, Lift, LineEnd, Many, Number, OneLineComment,
                             PosMarker, QuotedString, StartTagName, String, WS, WSChar,
                             skip_none)
-from insights.parsr.query import Directive, Entry, Section
+from insights.parsr.grammar import Grammar
+from insights.parsr.query import Directive, Entry, Section, set_src
 from insights.specs import Specs
 
 
@@ -19,43 +20,12 @@ class DocParser(object):
     def __init__(self, ctx):
         self.ctx = ctx
 
-        Complex = Forward()
-        Comment = (WS >> OneLineComment("#")).map(lambda x: None)
-
-        Cont = Char("\\") + EOL
-        First = InSet(string.ascii_letters + "_/")
-        Rest = String(string.ascii_letters + "_/" + string.digits)
-        FirstRest = (First + Rest).map("".join)
-        Name = (FirstRest << (Many(WSChar) + Cont)) | FirstRest
-
-        Num = Number & (WSChar | LineEnd)
-
-        StartName = WS >> PosMarker(StartTagName(Letters)) << WS
-        EndName = WS >> EndTagName(Letters, ignore_case=True) << WS
-
-        AttrStart = Many(WSChar)
-        AttrEnd = (Many(WSChar) + Cont) | Many(WSChar)
-
-        BareAttr = String(set(string.printable) - (set(string.whitespace) | set("<>'\"")))
-        OpAttr = (Literal("!=") | Literal("<=") | Literal(">=") | InSet("<>")) & WSChar + BareAttr
-        EmptyAttr = String('"\'', min_length=2)
-        Attr = AttrStart >> (Num | QuotedString.map(self.remove_cont) | OpAttr | BareAttr | EmptyAttr) << AttrEnd
-        Attrs = Many(Attr)
-
-        StartTag = (WS + LT) >> (StartName + Attrs) << (GT + WS)
-        EndTag = (WS + LT + FS) >> EndName << (GT + WS)
-
-        Simple = WS >> (Lift(self.to_directive) * PosMarker(Name) * Attrs) << WS
-        Stanza = Simple | Complex | Comment | Many(WSChar | EOL, lower=1).map(lambda x: None)
-        Complex <= (Lift(self.to_section) * StartTag * Many(Stanza).map(skip_none)) << EndTag
-        Doc = Many(Stanza).map(skip_none)
-
-        self.Top = Doc + EOF
-
-    def remove_cont(self, val):
+    @staticmethod
+    def remove_cont(val):
         return "".join([x.strip().strip("\\") for x in val.split("\n")])
 
-    def typed(self, val):
+    @staticmethod
+    def typed(val):
         try:
             v = val.lower()
             if v in ("on", "yes", "true"):
@@ -66,16 +36,22 @@ class DocParser(object):
             pass
         return val
 
-    def to_directive(self, name, attrs):
-        attrs = attrs if len(attrs) > 1 else [self.typed(a) for a in attrs]
-        return Directive(name=name.value, attrs=attrs, lineno=name.lineno,
-                         src=self.ctx)
+    @staticmethod
+    def to_directive(name, attrs):
+        attrs = attrs if len(attrs) > 1 else [DocParser.typed(a) for a in attrs]
+        return Directive(name=name.value, attrs=attrs, lineno=name.lineno)
 
-    def to_section(self, tag, children):
+    @staticmethod
+    def to_section(tag, children):
         name, attrs = tag
-        attrs = attrs if len(attrs) > 1 else [self.typed(a) for a in attrs]
+        attrs = attrs if len(attrs) > 1 else [DocParser.typed(a) for a in attrs]
         return Section(name=name.value, attrs=attrs, children=children,
-                       lineno=name.lineno, src=self.ctx)
+                       lineno=name.lineno)
+
+    def Top(self, content):
+        result = _GRAMMAR(content)
+        set_src(result[0], self.ctx)
+        return result
 
     def __call__(self, content):
         try:
@@ -84,6 +60,44 @@ class DocParser(object):
             raise ParseException("There was an exception when parsing one of the httpd config files.")
 
 
+def _grammar():
+    Complex = Forward()
+    Comment = (WS >> OneLineComment("#")).map(lambda x: None)
+
+    Cont = Char("\\") + EOL
+    First = InSet(string.ascii_letters + "_/")
+    Rest = String(string.ascii_letters + "_/" + string.digits)
+    FirstRest = (First + Rest).map("".join)
+    Name = (FirstRest << (Many(WSChar) + Cont)) | FirstRest
+
+    Num = Number & (WSChar | LineEnd)
+
+    StartName = WS >> PosMarker(StartTagName(Letters)) << WS
+    EndName = WS >> EndTagName(Letters, ignore_case=True) << WS
+
+    AttrStart = Many(WSChar)
+    AttrEnd = (Many(WSChar) + Cont) | Many(WSChar)
+
+    BareAttr = String(set(string.printable) - (set(string.whitespace) | set("<>'\"")))
+    OpAttr = (Literal("!=") | Literal("<=") | Literal(">=") | InSet("<>")) & WSChar + BareAttr
+    EmptyAttr = String('"\'', min_length=2)
+    Attr = AttrStart >> (Num | QuotedString.map(DocParser.remove_cont) | OpAttr | BareAttr | EmptyAttr) << AttrEnd
+    Attrs = Many(Attr)
+
+    StartTag = (WS + LT) >> (StartName + Attrs) << (GT + WS)
+    EndTag = (WS + LT + FS) >> EndName << (GT + WS)
+
+    Simple = WS >> (Lift(DocParser.to_directive) * PosMarker(Name) * Attrs) << WS
+    Stanza = Simple | Complex | Comment | Many(WSChar | EOL, lower=1).map(lambda x: None)
+    Complex <= (Lift(DocParser.to_section) * StartTag * Many(Stanza).map(skip_none)) << EndTag
+    Doc = Many(Stanza).map(skip_none)
+
+    return Doc + EOF
+
+
+_GRAMMAR = Grammar("httpd_conf", _grammar)
+
+
 class HttpdConfBase(ConfigParser):
     """
     Parse the keyword-and-value-but-also-vaguely-XML of an Apache configuration
@@ -11,14 +11,17 @@ ContainerInstalledRpms - command ``rpm -qa`` for containers
 
 import json
 
+from bisect import bisect_left
 from collections import defaultdict
+from operator import attrgetter
+from sys import intern
 
 from insights import ContainerParser, parser, CommandParser
 from insights.core.exceptions import SkipComponent
 from insights.specs import Specs
 from insights.util import deprecated
 from insights.util import rsplit
-from insights.util.rpm_vercmp import rpm_version_compare
+from insights.util.rpm_vercmp import evr_key, rpm_version_key
 
 
 # This list of architectures is taken from PDC (Product Definition Center):
@@ -87,7 +90,12 @@ here https://pdc.fedoraproject.org/rest_api/v1/arches/.
 class RpmList(object):
     """
     Mixin class providing ``__contains__``, ``get_max``, ``get_min``,
-    ``newest``, and ``oldest`` implementations for components that handle rpms.
+    ``newest``, ``oldest``, and ``get_range`` implementations for components
+    that handle rpms.
+
+    The packages of each name are sorted by their
+    :attr:`InstalledRpm.version_key` the first time they're looked up, and
+    sorted again only when the list of them in :attr:`packages` changes.
     """
 
     def __contains__(self, package_name):
@@ -120,10 +128,14 @@ class RpmList(object):
         Returns:
             InstalledRpm: Installed RPM with highest version
         """
-        if package_name not in self.packages:
+        pkgs = self.packages.get(package_name)
+        if not pkgs:
             return None
-        else:
-            return max(self.packages[package_name])
+        if len(pkgs) == 1:
+            return pkgs[0]
+        ordered, keys = self._sorted_packages(package_name)
+        # the first of the highest ones, the same as max()
+        return ordered[bisect_left(keys, keys[-1])]
 
     def get_min(self, package_name):
         """
@@ -135,16 +147,62 @@ class RpmList(object):
         Returns:
             InstalledRpm: Installed RPM with lowest version
         """
-        if package_name not in self.packages:
+        pkgs = self.packages.get(package_name)
+        if not pkgs:
             return None
-        else:
-            return min(self.packages[package_name])
+        if len(pkgs) == 1:
+            return pkgs[0]
+        return self._sorted_packages(package_name)[0][0]
+
+    def get_range(self, package_name, start=None, end=None):
+        """
+        Returns the installed packages with the given name and a version from
+        `start` up to, but not including, `end`, from the lowest version to the
+        highest.
+
+        Args:
+            package_name (str): Installed RPM package name such as 'kernel'
+            start (InstalledRpm or str): The lowest version, an
+                ``InstalledRpm`` or a ``[epoch:]version[-release]`` string such
+                as '3.10.0-327.el7'.  Without a release, every release of the
+                version is included.  There's no lowest version if it's None.
+            end (InstalledRpm or str): The version above the highest one, in
+                the same form as `start`.  Without a release, every release of
+                the version is excluded.  There's no highest version if it's
+                None.
+
+        Returns:
+            list: The InstalledRpm objects in the range.
+        """
+        if not self.packages.get(package_name):
+            return []
+        ordered, keys = self._sorted_packages(package_name)
+        lo = 0 if start is None else bisect_left(keys, _threshold_key(start))
+        hi = len(keys) if end is None else bisect_left(keys, _threshold_key(end))
+        return ordered[lo:hi]
+
+    def _sorted_packages(self, package_name):
+        """
+        Returns the packages with the given name sorted by version, and their
+        version keys.
+        """
+        index = self.__dict__.setdefault("_version_index", {})
+        pkgs = self.packages[package_name]
+        entry = index.get(package_name)
+        if entry is None or entry[0] is not pkgs or entry[1] != len(pkgs):
+            ordered = sorted(pkgs, key=attrgetter("version_key"))
+            entry = index[package_name] = (pkgs, len(pkgs), ordered, [p.version_key for p in ordered])
+        return entry[2], entry[3]
 
     # re-export get_max/min with more descriptive names
     newest = get_max
     oldest = get_min
 
 
+def _threshold_key(value):
+    return value.version_key if isinstance(value, InstalledRpm) else evr_key(value)
+
+
 @parser(Specs.installed_rpms)
 class InstalledRpms(CommandParser, RpmList):
     """
@@ -398,6 +456,13 @@ class InstalledRpm(object):
     SOSREPORT_KEYS = ['installtime', 'buildtime', 'vendor', 'buildserver', 'pgpsig', 'pgpsig_short']
     """list: List of keys for SOS Report RPM information."""
 
+    # Systems have thousands of packages, so the common attributes are kept
+    # in slots.  Any others, like the SOS Report information, still go in the
+    # instance dictionary.  The attributes with few distinct values are
+    # interned, so they're shared by the packages of every archive.
+    __slots__ = ('name', 'version', 'release', 'arch', 'epoch', 'vendor', 'redhat_signed', '_version_key', '__dict__')
+    _INTERNED = frozenset(['name', 'arch', 'epoch', 'vendor'])
+
     def __init__(self, data):
         self.name = None
         """str: RPM package name."""
@@ -413,13 +478,14 @@ class InstalledRpm(object):
         self.vendor = None
         """str: RPM package vendor. `None` when no 'vendor' info"""
 
+        self._version_key = None
+
         if isinstance(data, str):
             data = self._parse_package(data)
 
         for k, v in data.items():
-            setattr(self, k, v)
-        self.epoch = data['epoch'] if 'epoch' in data and data['epoch'] != '(none)' else '0'
-        self.vendor = data['vendor'] if 'vendor' in data else None
+            setattr(self, k, intern(v) if k in self._INTERNED and isinstance(v, str) else v)
+        self.epoch = self.epoch if 'epoch' in data and data['epoch'] != '(none)' else '0'
         _gpg_key_pos = data.get(
             'sigpgp',
             data.get(
@@ -582,6 +648,24 @@ class InstalledRpm(object):
             rpm.epoch = self.epoch
             return rpm
 
+    @property
+    def version_key(self):
+        """
+        tuple: A key of the epoch, version and release that sorts the same as
+        the packages compare, see :func:`insights.util.rpm_vercmp.rpm_version_key`.
+        It's computed the first time it's used, and again only if the epoch,
+        version or release change.
+        """
+        cached = getattr(self, '_version_key', None)
+        if (
+            cached is None
+            or cached[0] is not self.epoch
+            or cached[1] is not self.version
+            or cached[2] is not self.release
+        ):
+            cached = self._version_key = (self.epoch, self.version, self.release, rpm_version_key(self))
+        return cached[3]
+
     def __getitem__(self, item):
         """
         Allows to use `rpm["element"]` instead of `rpm.element`. Dot notation should be preferred,
@@ -609,7 +693,7 @@ class InstalledRpm(object):
                 )
             )
 
-        return rpm_version_compare(self, other) == 0
+        return self.version_key == other.version_key
 
     def __lt__(self, other):
         if not isinstance(other, InstalledRpm):
@@ -618,7 +702,7 @@ class InstalledRpm(object):
         if self == other:
             return False
 
-        return rpm_version_compare(self, other) < 0
+        return self.version_key < other.version_key
 
     def __ne__(self, other):
         return not self == other
@@ -17,6 +17,7 @@ from insights.parsers import get_active_lines
 from insights.parsr import (AnyChar, Choice, EOF, EOL, Forward, InSet, LeftCurly, LineEnd,
                             Literal, Many, Number, OneLineComment, Opt, PosMarker,
                             QuotedString, RightCurly, String, WS, WSChar, skip_none)
+from insights.parsr.grammar import Grammar
 from insights.parsr.query import Directive, Entry, Section
 from insights.specs import Specs
 
@@ -155,33 +156,8 @@ class DocParser(object):
     def __init__(self, ctx):
         self.ctx = ctx
 
-        scripts = set("postrotate prerotate firstaction lastaction preremove".split())
-        Stanza = Forward()
-        Spaces = Many(WSChar)
-        Bare = String(set(string.printable) - (set(string.whitespace) | set("=#{}'\"")))
-        Num = Number & (WSChar | LineEnd)
-        Comment = OneLineComment("#").map(lambda x: None)
-        ScriptStart = WS >> PosMarker(Choice([Literal(s) for s in scripts])) << WS
-        ScriptEnd = Literal("endscript")
-        Line = (WS >> AnyChar.until(EOL) << WS).map(lambda x: "".join(x))
-        Lines = Line.until(ScriptEnd | EOF).map(lambda x: "\n".join(x))
-        Script = ScriptStart + Lines << Opt(ScriptEnd)
-        Script = Script.map(lambda x: [x[0], [x[1]], None])
-        BeginBlock = WS >> LeftCurly << WS
-        EndBlock = WS >> RightCurly
-        EqualChars = set("=")
-        Equal = InSet(EqualChars)
-        First = PosMarker((Bare | QuotedString)) << Spaces
-        Attr = Spaces >> (Num | Bare | QuotedString) << Spaces
-        Rest = Opt(Equal) >> Many(Attr)
-        Block = BeginBlock >> Many(Stanza).map(skip_none).map(self.to_entries) << EndBlock
-        Stmt = WS >> (Script | (First + Rest + Opt(Block))) << WS
-        Stanza <= WS >> (Stmt | Comment) << WS
-        Doc = Many(Stanza).map(skip_none).map(self.to_entries)
-
-        self.Top = Doc << EOF
-
-    def to_entries(self, x):
+    @staticmethod
+    def to_entries(x):
         ret = []
         for i in x:
             name, attrs, body = i
@@ -192,6 +168,9 @@ class DocParser(object):
                 ret.append(Directive(name=name.value, attrs=attrs, lineno=name.lineno))
         return ret
 
+    def Top(self, content):
+        return _GRAMMAR(content)
+
     def __call__(self, content):
         try:
             return self.Top(content)
@@ -199,6 +178,36 @@ class DocParser(object):
             raise ParseException("There was an exception when parsing the logrotate config file.")
 
 
+def _grammar():
+    scripts = set("postrotate prerotate firstaction lastaction preremove".split())
+    Stanza = Forward()
+    Spaces = Many(WSChar)
+    Bare = String(set(string.printable) - (set(string.whitespace) | set("=#{}'\"")))
+    Num = Number & (WSChar | LineEnd)
+    Comment = OneLineComment("#").map(lambda x: None)
+    ScriptStart = WS >> PosMarker(Choice([Literal(s) for s in scripts])) << WS
+    ScriptEnd = Literal("endscript")
+    Line = (WS >> AnyChar.until(EOL) << WS).map(lambda x: "".join(x))
+    Lines = Line.until(ScriptEnd | EOF).map(lambda x: "\n".join(x))
+    Script = ScriptStart + Lines << Opt(ScriptEnd)
+    Script = Script.map(lambda x: [x[0], [x[1]], None])
+    BeginBlock = WS >> LeftCurly << WS
+    EndBlock = WS >> RightCurly
+    EqualChars = set("=")
+    Equal = InSet(EqualChars)
+    First = PosMarker((Bare | QuotedString)) << Spaces
+    Attr = Spaces >> (Num | Bare | QuotedString) << Spaces
+    Rest = Opt(Equal) >> Many(Attr)
+    Block = BeginBlock >> Many(Stanza).map(skip_none).map(DocParser.to_entries) << EndBlock
+    Stmt = WS >> (Script | (First + Rest + Opt(Block))) << WS
+    Stanza <= WS >> (Stmt | Comment) << WS
+    Doc = Many(Stanza).map(skip_none).map(DocParser.to_entries)
+    return Doc << EOF
+
+
+_GRAMMAR = Grammar("logrotate_conf", _grammar)
+
+
 def parse_doc(content, ctx=None):
     """ Parse a configuration document into a tree that can be queried. """
     if isinstance(content, list):
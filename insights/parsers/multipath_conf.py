@@ -15,16 +15,18 @@ from insights.core.plugins import parser
 from insights.parsr import (EOF, Forward, LeftCurly, Lift, LineEnd, Literal,
                             Many, Number, OneLineComment, PosMarker, QuotedString,
                             RightCurly, String, WS, WSChar, skip_none)
-from insights.parsr.query import Entry
+from insights.parsr.grammar import Grammar
+from insights.parsr.query import Entry, set_src
 from insights.specs import Specs
 
 
-def parse_doc(content, ctx):
-    def to_entry(name, rest):
-        if isinstance(rest, list):
-            return Entry(name=name.value, children=rest, lineno=name.lineno, src=ctx)
-        return Entry(name=name.value, attrs=[rest], lineno=name.lineno, src=ctx)
+def _to_entry(name, rest):
+    if isinstance(rest, list):
+        return Entry(name=name.value, children=rest, lineno=name.lineno)
+    return Entry(name=name.value, attrs=[rest], lineno=name.lineno)
+
 
+def _grammar():
     Stmt = Forward()
     Num = Number & (WSChar | LineEnd)
     NULL = Literal("none", value=None)
@@ -33,16 +35,20 @@ def parse_doc(content, ctx):
     EndBlock = (WS >> RightCurly << WS)
     Bare = String(set(string.printable) - (set(string.whitespace) | set("#{}'\"")))
     Name = WS >> PosMarker(String(string.ascii_letters + "_")) << WS
-    Value = WS >> (Num | NULL | QuotedString | Bare) << WS
     EmptyString = String('"\'', min_length=2)
     Value = WS >> (Num | NULL | QuotedString | EmptyString | Bare) << WS
     Block = BeginBlock >> Many(Stmt).map(skip_none) << EndBlock
-    Stanza = (Lift(to_entry) * Name * (Block | Value)) | Comment
+    Stanza = (Lift(_to_entry) * Name * (Block | Value)) | Comment
     Stmt <= WS >> Stanza << WS
     Doc = Many(Stmt).map(skip_none)
-    Top = Doc + EOF
+    return Doc + EOF
+
 
-    return Entry(children=Top(content)[0])
+_GRAMMAR = Grammar("multipath_conf", _grammar)
+
+
+def parse_doc(content, ctx):
+    return Entry(children=set_src(_GRAMMAR(content)[0], ctx))
 
 
 @parser(Specs.multipath_conf)
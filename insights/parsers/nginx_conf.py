@@ -18,7 +18,8 @@ from insights.core.plugins import parser
 from insights.parsr import (EOF, EmptyQuotedString, Forward, LeftCurly, Lift, LineEnd, RightCurly,
                             Many, Number, OneLineComment, PosMarker, SemiColon, QuotedString,
                             skip_none, String, WS, WSChar)
-from insights.parsr.query import Directive, Entry, Section
+from insights.parsr.grammar import Grammar
+from insights.parsr.query import Directive, Entry, Section, set_src
 from insights.specs import Specs
 
 
@@ -128,36 +129,40 @@ class NginxConfPEG(ConfigParser):
         >>> nginxconfpeg['http']['server'][0]['location'][0]['fastcgi_pass'][-1].value
         '127.0.0.1:1025'
     """
-    def __init__(self, *args, **kwargs):
-        def to_entry(name, attrs, body):
-            if body == ";":
-                return Directive(name=name.value, attrs=attrs, lineno=name.lineno, src=self)
-            return Section(name=name.value, attrs=attrs, children=body, lineno=name.lineno, src=self)
-
-        name_chars = string.ascii_letters + string.digits + "*_/~$|()\\."
-        Stmt = Forward()
-        Num = Number & (WSChar | LineEnd | SemiColon)
-        Comment = OneLineComment("#").map(lambda x: None)
-        BeginBlock = WS >> LeftCurly << WS
-        EndBlock = WS >> RightCurly << WS
-        Bare = String(set(string.printable) - (set(string.whitespace) | set("#;{}'\"")))
-        Name = WS >> PosMarker(String(name_chars) | EmptyQuotedString(name_chars)) << WS
-        Attr = WS >> (Num | Bare | QuotedString | EmptyQuotedString(name_chars)) << WS
-        Attrs = Many(Attr)
-        Block = BeginBlock >> Many(Stmt).map(skip_none) << EndBlock
-        Stanza = (Lift(to_entry) * Name * Attrs * (Block | SemiColon)) | Comment
-        Stmt <= WS >> Stanza << WS
-        Doc = Many(Stmt).map(skip_none)
-        self.Top = Doc + EOF
-        super(NginxConfPEG, self).__init__(*args, **kwargs)
-
     def parse_doc(self, content):
         try:
-            return Entry(children=self.Top("\n".join(content))[0], src=self)
+            return Entry(children=set_src(_GRAMMAR("\n".join(content))[0], self), src=self)
         except Exception:
             raise ParseException("There was an exception when parsing the config file.")
 
 
+def _to_entry(name, attrs, body):
+    if body == ";":
+        return Directive(name=name.value, attrs=attrs, lineno=name.lineno)
+    return Section(name=name.value, attrs=attrs, children=body, lineno=name.lineno)
+
+
+def _grammar():
+    name_chars = string.ascii_letters + string.digits + "*_/~$|()\\."
+    Stmt = Forward()
+    Num = Number & (WSChar | LineEnd | SemiColon)
+    Comment = OneLineComment("#").map(lambda x: None)
+    BeginBlock = WS >> LeftCurly << WS
+    EndBlock = WS >> RightCurly << WS
+    Bare = String(set(string.printable) - (set(string.whitespace) | set("#;{}'\"")))
+    Name = WS >> PosMarker(String(name_chars) | EmptyQuotedString(name_chars)) << WS
+    Attr = WS >> (Num | Bare | QuotedString | EmptyQuotedString(name_chars)) << WS
+    Attrs = Many(Attr)
+    Block = BeginBlock >> Many(Stmt).map(skip_none) << EndBlock
+    Stanza = (Lift(_to_entry) * Name * Attrs * (Block | SemiColon)) | Comment
+    Stmt <= WS >> Stanza << WS
+    Doc = Many(Stmt).map(skip_none)
+    return Doc + EOF
+
+
+_GRAMMAR = Grammar("nginx_conf", _grammar)
+
+
 @parser(Specs.container_nginx_conf)
 class ContainerNginxConfPEG(ContainerParser, NginxConfPEG):
     """
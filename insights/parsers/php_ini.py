@@ -61,7 +61,8 @@ from insights.parsr import (Char, EOF, HangingString, InSet, LeftBracket,
                             OneLineComment, Opt, PosMarker, QuotedString,
                             RightBracket, String, WithIndent, WS, WSChar,
                             skip_none)
-from insights.parsr.query import Directive, Entry, Section, eq
+from insights.parsr.grammar import Grammar
+from insights.parsr.query import Directive, Entry, Section, eq, set_src
 from insights.specs import Specs
 
 
@@ -69,6 +70,75 @@ from insights.specs import Specs
 add_filter(Specs.php_ini, "[")
 
 
+def _to_directive(x):
+    name, rest = x
+    rest = [rest] if rest is not None else []
+    return Directive(name=name.value.strip(), attrs=rest, lineno=name.lineno)
+
+
+def _to_section(name, rest):
+    return Section(name=name.value.strip(), children=rest, lineno=name.lineno)
+
+
+def _apply_defaults(cfg):
+    if "DEFAULT" not in cfg:
+        return cfg
+
+    defaults = cfg["DEFAULT"]
+    not_defaults = cfg[~eq("DEFAULT")]
+    for c in not_defaults:
+        for d in defaults.grandchildren:
+            if d.name not in c:
+                c.children.append(d)
+
+    cfg.children = list(not_defaults)
+    return cfg
+
+
+def _make_bytes(number, char_multiple):
+    if char_multiple.lower() == 'k':
+        return number * 2**10
+    if char_multiple.lower() == 'm':
+        return number * 2**20
+    if char_multiple.lower() == 'g':
+        return number * 2**30
+
+
+def _grammar():
+    header_chars = (set(string.printable) - set(string.whitespace) - set("[]")) | set(" ")
+    sep_chars = set("=")
+    key_chars = header_chars - sep_chars
+    value_chars = set(string.printable) - set("\n\r")
+
+    On = Literal("on", True, ignore_case=True)
+    Off = Literal("off", False, ignore_case=True)
+    Tru = Literal("true", True, ignore_case=True)
+    Fals = Literal("false", False, ignore_case=True)
+    Boolean = ((On | Off | Tru | Fals) & (WSChar | LineEnd)) % "Boolean"
+    Num = Number & (WSChar | LineEnd)
+    QuoStr = QuotedString & (WSChar | LineEnd)
+    # Handle php.ini shorthand notation for memory limits: 1G, 8M, 50K
+    # https://www.php.net/manual/en/faq.using.php#faq.using.shorthandbytes
+    MemNum = (Lift(_make_bytes) * Number * (Char('K') | Char('M') | Char('G'))) & (WSChar | LineEnd)
+
+    LeftEnd = (WS + LeftBracket + WS)
+    RightEnd = (WS + RightBracket + WS)
+    Header = (LeftEnd >> PosMarker(String(header_chars)) << RightEnd) % "Header"
+    Key = WS >> PosMarker(String(key_chars)) << WS
+    Sep = InSet(sep_chars, "Sep")
+    Value = WS >> (Boolean | MemNum | Num | QuoStr | HangingString(value_chars))
+    KVPair = WithIndent(Key + Opt(Sep >> Value)) % "KVPair"
+    Comment = (WS >> (OneLineComment(";")).map(lambda x: None))
+
+    Line = Comment | KVPair.map(_to_directive)
+    Sect = Lift(_to_section) * Header * Many(Line).map(skip_none)
+    Doc = Many(Comment | Sect).map(skip_none)
+    return Doc << WS << EOF
+
+
+_GRAMMAR = Grammar("php_ini", _grammar)
+
+
 @parser(Specs.php_ini, continue_on_error=False)
 class PHPConf(ConfigParser):
     """
@@ -76,70 +146,9 @@ class PHPConf(ConfigParser):
     """
     def parse_doc(self, content):
         try:
-            def to_directive(x):
-                name, rest = x
-                rest = [rest] if rest is not None else []
-                return Directive(name=name.value.strip(), attrs=rest, lineno=name.lineno, src=self)
-
-            def to_section(name, rest):
-                return Section(name=name.value.strip(), children=rest, lineno=name.lineno, src=self)
-
-            def apply_defaults(cfg):
-                if "DEFAULT" not in cfg:
-                    return cfg
-
-                defaults = cfg["DEFAULT"]
-                not_defaults = cfg[~eq("DEFAULT")]
-                for c in not_defaults:
-                    for d in defaults.grandchildren:
-                        if d.name not in c:
-                            c.children.append(d)
-
-                cfg.children = list(not_defaults)
-                return cfg
-
-            def make_bytes(number, char_multiple):
-                if char_multiple.lower() == 'k':
-                    return number * 2**10
-                if char_multiple.lower() == 'm':
-                    return number * 2**20
-                if char_multiple.lower() == 'g':
-                    return number * 2**30
-
             content = "\n".join(content)
-
-            header_chars = (set(string.printable) - set(string.whitespace) - set("[]")) | set(" ")
-            sep_chars = set("=")
-            key_chars = header_chars - sep_chars
-            value_chars = set(string.printable) - set("\n\r")
-
-            On = Literal("on", True, ignore_case=True)
-            Off = Literal("off", False, ignore_case=True)
-            Tru = Literal("true", True, ignore_case=True)
-            Fals = Literal("false", False, ignore_case=True)
-            Boolean = ((On | Off | Tru | Fals) & (WSChar | LineEnd)) % "Boolean"
-            Num = Number & (WSChar | LineEnd)
-            QuoStr = QuotedString & (WSChar | LineEnd)
-            # Handle php.ini shorthand notation for memory limits: 1G, 8M, 50K
-            # https://www.php.net/manual/en/faq.using.php#faq.using.shorthandbytes
-            MemNum = (Lift(make_bytes) * Number * (Char('K') | Char('M') | Char('G'))) & (WSChar | LineEnd)
-
-            LeftEnd = (WS + LeftBracket + WS)
-            RightEnd = (WS + RightBracket + WS)
-            Header = (LeftEnd >> PosMarker(String(header_chars)) << RightEnd) % "Header"
-            Key = WS >> PosMarker(String(key_chars)) << WS
-            Sep = InSet(sep_chars, "Sep")
-            Value = WS >> (Boolean | MemNum | Num | QuoStr | HangingString(value_chars))
-            KVPair = WithIndent(Key + Opt(Sep >> Value)) % "KVPair"
-            Comment = (WS >> (OneLineComment(";")).map(lambda x: None))
-
-            Line = Comment | KVPair.map(to_directive)
-            Sect = Lift(to_section) * Header * Many(Line).map(skip_none)
-            Doc = Many(Comment | Sect).map(skip_none)
-            Top = Doc << WS << EOF
-
-            res = Entry(children=Top(content), src=self)
-            return apply_defaults(res)
+            res = Entry(children=set_src(_GRAMMAR(content), self), src=self)
+            return _apply_defaults(res)
 
         except SkipComponent:
             raise
@@ -49,6 +49,7 @@ from __future__ import print_function
 import functools
 import logging
 import os
+import re
 import string
 import traceback
 
@@ -117,14 +118,13 @@ def _debug_hook(func):
     """
     _debug_hook wraps the process function of every parser. It maintains a
     stack of active parsers during evaluation to help with error reporting and
-    prints diagnostic messages for parsers with debug enabled.
+    prints diagnostic messages for parsers with debug enabled. When the
+    :py:class:`Context` has a memo, the results of the parsers in its
+    ``memoized`` set are kept in it for each position, so they aren't
+    evaluated again after a backtrack.
     """
 
-    @functools.wraps(func)
-    def inner(self, pos, data, ctx):
-        if ctx.function_error is not None:
-            # no point in continuing...
-            raise Exception()
+    def evaluate(self, pos, data, ctx):
         ctx.parser_stack.append(self)
         if self._debug:
             line = ctx.line(pos) + 1
@@ -143,9 +143,47 @@ def _debug_hook(func):
         finally:
             ctx.parser_stack.pop()
 
+    @functools.wraps(func)
+    def inner(self, pos, data, ctx):
+        if ctx.function_error is not None:
+            # no point in continuing...
+            raise Exception()
+        memo = ctx.memo
+        if memo is not None and self in ctx.memoized:
+            key = (self, pos)
+            res = memo.get(key)
+            if res is None:
+                try:
+                    res = memo[key] = evaluate(self, pos, data, ctx)
+                except Exception:
+                    memo[key] = _FAILED
+                    raise
+            elif res is _FAILED:
+                raise Exception()
+            return res
+        if self._debug:
+            return evaluate(self, pos, data, ctx)
+        ctx.parser_stack.append(self)
+        try:
+            return func(self, pos, data, ctx)
+        finally:
+            ctx.parser_stack.pop()
+
     return inner
 
 
+_FAILED = object()
+
+
+def _char_class(chars):
+    """
+    Returns the contents of a regular expression character class that matches
+    the single characters in `chars`.
+    """
+    chars = sorted(c for c in chars if isinstance(c, str) and len(c) == 1)
+    return "".join(re.escape(c) for c in chars) if chars else "^\\s\\S"
+
+
 class Backtrack(Exception):
     """
     Mapped or Lifted functions should Backtrack if they want to fail without
@@ -162,6 +200,9 @@ class Context(object):
     parser. It stores an indention stack to track hanging indents, a tag stack
     for grammars like xml or apache configuration, the active parser stack for
     error reporting, and accumulated errors for the farthest position reached.
+
+    When a parser is called with ``memoize=True``, ``memo`` keeps the result of
+    each parser in ``memoized`` at each position.
     """
 
     def __init__(self, lines, src=None):
@@ -169,10 +210,15 @@ class Context(object):
         self.indents = []
         self.tags = []
         self.src = src
-        self.lines = [i for i, x in enumerate(lines) if x == "\n"]
+        if isinstance(lines, str):
+            self.lines = [m.start() for m in re.finditer("\n", lines)]
+        else:
+            self.lines = [i for i, x in enumerate(lines) if x == "\n"]
         self.parser_stack = []
         self.errors = []
         self.function_error = None
+        self.memo = None
+        self.memoized = frozenset()
 
     def set(self, pos, msg):
         """
@@ -215,8 +261,16 @@ class _ParserMeta(type):
 class Parser(Node, metaclass=_ParserMeta):
     """
     Parser is the common base class of all Parsers.
+
+    A parser's ``process`` method gets the input as the original string with
+    the position to start from, and returns the position after its match with
+    its result.  Parsers whose result depends on the indent or tag stacks of
+    the :py:class:`Context`, or that change them, set ``stateful`` so they
+    aren't memoized.
     """
 
+    stateful = False
+
     def __init__(self):
         super(Parser, self).__init__()
         self.name = None
@@ -324,7 +378,34 @@ class Parser(Node, metaclass=_ParserMeta):
     def process(self, pos, data, ctx):
         raise NotImplementedError()
 
-    def __call__(self, data, src=None, Ctx=Context):
+    def _memoized_parsers(self):
+        """
+        Returns the parsers reachable from this one whose results can be
+        memoized: those with children, unless they're ``stateful`` or contain
+        one that is. Parsers without children are quicker to evaluate again.
+        """
+        parents = {}
+        seen = set()
+        stack = [self]
+        while stack:
+            cur = stack.pop()
+            if cur in seen:
+                continue
+            seen.add(cur)
+            for c in cur.children:
+                parents.setdefault(c, []).append(cur)
+                stack.append(c)
+
+        stateful = set()
+        stack = [p for p in seen if p.stateful]
+        while stack:
+            cur = stack.pop()
+            if cur not in stateful:
+                stateful.add(cur)
+                stack.extend(parents.get(cur, []))
+        return frozenset(p for p in seen if p.children and p not in stateful)
+
+    def __call__(self, data, src=None, Ctx=Context, memoize=False):
         """
         Invoke the parser like a function on a regular string of characters.
 
@@ -332,10 +413,19 @@ class Parser(Node, metaclass=_ParserMeta):
         the Context instance. You also can provide a Context subclass if your
         parsers have particular needs not covered by the default
         implementation that provides significant indent and tag stacks.
+
+        With ``memoize``, the result of every parser at every position is kept,
+        so grammars with alternatives that share a long prefix don't parse the
+        same input again after a backtrack. That's known as packrat parsing.
+        It takes memory in proportion to the input, and the results of the
+        parsers are shared by every alternative that uses them.
         """
-        data = list(data)
-        data.append(None)  # add a terminal so we don't overrun
+        if not isinstance(data, str):
+            data = "".join(data)
         ctx = Ctx(data, src=src)
+        if memoize:
+            ctx.memo = {}
+            ctx.memoized = self._memoized_parsers()
 
         try:
             _, ret = self.process(0, data, ctx)
@@ -358,7 +448,7 @@ class Parser(Node, metaclass=_ParserMeta):
         print(msg.format(lineno, colno, ctx.lines), file=err)
         for parsers, msg in ctx.errors:
             names = " -> ".join([p.name for p in parsers if p.name])
-            v = data[ctx.pos] or "EOF"
+            v = data[ctx.pos] if 0 <= ctx.pos < len(data) else "EOF"
             print(names, file=err)
             print("    {0} Got {1!r}.".format(msg, v), file=err)
         err.seek(0)
@@ -370,12 +460,14 @@ class Parser(Node, metaclass=_ParserMeta):
 
 class AnyChar(Parser):
     def process(self, pos, data, ctx):
-        c = data[pos]
-        if c is not None:
-            return (pos + 1, c)
+        if pos < len(data):
+            return (pos + 1, data[pos])
+        raise Exception(self._expected(pos, ctx))
+
+    def _expected(self, pos, ctx):
         msg = "Expected any character."
         ctx.set(pos, msg)
-        raise Exception(msg)
+        return msg
 
 
 class Char(Parser):
@@ -395,7 +487,7 @@ class Char(Parser):
         self.char = char
 
     def process(self, pos, data, ctx):
-        if data[pos] == self.char:
+        if pos < len(data) and data[pos] == self.char:
             return (pos + 1, self.char)
         msg = "Expected {0}.".format(self.char)
         ctx.set(pos, msg)
@@ -427,14 +519,39 @@ class InSet(Parser):
         super(InSet, self).__init__()
         self.values = set(s)
         self.name = name
+        chars = _char_class(self.values)
+        self.regex = re.compile("[{0}]*".format(chars))
+        self.until_regex = re.compile("[^{0}]*".format(chars))
+        self._message = None
 
     def process(self, pos, data, ctx):
-        c = data[pos]
-        if c in self.values:
-            return (pos + 1, c)
-        msg = "Expected {0}.".format(self)
+        if pos < len(data) and data[pos] in self.values:
+            return (pos + 1, data[pos])
+        raise Exception(self._expected(pos, ctx))
+
+    def _expected(self, pos, ctx):
+        if pos < ctx.pos:
+            # the message wouldn't be kept
+            return None
+        if self._message is None or self._message[0] != self.name:
+            self._message = (self.name, "Expected {0}.".format(self))
+        msg = self._message[1]
         ctx.set(pos, msg)
-        raise Exception(msg)
+        return msg
+
+    def run(self, pos, data, ctx):
+        """
+        Returns the list of characters from ``pos`` up to the first one that
+        isn't in the set. It's like matching the parser until it fails, but
+        all at once.
+        """
+        end = self.regex.match(data, pos).end()
+        ctx.parser_stack.append(self)
+        try:
+            self._expected(end, ctx)
+        finally:
+            ctx.parser_stack.pop()
+        return list(data[pos:end])
 
     def __repr__(self):
         if self.name is None:
@@ -463,26 +580,27 @@ class String(Parser):
         self.chars = set(chars)
         self.echars = set(echars) if echars else set()
         self.min_length = min_length
+        chars = _char_class(self.chars)
+        if self.echars:
+            # an escaped character is preferred to a backslash in chars
+            self.regex = re.compile(r"(?:\\[{0}]|[{1}])*".format(_char_class(self.echars), chars))
+            self.escape = re.compile(r"\\([{0}])".format(_char_class(self.echars)))
+        else:
+            self.regex = re.compile("[{0}]*".format(chars))
+            self.escape = None
+        self._message = None
 
     def process(self, pos, data, ctx):
-        results = []
-        p = data[pos]
-        old = pos
-        while p in self.chars or p == "\\":
-            if p == "\\" and data[pos + 1] in self.echars:
-                results.append(data[pos + 1])
-                pos += 2
-            elif p in self.chars:
-                results.append(p)
-                pos += 1
-            else:
-                break
-            p = data[pos]
-        if len(results) < self.min_length:
-            msg = "Expected {0} of {1}.".format(self.min_length, sorted(self.chars))
-            ctx.set(old, msg)
-            raise Exception(msg)
-        return pos, "".join(results)
+        end = self.regex.match(data, pos).end()
+        result = data[pos:end]
+        if self.escape is not None and "\\" in result:
+            result = self.escape.sub(r"\1", result)
+        if len(result) < self.min_length:
+            if self._message is None:
+                self._message = "Expected {0} of {1}.".format(self.min_length, sorted(self.chars))
+            ctx.set(pos, self._message)
+            raise Exception(self._message)
+        return end, result
 
 
 class Literal(Parser):
@@ -530,27 +648,23 @@ class Literal(Parser):
         self.name = "Literal{0!r}".format(self.chars)
 
     def process(self, pos, data, ctx):
-        old = pos
+        end = pos + len(self.chars)
         if not self.ignore_case:
-            for c in self.chars:
-                if data[pos] == c:
-                    pos += 1
-                else:
-                    msg = "Expected {0!r}.".format(self.chars)
-                    ctx.set(old, msg)
-                    raise Exception(msg)
-            return pos, (self.chars if self.value is self._NULL else self.value)
+            if data.startswith(self.chars, pos):
+                return end, (self.chars if self.value is self._NULL else self.value)
         else:
-            result = []
-            for c in self.chars:
-                if data[pos].lower() == c:
-                    result.append(data[pos])
-                    pos += 1
-                else:
-                    msg = "Expected case insensitive {0!r}.".format(self.chars)
-                    ctx.set(old, msg)
-                    raise Exception(msg)
-            return pos, ("".join(result) if self.value is self._NULL else self.value)
+            result = data[pos:end]
+            if len(result) == len(self.chars) and all(a.lower() == b for a, b in zip(result, self.chars)):
+                return end, (result if self.value is self._NULL else self.value)
+        raise Exception(self._expected(pos, ctx))
+
+    def _expected(self, pos, ctx):
+        if self.ignore_case:
+            msg = "Expected case insensitive {0!r}.".format(self.chars)
+        else:
+            msg = "Expected {0!r}.".format(self.chars)
+        ctx.set(pos, msg)
+        return msg
 
 
 class Wrapper(Parser):
@@ -725,14 +839,18 @@ class Many(Parser):
 
     def process(self, pos, data, ctx):
         orig = pos
-        results = []
         p = self.children[0]
-        while True:
-            try:
-                pos, res = p.process(pos, data, ctx)
-                results.append(res)
-            except Exception:
-                break
+        if type(p) is InSet and not p._debug:
+            results = p.run(pos, data, ctx)
+            pos += len(results)
+        else:
+            results = []
+            while True:
+                try:
+                    pos, res = p.process(pos, data, ctx)
+                    results.append(res)
+                except Exception:
+                    break
         if len(results) < self.lower:
             child = self.children[0]
             msg = "Expected at least {0} of {1}.".format(self.lower, child)
@@ -775,8 +893,39 @@ class Until(Parser):
         super(Until, self).__init__()
         self.set_children([parser, predicate])
 
+    def _find(self, pos, data):
+        """
+        Returns where the predicate first matches from ``pos``, or the end
+        of the data, if it can be found with a search.
+        """
+        pred = self.children[1]
+        if pred._debug:
+            return None
+        if type(pred) is InSet:
+            return pred.until_regex.match(data, pos).end()
+        if type(pred) is Literal and pred.chars and not pred.ignore_case:
+            end = data.find(pred.chars, pos)
+            return len(data) if end == -1 else end
+
+    def _fail(self, parser, pos, ctx):
+        ctx.parser_stack.append(parser)
+        try:
+            parser._expected(pos, ctx)
+        finally:
+            ctx.parser_stack.pop()
+
     def process(self, pos, data, ctx):
         parser, pred = self.children
+        end = self._find(pos, data) if parser is AnyChar and not parser._debug else None
+        if end is not None:
+            # the errors are those of the last predicate and character tried
+            if end > pos:
+                self._fail(pred, end - 1, ctx)
+            if end == len(data):
+                self._fail(pred, end, ctx)
+                self._fail(parser, end, ctx)
+            return end, list(data[pos:end])
+
         results = []
         while True:
             try:
@@ -1080,7 +1229,7 @@ class EOF(Parser):
     """
 
     def process(self, pos, data, ctx):
-        if data[pos] is None:
+        if pos >= len(data):
             return pos, None
         msg = "Expected end of input."
         ctx.set(pos, msg)
@@ -1150,6 +1299,8 @@ class WithIndent(Wrapper):
 
     """
 
+    stateful = True
+
     def process(self, pos, data, ctx):
         new, _ = WS.process(pos, data, ctx)
         try:
@@ -1172,6 +1323,8 @@ class HangingString(Parser):
 
     """
 
+    stateful = True
+
     def __init__(self, chars, echars=None, min_length=1):
         super(HangingString, self).__init__()
         p = String(chars, echars=echars, min_length=min_length)
@@ -1204,6 +1357,8 @@ class StartTagName(Wrapper):
     :py:class:`Context` object.
     """
 
+    stateful = True
+
     def process(self, pos, data, ctx):
         pos, res = self.children[0].process(pos, data, ctx)
         ctx.tags.append(res)
@@ -1218,6 +1373,8 @@ class EndTagName(Wrapper):
     successful.
     """
 
+    stateful = True
+
     def __init__(self, parser, ignore_case=False):
         super(EndTagName, self).__init__(parser)
         self.ignore_case = ignore_case
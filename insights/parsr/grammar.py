@@ -0,0 +1,532 @@
+"""
+Grammars are made of many small parsers, and evaluating one calls each of
+them through the hook that keeps the stack of active parsers for error
+reporting.  :py:func:`compile_parser` turns a grammar into nested closures
+that match the same input with none of that, and :py:class:`Grammar` builds
+and compiles a grammar once per process so every parser instance shares it.
+
+A compiled parser returns the same results as the grammar it was compiled
+from.  When the input doesn't match, it parses it again with the grammar
+itself, so the error messages are the same too.
+
+    .. code-block:: python
+
+        def build():
+            Key = WS >> String(string.ascii_letters) << WS
+            Value = Char("=") >> WS >> Number << WS
+            return Many(Key + Value) << EOF
+
+        Doc = Grammar("kvpairs", build)
+        Doc("a = 1 b = 2")  # returns [["a", 1], ["b", 2]]
+
+Don't change a grammar after it's compiled.
+"""
+import logging
+import threading
+import time
+
+from insights.parsr import (
+    WS,
+    AnyChar,
+    Backtrack,
+    Char,
+    Choice,
+    Context,
+    EmptyQuotedString,
+    EnclosedComment,
+    EndTagName,
+    FollowedBy,
+    Forward,
+    HangingString,
+    InSet,
+    KeepLeft,
+    KeepRight,
+    Lift,
+    Literal,
+    Many,
+    Map,
+    Mark,
+    NotFollowedBy,
+    OneLineComment,
+    Opt,
+    PosMarker,
+    Sequence,
+    StartTagName,
+    String,
+    Until,
+    WithIndent,
+    Wrapper,
+    EOF,
+)
+
+log = logging.getLogger(__name__)
+
+GRAMMARS = {}
+""" The :py:class:`Grammar` instances by name. """
+
+
+class _NoMatch(Exception):
+    pass
+
+
+class _Abort(Exception):
+    """
+    Raised when a mapped function fails with anything but a
+    :py:class:`insights.parsr.Backtrack`, which fails the whole parse.
+    """
+    pass
+
+
+def _call(func, *args):
+    try:
+        return func(*args)
+    except Backtrack:
+        raise _NoMatch()
+    except Exception:
+        raise _Abort()
+
+
+def _any_char(node, compile_):
+    def match(pos, data, ctx):
+        if pos < len(data):
+            return pos + 1, data[pos]
+        raise _NoMatch()
+    return match
+
+
+def _eof(node, compile_):
+    def match(pos, data, ctx):
+        if pos >= len(data):
+            return pos, None
+        raise _NoMatch()
+    return match
+
+
+def _char(node, compile_):
+    char = node.char
+
+    def match(pos, data, ctx):
+        if pos < len(data) and data[pos] == char:
+            return pos + 1, char
+        raise _NoMatch()
+    return match
+
+
+def _in_set(node, compile_):
+    values = node.values
+
+    def match(pos, data, ctx):
+        if pos < len(data) and data[pos] in values:
+            return pos + 1, data[pos]
+        raise _NoMatch()
+    return match
+
+
+def _string(node, compile_):
+    regex, escape, min_length = node.regex.match, node.escape, node.min_length
+
+    def match(pos, data, ctx):
+        end = regex(data, pos).end()
+        result = data[pos:end]
+        if escape is not None and "\\" in result:
+            result = escape.sub(r"\1", result)
+        if len(result) < min_length:
+            raise _NoMatch()
+        return end, result
+    return match
+
+
+def _literal(node, compile_):
+    chars, size, ignore_case = node.chars, len(node.chars), node.ignore_case
+    value = node.value
+    null = value is Literal._NULL
+
+    def match(pos, data, ctx):
+        end = pos + size
+        if not ignore_case:
+            if data.startswith(chars, pos):
+                return end, (chars if null else value)
+        else:
+            result = data[pos:end]
+            if len(result) == size and all(a.lower() == b for a, b in zip(result, chars)):
+                return end, (result if null else value)
+        raise _NoMatch()
+    return match
+
+
+def _sequence(node, compile_):
+    children = [compile_(c) for c in node.children]
+
+    def match(pos, data, ctx):
+        results = []
+        for c in children:
+            pos, res = c(pos, data, ctx)
+            results.append(res)
+        return pos, results
+    return match
+
+
+def _choice(node, compile_):
+    children = [compile_(c) for c in node.children]
+
+    def match(pos, data, ctx):
+        for c in children:
+            try:
+                return c(pos, data, ctx)
+            except _NoMatch:
+                pass
+        raise _NoMatch()
+    return match
+
+
+def _many(node, compile_):
+    child, lower = node.children[0], node.lower
+    if type(child) is InSet and not child._debug:
+        regex = child.regex.match
+
+        def match(pos, data, ctx):
+            end = regex(data, pos).end()
+            if end - pos < lower:
+                raise _NoMatch()
+            return end, list(data[pos:end])
+        return match
+
+    child = compile_(child)
+
+    def match(pos, data, ctx):
+        results = []
+        while True:
+            try:
+                pos, res = child(pos, data, ctx)
+                results.append(res)
+            except _NoMatch:
+                break
+        if len(results) < lower:
+            raise _NoMatch()
+        return pos, results
+    return match
+
+
+def _until(node, compile_):
+    parser, pred = node.children
+    if parser is AnyChar and not parser._debug and node._find(0, "") is not None:
+        find = node._find
+
+        def match(pos, data, ctx):
+            end = find(pos, data)
+            return end, list(data[pos:end])
+        return match
+
+    parser, pred = compile_(parser), compile_(pred)
+
+    def match(pos, data, ctx):
+        results = []
+        while True:
+            try:
+                pred(pos, data, ctx)
+            except _NoMatch:
+                try:
+                    pos, res = parser(pos, data, ctx)
+                    results.append(res)
+                except _NoMatch:
+                    break
+            else:
+                break
+        return pos, results
+    return match
+
+
+def _followed_by(node, compile_):
+    left, right = [compile_(c) for c in node.children]
+
+    def match(pos, data, ctx):
+        new, res = left(pos, data, ctx)
+        right(new, data, ctx)
+        return new, res
+    return match
+
+
+def _not_followed_by(node, compile_):
+    left, right = [compile_(c) for c in node.children]
+
+    def match(pos, data, ctx):
+        new, res = left(pos, data, ctx)
+        try:
+            right(new, data, ctx)
+        except _NoMatch:
+            return new, res
+        raise _NoMatch()
+    return match
+
+
+def _keep_left(node, compile_):
+    left, right = [compile_(c) for c in node.children]
+
+    def match(pos, data, ctx):
+        pos, res = left(pos, data, ctx)
+        pos, _ = right(pos, data, ctx)
+        return pos, res
+    return match
+
+
+def _keep_right(node, compile_):
+    left, right = [compile_(c) for c in node.children]
+
+    def match(pos, data, ctx):
+        pos, _ = left(pos, data, ctx)
+        return right(pos, data, ctx)
+    return match
+
+
+def _opt(node, compile_):
+    child, default = compile_(node.children[0]), node.default
+
+    def match(pos, data, ctx):
+        try:
+            return child(pos, data, ctx)
+        except _NoMatch:
+            return pos, default
+    return match
+
+
+def _map(node, compile_):
+    child, func = compile_(node.children[0]), node.func
+
+    def match(pos, data, ctx):
+        pos, res = child(pos, data, ctx)
+        return pos, _call(func, res)
+    return match
+
+
+def _lift(node, compile_):
+    children, func = [compile_(c) for c in node.children], node.func
+
+    def match(pos, data, ctx):
+        results = []
+        for c in children:
+            pos, res = c(pos, data, ctx)
+            results.append(res)
+        return pos, _call(func, *results)
+    return match
+
+
+def _wrapper(node, compile_):
+    return compile_(node.children[0])
+
+
+def _pos_marker(node, compile_):
+    child = compile_(node.children[0])
+
+    def match(pos, data, ctx):
+        lineno = ctx.line(pos) + 1
+        col = ctx.col(pos) + 1
+        pos, result = child(pos, data, ctx)
+        return pos, Mark(lineno, col, result)
+    return match
+
+
+def _with_indent(node, compile_):
+    ws, child = compile_(WS), compile_(node.children[0])
+
+    def match(pos, data, ctx):
+        new, _ = ws(pos, data, ctx)
+        ctx.indents.append(ctx.col(new))
+        try:
+            return child(new, data, ctx)
+        finally:
+            ctx.indents.pop()
+    return match
+
+
+def _hanging_string(node, compile_):
+    ws, child = compile_(WS), compile_(node.children[0])
+
+    def match(pos, data, ctx):
+        old = pos
+        results = []
+        while True:
+            try:
+                if ctx.col(pos) > ctx.indents[-1]:
+                    pos, res = child(pos, data, ctx)
+                    results.append(res.split("#", 1)[0].rstrip(" \\"))
+                else:
+                    pos = old
+                    break
+                old = pos
+                pos, _ = ws(pos, data, ctx)
+            except _Abort:
+                raise
+            except Exception:
+                break
+        return pos, " ".join(results)
+    return match
+
+
+def _start_tag_name(node, compile_):
+    child = compile_(node.children[0])
+
+    def match(pos, data, ctx):
+        pos, res = child(pos, data, ctx)
+        ctx.tags.append(res)
+        return pos, res
+    return match
+
+
+def _end_tag_name(node, compile_):
+    child, ignore_case = compile_(node.children[0]), node.ignore_case
+
+    def match(pos, data, ctx):
+        pos, res = child(pos, data, ctx)
+        if not ctx.tags:
+            raise _NoMatch()
+        expect = ctx.tags.pop()
+        if (res.lower() != expect.lower()) if ignore_case else (res != expect):
+            raise _NoMatch()
+        return pos, res
+    return match
+
+
+def _interpreted(node, compile_):
+    """Evaluates a parser the compiler doesn't know like it always is."""
+
+    def match(pos, data, ctx):
+        try:
+            return node.process(pos, data, ctx)
+        except Exception:
+            if ctx.function_error is not None:
+                raise _Abort()
+            raise _NoMatch()
+    return match
+
+
+_COMPILERS = {
+    type(AnyChar): _any_char,
+    type(EOF): _eof,
+    Char: _char,
+    InSet: _in_set,
+    String: _string,
+    Literal: _literal,
+    Sequence: _sequence,
+    Choice: _choice,
+    Many: _many,
+    Until: _until,
+    FollowedBy: _followed_by,
+    NotFollowedBy: _not_followed_by,
+    KeepLeft: _keep_left,
+    KeepRight: _keep_right,
+    Opt: _opt,
+    Map: _map,
+    Lift: _lift,
+    Forward: _wrapper,
+    Wrapper: _wrapper,
+    EnclosedComment: _wrapper,
+    OneLineComment: _wrapper,
+    EmptyQuotedString: _wrapper,
+    PosMarker: _pos_marker,
+    WithIndent: _with_indent,
+    HangingString: _hanging_string,
+    StartTagName: _start_tag_name,
+    EndTagName: _end_tag_name,
+}
+
+
+class CompiledParser(object):
+    """
+    A parser compiled by :py:func:`compile_parser`.  Call it like the
+    :py:class:`insights.parsr.Parser` it was compiled from.
+    """
+
+    def __init__(self, parser, match):
+        self.parser = parser
+        self.match = match
+
+    def __call__(self, data, src=None, Ctx=Context):
+        if not isinstance(data, str):
+            data = "".join(data)
+        try:
+            return self.match(0, data, Ctx(data, src=src))[1]
+        except Exception:
+            pass
+        # the grammar itself reports why the input doesn't match
+        return self.parser(data, src=src, Ctx=Ctx)
+
+
+def compile_parser(parser):
+    """
+    Returns a :py:class:`CompiledParser` that matches what `parser` matches
+    with a closure for each of the parsers in its grammar.  Parsers with
+    ``debug`` enabled or of types the compiler doesn't know are evaluated
+    like they always are.
+    """
+    compiled = {}
+
+    def compile_(node):
+        match = compiled.get(node)
+        if match is None:
+            # recursive grammars reach the node again while it's compiled
+            cell = []
+            compiled[node] = lambda pos, data, ctx: cell[0](pos, data, ctx)
+            compiler = _COMPILERS.get(type(node)) if not node._debug else None
+            match = (compiler or _interpreted)(node, compile_)
+            cell.append(match)
+            compiled[node] = match
+        return match
+
+    return CompiledParser(parser, compile_(parser))
+
+
+class Grammar(object):
+    """
+    A grammar built by the function `build` and compiled the first time it's
+    called, then shared by everything in the process that calls it.  The
+    time taken to build and compile it, and the number of calls and the time
+    they took, are kept for :py:func:`stats`.
+
+    Call it with the input and an optional `src` like a parser.  Functions
+    mapped over the results can't know the `src` of a call, since they're
+    shared by every caller.
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self.compile_time = 0.0
+        self.parses = 0
+        self.parse_time = 0.0
+        self._parser = None
+        self._lock = threading.Lock()
+        GRAMMARS[name] = self
+
+    @property
+    def parser(self):
+        """The compiled parser."""
+        if self._parser is None:
+            with self._lock:
+                if self._parser is None:
+                    start = time.time()
+                    parser = compile_parser(self.build())
+                    self.compile_time = time.time() - start
+                    log.debug("Compiled the %s grammar in %.2f ms", self.name, self.compile_time * 1000)
+                    self._parser = parser
+        return self._parser
+
+    def __call__(self, data, src=None):
+        parser = self.parser
+        start = time.time()
+        try:
+            return parser(data, src=src)
+        finally:
+            self.parses += 1
+            self.parse_time += time.time() - start
+
+
+def stats():
+    """
+    Returns a dictionary of the name of each :py:class:`Grammar` to the
+    seconds taken to compile it, the number of times it was called, and the
+    seconds taken by those calls.
+    """
+    return dict(
+        (name, {"compile": g.compile_time, "parses": g.parses, "parse": g.parse_time})
+        for name, g in GRAMMARS.items()
+    )
@@ -22,7 +22,8 @@ from insights.parsr import (
     WS,
     WSChar,
 )
-from insights.parsr.query import Directive, Entry, eq, Section
+from insights.parsr.grammar import Grammar
+from insights.parsr.query import Directive, Entry, eq, Section, set_src
 
 
 class Error(Exception):
@@ -57,30 +58,33 @@ class NoSectionError(Error):
         self.args = section
 
 
-def parse_doc(content, ctx, return_defaults=False, return_booleans=True):
-    def to_directive(x):
-        name, rest = x
-        rest = [rest] if rest is not None else []
-        return Directive(name=name.value.strip(), attrs=rest, lineno=name.lineno, src=ctx)
-
-    def to_section(name, rest):
-        return Section(name=name.value.strip(), children=rest, lineno=name.lineno, src=ctx)
-
-    def apply_defaults(cfg, include_defaults):
-        if "DEFAULT" not in cfg:
-            return cfg
-
-        defaults = cfg["DEFAULT"]
-        not_defaults = cfg[~eq("DEFAULT")]
-        for c in not_defaults:
-            for d in defaults.grandchildren:
-                if d.name not in c:
-                    c.children.append(d)
-
-        if not include_defaults:
-            cfg.children = list(not_defaults)
+def _to_directive(x):
+    name, rest = x
+    rest = [rest] if rest is not None else []
+    return Directive(name=name.value.strip(), attrs=rest, lineno=name.lineno)
+
+
+def _to_section(name, rest):
+    return Section(name=name.value.strip(), children=rest, lineno=name.lineno)
+
+
+def _apply_defaults(cfg, include_defaults):
+    if "DEFAULT" not in cfg:
         return cfg
 
+    defaults = cfg["DEFAULT"]
+    not_defaults = cfg[~eq("DEFAULT")]
+    for c in not_defaults:
+        for d in defaults.grandchildren:
+            if d.name not in c:
+                c.children.append(d)
+
+    if not include_defaults:
+        cfg.children = list(not_defaults)
+    return cfg
+
+
+def _grammar(return_booleans):
     header_chars = (set(string.printable) - set(string.whitespace) - set("[]")) | set(" ")
     sep_chars = set("=:")
     key_chars = header_chars - sep_chars
@@ -117,14 +121,23 @@ def parse_doc(content, ctx, return_defaults=False, return_booleans=True):
 
     KVPair = WithIndent(Key + Opt(Sep >> Value)) % "KVPair"
 
-    Line = Comment | KVPair.map(to_directive)
-    Sect = Lift(to_section) * Header * Many(Line).map(skip_none)
+    Line = Comment | KVPair.map(_to_directive)
+    Sect = Lift(_to_section) * Header * Many(Line).map(skip_none)
     Doc = Many(Comment | Sect).map(skip_none)
-    Top = Doc << WS << EOF
+    return Doc << WS << EOF
+
 
+_GRAMMARS = {
+    True: Grammar("iniparser", lambda: _grammar(True)),
+    False: Grammar("iniparser without booleans", lambda: _grammar(False)),
+}
+
+
+def parse_doc(content, ctx, return_defaults=False, return_booleans=True):
     # Encode and replace unicode characters,
     # then decode again before processing content.
     content = content.encode('ascii', 'replace').decode()
 
-    res = Entry(children=Top(content), src=ctx)
-    return apply_defaults(res, return_defaults)
+    children = set_src(_GRAMMARS[bool(return_booleans)](content), ctx)
+    res = Entry(children=children, src=ctx)
+    return _apply_defaults(res, return_defaults)
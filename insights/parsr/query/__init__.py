@@ -968,6 +968,19 @@ def from_dict(orig, src=None):
     return Entry(children=inner(orig), src=src)
 
 
+def set_src(entries, src):
+    """
+    set_src sets the ``src`` of the entries and all of their descendants. It's
+    for trees built by a grammar that's shared by many parsers.
+    """
+    stack = list(entries)
+    while stack:
+        e = stack.pop()
+        e.src = src
+        stack.extend(e.children)
+    return entries
+
+
 def pretty_format(root, indent=4):
     """
     pretty_format generates a text representation of a model as a list of
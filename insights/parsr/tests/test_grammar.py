@@ -0,0 +1,76 @@
+import pytest
+
+from insights.parsr import (Backtrack, Char, EndTagName, EOF, Forward, Letters, Lift, Many, Number,
+                            PosMarker, StartTagName, String, WS, WithIndent, HangingString)
+from insights.parsr.grammar import GRAMMARS, Grammar, compile_parser, stats
+from insights.parsr.query import Entry, set_src
+
+
+def error(p, data):
+    with pytest.raises(Exception) as ex:
+        p(data)
+    return str(ex.value)
+
+
+def test_compile():
+    expr = Forward()
+    term = WS >> (Number | (Char("(") >> expr << Char(")"))) << WS
+    expr <= Lift(lambda a, b: [a] + b) * term * Many(Char("+") >> term)
+    top = expr << EOF
+    compiled = compile_parser(top)
+    for data in ["1", " 1 + (2 + 3) ", "(((4)))+5"]:
+        assert compiled(data) == top(data)
+    for data in ["", "1 +", "(1", "1 2"]:
+        assert error(compiled, data) == error(top, data)
+
+
+def test_compile_context():
+    tag = Char("<") >> StartTagName(Letters) << Char(">")
+    end = Char("<") >> Char("/") >> EndTagName(Letters, ignore_case=True) << Char(">")
+    elem = Many(WS >> PosMarker(tag) + end) << EOF
+    compiled = compile_parser(elem)
+    marks = compiled("<a></A>\n<b></b>")
+    assert [(m.lineno, m.col, m.value) for m, _ in marks] == [(1, 1, "a"), (2, 1, "b")]
+    assert error(compiled, "<a></b>") == error(elem, "<a></b>")
+
+    kv = WithIndent(Letters + (WS >> HangingString(set("abc "))))
+    assert compile_parser(kv)("a ab\n  c\nb") == kv("a ab\n  c\nb") == ["a", "ab c"]
+
+
+def test_compile_function_error():
+    def check(x):
+        if x == "b":
+            raise Backtrack("not b")
+        if x == "c":
+            raise Exception("boom")
+        return x
+
+    p = Many(String("abc", min_length=1).map(check) | Char(" ")) << EOF
+    compiled = compile_parser(p)
+    assert compiled("a a") == ["a", " ", "a"]
+    assert error(compiled, "a b") == error(p, "a b")
+    assert "boom" in error(compiled, "a c")
+
+
+def test_grammar():
+    built = []
+
+    def build():
+        built.append(1)
+        return Many(WS >> Letters << WS) << EOF
+
+    g = Grammar("test letters", build)
+    assert GRAMMARS["test letters"] is g
+    assert g("ab cd") == ["ab", "cd"]
+    assert g(["ab\n", "ef"]) == ["ab", "ef"]
+    assert built == [1]
+    s = stats()["test letters"]
+    assert s["parses"] == 2
+    assert s["compile"] > 0 and s["parse"] > 0
+
+
+def test_set_src():
+    child = Entry(name="b")
+    top = [Entry(name="a", children=[child])]
+    assert set_src(top, "src") is top
+    assert top[0].src == child.src == "src"
@@ -1,3 +1,5 @@
+import pytest
+
 from insights.parsr import Literal
 
 
@@ -19,3 +21,10 @@ def test_literal_ignore_case():
 def test_literal_value_ignore_case():
     p = Literal("true", value=True, ignore_case=True)
     assert p("TRUE") is True
+
+
+def test_literal_ignore_case_end():
+    p = Literal("true", ignore_case=True)
+    with pytest.raises(Exception) as ex:
+        p("")
+    assert "Expected case insensitive 'true'. Got 'EOF'." in str(ex.value)
@@ -0,0 +1,30 @@
+from insights.parsr import Char, Many, Map, WS, EndTagName, Letters, StartTagName
+
+CALLS = []
+
+
+def count(x):
+    CALLS.append(x)
+    return x
+
+
+def test_memoize():
+    key = Map(WS >> Letters << WS, count)
+    p = (key + Char("=")) | (key + Char(":")) | key
+    del CALLS[:]
+    assert p(" ab :") == ["ab", ":"]
+    assert CALLS == ["ab", "ab"]
+    del CALLS[:]
+    assert p(" ab :", memoize=True) == ["ab", ":"]
+    assert CALLS == ["ab"]
+    assert key in p._memoized_parsers()
+
+
+def test_memoize_stateful():
+    tag = Char("<") >> StartTagName(Letters) << Char(">")
+    end = Char("<") >> Char("/") >> EndTagName(Letters) << Char(">")
+    elem = Many(tag + end)
+    memoized = elem._memoized_parsers()
+    assert tag not in memoized
+    assert elem not in memoized
+    assert elem("<a></a><b></b>", memoize=True) == elem("<a></a><b></b>")
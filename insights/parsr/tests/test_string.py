@@ -22,3 +22,10 @@ def test_escaped_string():
     "%h %l %u %t \"%r\" %>s %b \"%{Referer}i\" \"%{User-Agent}i\""
     """.strip()
     assert DoubleQuotedString(data)
+
+
+def test_string_escapes():
+    p = String("ab\\", echars="ab\\ ")
+    assert p(r"a\ b") == "a b"
+    assert p(r"a\\b") == "a\\b"
+    assert String("ab", echars=" ")(r"a\ \b") == "a "
@@ -1,4 +1,6 @@
-from insights.parsr import Char, Until
+import pytest
+
+from insights.parsr import EOL, AnyChar, Char, InSet, Literal, Until
 
 
 def test_until():
@@ -7,3 +9,12 @@ def test_until():
     u = Until(a, b)
     res = u("aaaab")
     assert len(res) == 4
+
+
+def test_until_any_char():
+    u = AnyChar.until(InSet("\n")) + EOL
+    assert u("ab\n") == [["a", "b"], "\n"]
+    assert AnyChar.until(Literal("*/"))("a*b*/") == ["a", "*", "b"]
+    with pytest.raises(Exception) as ex:
+        u("ab")
+    assert "Expected any character. Got 'EOF'." in str(ex.value)
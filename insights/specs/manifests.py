@@ -44,6 +44,8 @@ client:
     - name: insights.specs.Specs
       enabled: true
 
+  # With the "parallel" strategy, "limits" can bound how many components of a
+  # type run at the same time, e.g. {insights.core.plugins.datasource: 8}.
   run_strategy:
     name: serial
     args:
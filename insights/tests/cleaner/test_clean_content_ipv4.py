@@ -1,8 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 from pytest import mark
 
 from insights.client.config import InsightsConfig
 from insights.cleaner import Cleaner
+from insights.cleaner.ip import IPv4
 
 
 @mark.parametrize(
@@ -167,3 +169,57 @@ def test_obfuscate_ipv4_false_positive(_ip2db, obfuscate, obfuscation_list, orig
     # "no_obfuscate=['ipv4']
     actual = pp.clean_content(original, no_obfuscate=['ipv4'])
     assert actual == original
+
+
+def test_obfuscate_ipv4_parallel_order_independent():
+    ips = ["192.168.%d.%d" % (i // 250, i % 250 + 1) for i in range(2000)]
+    lines = ["addr %s peer %s" % (ips[i], ips[-i - 1]) for i in range(len(ips))]
+    c = InsightsConfig(obfuscate=True)
+    pp = Cleaner(c, {}, parallel=True)
+    key = b"0123456789abcdef"
+    pp.obfuscate['ipv4'] = IPv4(key)
+
+    with ThreadPoolExecutor(8) as pool:
+        result = list(pool.map(pp.clean_content, lines))
+
+    # the same keyed derivation gives the same IPs in the reversed order
+    ipv4 = IPv4(key)
+    for i in range(len(lines) - 1, -1, -1):
+        assert ipv4.parse_line(lines[i]) == result[i]
+    assert ipv4.mapping() == pp.obfuscate['ipv4'].mapping()
+
+    mapping = pp.obfuscate['ipv4'].mapping()
+    assert len(mapping) == len(ips)
+    obfuscated = [m['obfuscated'] for m in mapping]
+    assert len(set(obfuscated)) == len(ips)
+    assert all(240 <= int(ip.split(".")[0]) < 256 for ip in obfuscated)
+    assert obfuscated == sorted(obfuscated, key=IPv4()._ip2int)
+
+
+def test_obfuscate_ipv4_parallel_key_per_cleaner():
+    c = InsightsConfig(obfuscate=True)
+    line = "inet 10.0.2.15 netmask 255.255.255.0"
+    assert Cleaner(c, {}).clean_content(line) == "inet 10.230.230.2 netmask 10.230.230.1"
+    # a different secret key per Cleaner
+    assert Cleaner(c, {}, parallel=True).clean_content(line) != Cleaner(
+        c, {}, parallel=True
+    ).clean_content(line)
+
+
+def test_obfuscate_ipv4_not_replaced_again():
+    # the real 10.230.230.1 isn't replaced inside the obfuscated 192.168.100.100
+    line = "192.168.100.100 10.230.230.1"
+    assert IPv4().parse_line(line) == "10.230.230.1 10.230.230.2"
+    assert IPv4().parse_line(line + "    x", width=True) == "10.230.230.1    10.230.230.2    x"
+
+
+def test_obfuscate_ipv4_derive_taken():
+    key = b"0123456789abcdef"
+    ip_num = IPv4()._ip2int("192.168.0.1")
+    first = IPv4(key)._derive_ip(ip_num)
+    # the IP derived when it's taken only depends on the IP
+    taken = IPv4(key)
+    taken._ip_db[first] = 0
+    other = IPv4(key)
+    other._ip_index[first] = 0
+    assert taken._derive_ip(ip_num) == other._derive_ip(ip_num) != first
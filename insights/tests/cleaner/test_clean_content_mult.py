@@ -27,3 +27,32 @@ def test_clean_content_keyword_with_hostname_and_ip():
     assert 'day' not in result
     assert 'keyword0' in result
     assert 'keyword1' in result
+
+
+def test_clean_content_pipeline_reused():
+    hostname = 'test1.abc.com'
+    lines = ["test1 10.0.0.1 password=abc", "nothing", "aa:bb:cc:dd:ee:01 10.0.0.2 10.0.0.1"]
+    conf = InsightsConfig(obfuscate=True, obfuscate_hostname=True, hostname=hostname)
+    pp = Cleaner(conf, {'patterns': ['nothing']}, hostname)
+    result = pp.clean_content(lines)
+    assert result == [
+        "%s 10.230.230.2 password=********" % pp.obfuscate['hostname']._hn2db('test1'),
+        "aa:bb:cc:dd:ee:01 10.230.230.1 10.230.230.2",
+    ]
+    assert len(pp._pipelines) == 1
+
+    # same configuration, same pipeline and the same obfuscation database
+    assert pp.clean_content("10.0.0.2 10.0.0.3") == "10.230.230.1 10.230.230.3"
+    assert len(pp._pipelines) == 1
+
+    assert pp.clean_content(lines, no_obfuscate=['ipv4'], no_redact=True) == [
+        "%s 10.0.0.1 password=********" % pp.obfuscate['hostname']._hn2db('test1'),
+        "nothing",
+        "aa:bb:cc:dd:ee:01 10.0.0.2 10.0.0.1",
+    ]
+    assert len(pp._pipelines) == 2
+    assert pp.obfuscate['ipv4'].mapping() == [
+        {'original': '10.0.0.2', 'obfuscated': '10.230.230.1'},
+        {'original': '10.0.0.1', 'obfuscated': '10.230.230.2'},
+        {'original': '10.0.0.3', 'obfuscated': '10.230.230.3'},
+    ]
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import os
+import stat
 
+from pytest import mark
 from unittest.mock import patch
 
 from insights.client.archive import InsightsArchive
@@ -57,7 +59,7 @@ def test_clean_file_obfuscate_disabled_by_no_obfuscate():
     arch.delete_archive_dir()
 
 
-@patch("insights.cleaner.Cleaner.clean_content")
+@patch("insights.cleaner.Cleaner._get_line_cleaner", return_value=(None, None))
 def test_clean_file_non_exist(func):
     conf = InsightsConfig(obfuscate=True)
     arch = InsightsArchive(conf)
@@ -77,3 +79,45 @@ def test_clean_file_non_exist(func):
     func.assert_called_once()
 
     arch.delete_archive_dir()
+
+
+@mark.parametrize("buffer_size", [64, 4194304])
+@mark.parametrize("allowlist", [None, {"10.0": 5, "keep": 3}])
+def test_clean_file_same_as_clean_content(buffer_size, allowlist, tmpdir):
+    conf = InsightsConfig(obfuscate=True)
+    lines = ["line %d 10.0.%d.%d keep\n" % (i, i // 200, i % 200) for i in range(1000)]
+    lines += ["no ip", "\n", "last 10.1.1.1"]
+    test_file = str(tmpdir.join("messages"))
+    with open(test_file, 'w') as t:
+        t.write("".join(lines))
+    os.chmod(test_file, 0o640)
+
+    expected = Cleaner(conf, {}).clean_content(list(lines), allowlist=allowlist)
+    with patch("insights.cleaner.BUFFER_SIZE", buffer_size):
+        Cleaner(conf, {}).clean_file(test_file, allowlist=allowlist)
+
+    with open(test_file, 'r') as t:
+        assert t.read() == "".join(expected)
+    assert stat.S_IMODE(os.stat(test_file).st_mode) == 0o640
+    assert os.listdir(str(tmpdir)) == ["messages"]
+
+
+def test_clean_file_line_breaks(tmpdir):
+    conf = InsightsConfig(obfuscate=True)
+    test_file = str(tmpdir.join("x.conf"))
+    with open(test_file, 'wb') as t:
+        t.write(u"ip 10.0.0.1\r\nnamé\rpassword=abc".encode('utf-8'))
+
+    Cleaner(conf, {}).clean_file(test_file)
+    with open(test_file, 'rb') as t:
+        assert t.read() == u"ip 10.230.230.1\nnamé\npassword=********".encode('utf-8')
+
+
+def test_clean_file_removed_when_empty(tmpdir):
+    conf = InsightsConfig(obfuscate=False)
+    test_file = str(tmpdir.join("x.conf"))
+    with open(test_file, 'w') as t:
+        t.write("abc\ndef\n")
+
+    Cleaner(conf, {}).clean_file(test_file, allowlist={"xyz": 1})
+    assert not os.path.exists(test_file)
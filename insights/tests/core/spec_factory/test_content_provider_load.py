@@ -82,3 +82,27 @@ def test_load(log, reset_filters, sample_file, spec, filters, expected_first_lin
     assert broker[spec].content[0] == expected_first_line
     assert len(broker[spec].content) == expected_lines
     log.debug.assert_called_with("Extra-huge file is truncated %s", SAMPLE_FILE)
+
+
+@patch('insights.core.spec_factory.MAX_CONTENT_SIZE', 1024)
+@patch('insights.core.spec_factory.log')
+@pytest.mark.parametrize(
+    "spec, filters",
+    [
+        (Stuff.large_file, []),
+        (Stuff.large_file_wf, ["9Some"]),
+    ],
+)
+def test_stream(log, reset_filters, sample_file, spec, filters):
+    root, relpath = sample_file
+
+    for filter_kw in filters:
+        add_filter(spec, filter_kw)
+
+    _, broker = initialize_broker(root, broker=dr.Broker())
+    broker = dr.run(dr.get_dependency_graph(dostuff), broker=broker)
+    assert spec in broker
+    provider = broker[spec]
+    streamed = list(provider.stream())
+    assert not provider.loaded
+    assert streamed == provider.content
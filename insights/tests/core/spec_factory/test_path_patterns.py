@@ -0,0 +1,51 @@
+from insights.core.context import HostArchiveContext, HostContext
+from insights.core.plugins import datasource
+from insights.core.spec_factory import (
+    first_file,
+    foreach_collect,
+    get_path_patterns,
+    glob_file,
+    listdir,
+    listglob,
+    simple_file,
+)
+
+hosts = simple_file("/etc/hosts", context=HostArchiveContext)
+repos = glob_file(["/etc/yum.repos.d/*.repo", "etc/*.conf"], context=HostArchiveContext)
+release = first_file(["/etc/redhat-release", "/etc/os-release"], context=HostArchiveContext)
+etc = listdir("/etc", context=HostArchiveContext)
+logs = listglob("/var/log/*.log", context=HostArchiveContext)
+jboss = simple_file("$JBOSS_HOME/bin/standalone.conf", context=HostArchiveContext)
+host_only = simple_file("/etc/host_only", context=HostContext)
+
+
+@datasource(HostArchiveContext)
+def pids(broker):
+    return ["1"]
+
+
+cmdlines = foreach_collect(pids, "/proc/%s/cmdline", context=HostArchiveContext)
+
+
+@datasource(HostContext)
+def host_ds(broker):
+    pass
+
+
+def test_path_patterns():
+    assert get_path_patterns([hosts, repos, release, etc, logs, jboss, host_only, host_ds]) == [
+        "*/bin/standalone.conf",
+        "etc/*",
+        "etc/*.conf",
+        "etc/hosts",
+        "etc/os-release",
+        "etc/redhat-release",
+        "etc/yum.repos.d/*.repo",
+        "var/log/*.log",
+    ]
+
+
+def test_path_patterns_any_path():
+    assert get_path_patterns([cmdlines]) == ["proc/*/cmdline"]
+    # it can read anything from the archive
+    assert get_path_patterns([hosts, pids]) is None
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import os
+from collections import defaultdict
+
+import pytest
+from unittest.mock import patch
+
+from insights.core import filters
+from insights.core.context import HostContext
+from insights.core.filters import add_filter
+from insights.core.spec_factory import (
+    SAFE_ENV,
+    CommandOutputProvider,
+    RegistryPoint,
+    SpecSet,
+    TextFileProvider,
+)
+from insights.util.subproc import call
+
+SAMPLE_FILE = "sample_file.log"
+SAMPLE_CONTENT = (
+    u"Jan 1 kernel: eth0 up\n"
+    u"Jan 1 sshd[1]: -q accepted\r\n"
+    u"Jan 1 kernel: eth1 d\xe9j\xe0 up\x0c\n"
+    u"Jan 1 sshd[2]: closed\n"
+    u"Jan 1 kernel: eth2 down"
+)
+
+
+class Specs(SpecSet):
+    prefiltered = RegistryPoint(filterable=True)
+
+
+@pytest.fixture()
+def reset_filters():
+    original_cache = filters._CACHE
+    original_filters = filters.FILTERS
+    filters._CACHE = {}
+    filters.FILTERS = defaultdict(dict)
+    yield
+    filters._CACHE = original_cache
+    filters.FILTERS = original_filters
+
+
+@pytest.fixture()
+def sample_file(tmpdir):
+    root = str(tmpdir)
+    with open(os.path.join(root, SAMPLE_FILE), "wb") as fd:
+        fd.write(SAMPLE_CONTENT.encode("utf-8") + b"\xff -q\n")
+    return root
+
+
+def grep(root, patterns):
+    path = os.path.join(root, SAMPLE_FILE)
+    rc, out = call([["grep", "-F", "--", "\n".join(patterns), path]], keep_rc=True, env=SAFE_ENV)
+    return out.splitlines()
+
+
+@pytest.mark.parametrize("patterns", [["kernel"], ["-q", "eth1"], ["up", "sshd", "eth2 down"]])
+@pytest.mark.parametrize("threshold", [1, 10000])
+def test_text_file_prefilter(reset_filters, sample_file, patterns, threshold, monkeypatch):
+    monkeypatch.setattr(filters, "AUTOMATON_THRESHOLD", threshold)
+    add_filter(Specs.prefiltered, patterns)
+
+    provider = TextFileProvider(SAMPLE_FILE, root=sample_file, ds=Specs.prefiltered, ctx=HostContext())
+    assert provider.create_args() == []
+    with patch.object(HostContext, "shell_out") as shell_out:
+        content = provider.content
+    assert not shell_out.called
+    assert content == grep(sample_file, patterns)
+
+
+def test_text_file_prefilter_grep(reset_filters, sample_file):
+    add_filter(Specs.prefiltered, ["kernel", "-q"])
+    size = os.path.getsize(os.path.join(sample_file, SAMPLE_FILE))
+
+    # size * 2 filters is larger than it
+    with patch("insights.core.spec_factory.GREP_PREFILTER_SIZE", size):
+        provider = TextFileProvider(SAMPLE_FILE, root=sample_file, ds=Specs.prefiltered, ctx=HostContext())
+        assert provider.create_args()[0][:3] == ["grep", "-F", "--"]
+        assert provider.content == grep(sample_file, ["kernel", "-q"])
+
+    with patch("insights.core.spec_factory.GREP_PREFILTER_SIZE", size * 2):
+        provider = TextFileProvider(SAMPLE_FILE, root=sample_file, ds=Specs.prefiltered, ctx=HostContext())
+        assert provider.create_args() == []
+
+
+def test_text_file_prefilter_stream(reset_filters, sample_file):
+    add_filter(Specs.prefiltered, "sshd")
+    provider = TextFileProvider(SAMPLE_FILE, root=sample_file, ds=Specs.prefiltered, ctx=HostContext())
+    assert list(provider.stream()) == ["Jan 1 sshd[1]: -q accepted", "Jan 1 sshd[2]: closed"]
+
+
+def test_command_prefilter(reset_filters, sample_file):
+    add_filter(Specs.prefiltered, ["kernel", "-q"])
+    cmd = "/bin/cat %s" % os.path.join(sample_file, SAMPLE_FILE)
+    provider = CommandOutputProvider(cmd, HostContext(), ds=Specs.prefiltered)
+    assert provider.create_args() == [["/bin/cat", os.path.join(sample_file, SAMPLE_FILE)]]
+    assert provider.content == grep(sample_file, ["kernel", "-q"])
+    assert provider.rc == 0
+
+
+def test_command_prefilter_stream(reset_filters, tmpdir):
+    add_filter(Specs.prefiltered, ["kernel", "-q"])
+    path = os.path.join(str(tmpdir), SAMPLE_FILE)
+    with open(path, "wb") as fd:
+        fd.write(SAMPLE_CONTENT.encode("utf-8"))
+    provider = CommandOutputProvider("/bin/cat %s" % path, HostContext(), ds=Specs.prefiltered)
+    assert list(provider.stream()) == [
+        "Jan 1 kernel: eth0 up",
+        "Jan 1 sshd[1]: -q accepted",
+        u"Jan 1 kernel: eth1 d\xe9j\xe0 up\x0c",
+        "Jan 1 kernel: eth2 down",
+    ]
@@ -1,9 +1,16 @@
+import os
+
+import pytest
+
 from insights.core.context import (
+    ExecutionContext,
     ExecutionContextMeta,
     HostArchiveContext,
+    JDRContext,
     SerializedArchiveContext,
     SosArchiveContext,
 )
+from insights.core.path_index import DirectoryIndex
 
 
 def test_host_archive_context():
@@ -74,3 +81,55 @@ def test_unrecognized():
     files = ["/foo/junk", "/bar/junk"]
     actual = ExecutionContextMeta.identify(files)
     assert actual == (None, None), actual
+
+
+@pytest.mark.parametrize(
+    "files",
+    [
+        ["foo/junk", "insights_commands"],
+        ["foo/junk", "insights_commands/things"],
+        ["foo/junk/insights_commands/foobar.txt", "bar/insights_commands/things"],
+        ["foo/junk", "not_insights_commands/things", "insights_commands_not"],
+        ["a/insights_commands_old/b/insights_commands/c"],
+        ["a/insights_commands/b/insights_commands/c"],
+        ["a/insights_archive.txt", "a/insights_commands/hostname"],
+        ["a/sos_commands/uname", "a/JBOSS_HOME/standalone/log", "a/insights_commands/x"],
+        ["foo/junk", "bar/junk"],
+    ],
+)
+def test_identify_with_index(tmpdir, files):
+    for f in files:
+        path = tmpdir.join(f)
+        path.dirpath().ensure(dir=True)
+        path.write("")
+    tmpdir.ensure("empty", "sos_commands", dir=True)
+
+    index = DirectoryIndex(tmpdir.strpath)
+    all_files = index.all_files()
+    assert ExecutionContextMeta.identify(all_files, index) == ExecutionContextMeta.identify(all_files)
+    for context in (HostArchiveContext, SosArchiveContext, SerializedArchiveContext, JDRContext):
+        roots = ExecutionContextMeta.find_markers(index, [context])
+        assert context.handles_markers(all_files, roots) == context.handles(all_files)
+
+
+def test_identify_with_index_overridden_handles(tmpdir):
+    tmpdir.ensure("a", "insights_commands", "hostname")
+    tmpdir.ensure("b", "custom.txt")
+
+    class CustomContext(ExecutionContext):
+        marker = "insights_commands"
+
+        @classmethod
+        def handles(cls, files):
+            roots = set(os.path.dirname(f) for f in files if f.endswith("custom.txt"))
+            return (roots.pop(), cls) if roots else (None, None)
+
+    try:
+        index = DirectoryIndex(tmpdir.strpath)
+        assert "insights_commands" not in ExecutionContextMeta.find_markers(index, [CustomContext])
+        assert ExecutionContextMeta.identify(index.all_files(), index) == (
+            tmpdir.join("b").strpath,
+            CustomContext,
+        )
+    finally:
+        ExecutionContextMeta.registry.remove(CustomContext)
@@ -86,3 +86,15 @@ def test_get_registry_points_multiple_specs():
     for spec in [Specs.ps_aux, Specs.ps_auxww, Specs.ps_auxcww, Specs.ps_ef,
                  Specs.ps_auxcww, Specs.ps_eo_cmd]:
         assert spec in specs
+
+
+def test_get_component_by_name():
+    assert dr.get_component_by_name(dr.get_name(simple_spec_imp)) is simple_spec_imp
+    assert dr.get_component_by_name("insights.tests.core.test_dr.missing") is None
+
+    @datasource()
+    def late(broker):
+        pass
+
+    # the names are mapped again for components loaded later
+    assert dr.get_component_by_name(dr.get_name(late)) is late
@@ -0,0 +1,124 @@
+from collections import defaultdict
+
+from insights.core import dr
+
+
+class needs(dr.ComponentType):
+    pass
+
+
+@needs()
+def plan_one():
+    return 1
+
+
+@needs()
+def plan_two():
+    return 2
+
+
+@needs(plan_one, plan_two)
+def plan_add(a, b):
+    return a + b
+
+
+@needs(plan_add)
+def plan_boom(a):
+    raise Exception("boom")
+
+
+def teardown_function(*args):
+    for k in list(dr.ENABLED):
+        dr.ENABLED[k] = True
+
+
+def test_plan_order():
+    plan = dr.ExecutionPlan(dr.get_dependency_graph(plan_add))
+    assert len(plan) == 3
+    assert plan.order[-1] is plan_add
+    deps = set(plan.order[i] for i in plan.dependencies[plan.index[plan_add]])
+    assert deps == set([plan_one, plan_two])
+    assert plan.dependents[plan.index[plan_one]] == (plan.index[plan_add],)
+    assert all(d is not None for d in plan.delegates)
+
+
+def test_plan_reused_across_brokers():
+    plan = dr.get_execution_plan(plan_add)
+    assert dr.get_execution_plan(plan_add) is plan
+
+    first = plan.run()
+    second = plan.run(dr.Broker())
+    assert first is not second
+    assert first[plan_add] == second[plan_add] == 3
+
+
+def test_plan_exceptions():
+    broker = dr.get_execution_plan(plan_boom).run()
+    assert plan_add in broker
+    assert plan_boom not in broker
+    assert plan_boom in broker.exceptions
+    assert plan_boom in broker.exec_times
+
+
+def test_plan_invalidated_by_set_enabled():
+    plan = dr.get_execution_plan(plan_add)
+    dr.set_enabled(plan_two, False)
+    new_plan = dr.get_execution_plan(plan_add)
+    assert new_plan is not plan
+    assert new_plan.delegates[new_plan.index[plan_two]] is None
+
+    broker = dr.run(plan_add)
+    assert plan_one in broker
+    assert plan_two not in broker
+    assert plan_add not in broker
+
+    dr.set_enabled(plan_two)
+    assert dr.run(plan_add)[plan_add] == 3
+
+
+def test_plan_invalidated_by_registration():
+    plan = dr.get_execution_plan(needs)
+    assert dr.get_execution_plan(needs) is plan
+
+    @needs(plan_one)
+    def late(a):
+        return a + 10
+
+    new_plan = dr.get_execution_plan(needs)
+    assert new_plan is not plan
+    assert late in new_plan.index
+    assert dr.run(needs)[late] == 11
+
+
+def test_plan_untracked_enabled_map():
+    orig = dr.ENABLED
+    try:
+        dr.ENABLED = defaultdict(lambda: True)
+        plan = dr.get_execution_plan(plan_add)
+        dr.ENABLED[plan_one] = False
+        assert dr.get_execution_plan(plan_add) is not plan
+        assert plan_add not in dr.run(plan_add)
+    finally:
+        dr.ENABLED = orig
+
+
+def test_enabled_map_lookup_does_not_invalidate():
+    enabled = dr.EnabledMap(False)
+    version = enabled.version
+    assert not enabled[plan_one]
+    assert enabled.version == version
+    enabled[plan_one] = True
+    assert enabled.version != version
+
+
+def test_plan_replaced_group():
+    orig = dr.COMPONENTS
+    plan = dr.get_execution_plan(dr.COMPONENTS[dr.GROUPS.single])
+    try:
+        dr.COMPONENTS = defaultdict(lambda: defaultdict(set))
+        dr.COMPONENTS[dr.GROUPS.single].update(dr.get_dependency_graph(plan_add))
+        new_plan = dr.get_execution_plan(dr.COMPONENTS[dr.GROUPS.single])
+        assert new_plan is not plan
+        assert len(new_plan) == 3
+    finally:
+        dr.COMPONENTS = orig
@@ -0,0 +1,78 @@
+from insights.core import dr
+
+CALLS = []
+
+
+class lazy_type(dr.ComponentType):
+    pass
+
+
+@lazy_type("seed")
+def base(seed):
+    CALLS.append(base)
+    return seed + 1
+
+
+@lazy_type(base)
+def wanted(b):
+    CALLS.append(wanted)
+    return b * 10
+
+
+@lazy_type(base)
+def unwanted(b):
+    CALLS.append(unwanted)
+    return b
+
+
+@lazy_type(base)
+def failing(b):
+    CALLS.append(failing)
+    raise Exception("failing")
+
+
+def setup_function(*args):
+    del CALLS[:]
+
+
+def _broker():
+    broker = dr.LazyBroker()
+    broker["seed"] = 1
+    return broker
+
+
+def test_lazy_evaluates_on_access():
+    broker = _broker()
+    assert wanted not in broker
+    assert not CALLS
+
+    assert broker[wanted] == 20
+    assert CALLS == [base, wanted]
+    assert wanted in broker
+    assert unwanted not in broker
+    assert unwanted not in broker.exec_times
+
+
+def test_lazy_attempts_once():
+    broker = _broker()
+    assert broker.get(failing) is None
+    assert broker.get(failing) is None
+    assert CALLS == [base, failing]
+    assert len(broker.exceptions[failing]) == 1
+
+    assert broker[unwanted] == 2
+    assert CALLS == [base, failing, unwanted]
+
+
+def test_lazy_unknown_component():
+    broker = _broker()
+    assert broker.get("nothing") is None
+    assert broker["seed"] == 1
+    assert not CALLS
+
+
+def test_lazy_after_run():
+    broker = dr.run(wanted, broker=_broker())
+    assert CALLS == [base, wanted]
+    assert broker[unwanted] == 2
+    assert CALLS == [base, wanted, unwanted]
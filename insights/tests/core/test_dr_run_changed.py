@@ -0,0 +1,168 @@
+from insights.core import dr
+from insights.core.serde import Hydration
+from insights.core.spec_factory import DatasourceProvider, TextFileProvider
+
+CALLS = []
+
+
+class needs(dr.ComponentType):
+    pass
+
+
+class Host(object):
+    def __init__(self, **files):
+        self.files = files
+
+
+@needs(Host)
+def changed_first(host):
+    return DatasourceProvider(host.files["first"], "/first")
+
+
+@needs(Host)
+def changed_second(host):
+    return DatasourceProvider(host.files["second"], "/second")
+
+
+@needs(changed_first)
+def parse_first(first):
+    CALLS.append(parse_first)
+    return first.content[0]
+
+
+@needs(changed_second)
+def parse_second(second):
+    CALLS.append(parse_second)
+    if second.content[0] == "boom":
+        raise Exception("boom")
+    return second.content[0]
+
+
+@needs(parse_first, parse_second)
+def combined(first, second):
+    CALLS.append(combined)
+    return first + second
+
+
+@needs(parse_first)
+def report_first(first):
+    CALLS.append(report_first)
+    return {"first": first}
+
+
+COMPONENTS = [combined, report_first]
+
+
+def _run(previous=None, **files):
+    del CALLS[:]
+    broker = dr.Broker()
+    broker[Host] = Host(**files)
+    return dr.run_changed(COMPONENTS, broker=broker, previous=previous)
+
+
+def test_fingerprint():
+    assert dr.fingerprint([1, "a", b"b"]) == dr.fingerprint([1, "a", b"b"])
+    assert dr.fingerprint([1]) != dr.fingerprint((1,))
+    assert dr.fingerprint("1") != dr.fingerprint(1)
+    assert dr.fingerprint({"a": set([1, 2])}) == dr.fingerprint({"a": set([2, 1])})
+    assert dr.fingerprint(object()) is None
+    assert dr.fingerprint(Host) is None
+
+    first = DatasourceProvider("a", "/first", root="/one")
+    assert first.fingerprint() == DatasourceProvider("a", "/first", root="/two").fingerprint()
+    assert first.fingerprint() != DatasourceProvider("a", "/other").fingerprint()
+    assert first.fingerprint() != DatasourceProvider("b", "/first").fingerprint()
+    assert dr.fingerprint([first]) == dr.fingerprint([DatasourceProvider("a", "/first")])
+
+
+def test_run_changed():
+    first = _run(first="a", second="b")
+    assert first[combined] == "ab"
+    assert len(CALLS) == 4
+    assert first.fingerprints[changed_first] == dr.fingerprint(first[changed_first])
+    assert first.fingerprints[Host] is None
+
+    second = _run(first, first="a", second="b")
+    assert CALLS == []
+    assert second[combined] == "ab"
+    assert second[report_first] is first[report_first]
+    assert second.exec_times[combined] == 0.0
+
+    third = _run(second, first="a", second="c")
+    assert CALLS == [parse_second, combined]
+    assert third[combined] == "ac"
+    assert third[report_first] is first[report_first]
+
+
+def test_run_changed_exceptions():
+    first = _run(first="a", second="boom")
+    assert combined not in first
+    assert parse_second in first.exceptions
+
+    second = _run(first, first="a", second="boom")
+    assert CALLS == []
+    assert second.exceptions[parse_second] == first.exceptions[parse_second]
+    assert combined in second.missing_requirements
+
+    third = _run(second, first="b", second="boom")
+    assert CALLS == [parse_first, report_first]
+    assert third[report_first] == {"first": "b"}
+    assert len(third.exceptions[parse_second]) == 1
+
+
+def test_run_changed_hydrated(tmpdir):
+    first = _run(first="a", second="b")
+    h = Hydration(tmpdir.strpath)
+    for comp in [changed_first, changed_second]:
+        h.dehydrate(comp, first)
+
+    previous = Hydration(tmpdir.strpath).hydrate()
+    assert previous.fingerprints[changed_first] == first.fingerprints[changed_first]
+
+    second = _run(previous, first="a", second="c")
+    assert second.fingerprints[changed_first] == first.fingerprints[changed_first]
+    assert second.fingerprints[changed_second] != first.fingerprints[changed_second]
+    # nothing downstream was saved, so it's all evaluated
+    assert len(CALLS) == 4
+    assert second[combined] == "ac"
+
+
+class Root(object):
+    def __init__(self, path):
+        self.path = path
+
+
+@needs(Root)
+def log_file(root):
+    return TextFileProvider("var/log/messages", root=root.path)
+
+
+@needs(log_file)
+def count_errors(log):
+    CALLS.append(count_errors)
+    return sum("error" in l for l in log.stream())
+
+
+def _run_log(root, previous=None):
+    del CALLS[:]
+    broker = dr.Broker()
+    broker[Root] = Root(root)
+    return dr.run_changed([count_errors], broker=broker, previous=previous)
+
+
+def test_run_changed_file_not_loaded(tmpdir):
+    for name in ["one", "two"]:
+        tmpdir.join(name, "var", "log", "messages").write("ok\nerror\n", ensure=True)
+
+    first = _run_log(tmpdir.join("one").strpath)
+    assert first[count_errors] == 1
+    second = _run_log(tmpdir.join("two").strpath, first)
+    assert CALLS == []
+    assert second.fingerprints[log_file] == first.fingerprints[log_file]
+    assert not second[log_file].loaded
+
+    tmpdir.join("two", "var", "log", "messages").write("error\nerror\n")
+    third = _run_log(tmpdir.join("two").strpath, second)
+    assert CALLS == [count_errors]
+    assert third[count_errors] == 2
+    assert not third[log_file].loaded
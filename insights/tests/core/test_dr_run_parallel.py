@@ -0,0 +1,156 @@
+import pytest
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from insights.core import dr
+from insights.core.exceptions import TimeoutException
+
+
+class stage(dr.ComponentType):
+    pass
+
+
+class slow_stage(stage):
+    pass
+
+
+LOCK = threading.Lock()
+ACTIVE = [0, 0]
+
+
+def _track():
+    with LOCK:
+        ACTIVE[0] += 1
+        ACTIVE[1] = max(ACTIVE)
+    time.sleep(0.05)
+    with LOCK:
+        ACTIVE[0] -= 1
+
+
+@stage()
+def root():
+    return 1
+
+
+@slow_stage(root)
+def slow_a(r):
+    _track()
+    return r + 1
+
+
+@slow_stage(root)
+def slow_b(r):
+    _track()
+    return r + 2
+
+
+@slow_stage(root)
+def slow_c(r):
+    _track()
+    return r + 3
+
+
+@stage(slow_a, slow_b, slow_c)
+def total(a, b, c):
+    return a + b + c
+
+
+class timed_stage(stage):
+    def get_timeout(self, broker):
+        return 0.05
+
+
+@timed_stage(root)
+def hung(r):
+    time.sleep(0.5)
+    return r
+
+
+@stage(hung)
+def after_hung(h):
+    return h
+
+
+@stage(root)
+def broken(r):
+    raise Exception("broken")
+
+
+@stage(broken)
+def after_broken(b):
+    return b
+
+
+def setup_function(*args):
+    ACTIVE[0] = ACTIVE[1] = 0
+
+
+def test_run_parallel_matches_serial():
+    serial = dr.run(total)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        parallel = dr.run_parallel(total, pool=pool)
+    assert parallel[total] == serial[total] == 9
+    assert set(parallel.exec_times) == set(serial.exec_times)
+
+
+def test_run_parallel_concurrency():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        broker = dr.run_parallel(total, pool=pool)
+    assert broker[total] == 9
+    assert ACTIVE[1] == 3
+
+
+def test_run_parallel_limits():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        broker = dr.run_parallel(total, pool=pool, limits={slow_stage: 1, stage: 4})
+    assert broker[total] == 9
+    assert ACTIVE[1] == 1
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_run_parallel_limits_below_one(limit):
+    broker = dr.Broker()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        with pytest.raises(ValueError):
+            dr.run_parallel(total, broker=broker, pool=pool, limits={slow_stage: limit})
+    assert not broker.instances
+    assert ACTIVE[1] == 0
+
+
+def test_run_parallel_exceptions():
+    graph = dr.get_dependency_graph(after_broken)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        broker = dr.run_parallel(graph, pool=pool)
+    assert broken in broker.exceptions
+    assert broker.tracebacks[broker.exceptions[broken][0]]
+    assert after_broken in broker.missing_requirements
+
+
+def test_run_parallel_observers_in_calling_thread():
+    threads = set()
+    broker = dr.Broker()
+
+    @broker.observer(stage)
+    def watch(comp, broker):
+        threads.add(threading.current_thread())
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        dr.run_parallel(total, broker=broker, pool=pool)
+    assert threads == set([threading.current_thread()])
+
+
+def test_run_parallel_without_pool():
+    assert dr.run_parallel(total)[total] == 9
+
+
+def test_run_parallel_timeout():
+    graph = dr.get_dependency_graph(after_hung)
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        broker = dr.run_parallel(graph, pool=pool)
+        assert time.time() - start < 0.4
+    assert isinstance(broker.exceptions[hung][0], TimeoutException)
+    assert broker.exec_times[hung] == 0.05
+    assert after_hung in broker.missing_requirements
@@ -1,12 +1,35 @@
+import glob
+import io
 import os
 import shlex
 import subprocess
+import tarfile
 import tempfile
 import zipfile
 from contextlib import closing
 
-from insights.core.hydration import get_all_files
-from insights.core.archives import extract
+import pytest
+
+from insights.core import dr
+from insights.core.archives import (
+    MemberFilter,
+    PackIndex,
+    PackWriter,
+    TarIndex,
+    ZipIndex,
+    extract,
+    open_archive,
+)
+from insights.core.context import HostArchiveContext
+from insights.core.exceptions import InvalidContentType
+from insights.core.hydration import create_context, get_all_files
+from insights.core.spec_factory import (
+    RawFileProvider,
+    first_file,
+    glob_file,
+    listdir,
+    simple_file,
+)
 
 
 def test_with_zip():
@@ -46,3 +69,332 @@ def test_with_zip():
         os.unlink("/tmp/test.zip")
 
     subprocess.call(shlex.split("rm -rf %s" % tmp_dir))
+
+
+def _make_tree(tmpdir):
+    root = tmpdir.mkdir("src")
+    top = root.mkdir("insights-host")
+    top.mkdir("insights_commands").join("uname_-a").write("Linux host 3.10.0\n")
+    etc = top.mkdir("etc")
+    etc.join("hosts").write("127.0.0.1 localhost\n")
+    etc.join(".hidden").write("hidden\n")
+    etc.mkdir("yum.repos.d").join("a.repo").write("[a]\n")
+    etc.join("yum.repos.d", "b.repo").write("[b]\n")
+    top.mkdir("empty")
+    top.mkdir("dev").join("null").write("")
+    os.symlink("../insights_commands/uname_-a", etc.join("uname").strpath)
+    os.symlink("yum.repos.d", etc.join("repos").strpath)
+    os.symlink("/etc/passwd", etc.join("passwd").strpath)
+    return root.strpath
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:xz"])
+def test_tar_index(tmpdir, mode):
+    src = _make_tree(tmpdir)
+    path = tmpdir.join("archive.tar").strpath
+    with tarfile.open(path, mode) as tf:
+        tf.add(os.path.join(src, "insights-host"), arcname="insights-host")
+
+    with extract(path) as ex, open_archive(path) as index:
+        assert isinstance(index, TarIndex)
+        real = ex.tmp_dir
+        virt = index.root
+
+        def rel(paths, root):
+            return sorted(os.path.relpath(p, root) for p in paths)
+
+        assert rel(index.all_files(), virt) == rel(get_all_files(real), real)
+        for pattern in [
+            "insights-host/etc/*",
+            "insights-host/etc/.*",
+            "insights-host/etc/*/*.repo",
+            "insights-host/etc/repos/a.repo",
+            "insights-host/*/uname*",
+            "insights-host/missing/*",
+        ]:
+            assert rel(index.glob(os.path.join(virt, pattern)), virt) == rel(
+                glob.glob(os.path.join(real, pattern)), real
+            )
+        for name in ["", "insights-host", "insights-host/etc", "insights-host/empty"]:
+            assert sorted(index.listdir(os.path.join(virt, name))) == sorted(
+                os.listdir(os.path.join(real, name))
+            )
+        for name in [
+            "insights-host/etc/hosts",
+            "insights-host/etc/uname",
+            "insights-host/etc/repos",
+            "insights-host/empty",
+            "insights-host/missing",
+        ]:
+            virt_path, real_path = os.path.join(virt, name), os.path.join(real, name)
+            assert index.isfile(virt_path) is os.path.isfile(real_path)
+            assert index.isdir(virt_path) is os.path.isdir(real_path)
+            if index.isfile(virt_path):
+                with open(real_path, "rb") as f:
+                    assert index.read(virt_path) == f.read()
+                assert index.getsize(virt_path) == os.path.getsize(real_path)
+
+        # it points to the host, not the archive
+        assert not index.exists(os.path.join(virt, "insights-host/etc/passwd"))
+        assert index.resolve(os.path.join(virt, "insights-host/etc/uname")) == os.path.join(
+            virt, "insights-host/insights_commands/uname_-a"
+        )
+        assert index.tmp_dir is None
+
+
+def test_zip_index(tmpdir):
+    src = _make_tree(tmpdir)
+    path = tmpdir.join("archive.zip").strpath
+    with closing(zipfile.ZipFile(path, "w")) as zf:
+        for root, dirs, files in os.walk(src):
+            for name in dirs + files:
+                full = os.path.join(root, name)
+                if os.path.islink(full):
+                    info = zipfile.ZipInfo(os.path.relpath(full, src))
+                    info.external_attr = 0o120777 << 16
+                    zf.writestr(info, os.readlink(full))
+                else:
+                    zf.write(full, os.path.relpath(full, src))
+
+    with open_archive(path) as index:
+        assert isinstance(index, ZipIndex)
+        uname = os.path.join(index.root, "insights-host/etc/uname")
+        assert index.read(uname) == b"Linux host 3.10.0\n"
+        assert index.isdir(os.path.join(index.root, "insights-host/empty"))
+        assert sorted(index.glob(os.path.join(index.root, "insights-host/etc/repos/*"))) == [
+            os.path.join(index.root, "insights-host/etc/repos", n) for n in ("a.repo", "b.repo")
+        ]
+        # unzip doesn't exclude them as tar does
+        assert index.exists(os.path.join(index.root, "insights-host/dev/null"))
+
+
+def _make_pack(src, path):
+    with PackWriter(path) as pack:
+        for root, dirs, files in os.walk(src):
+            for name in dirs + files:
+                full = os.path.join(root, name)
+                rel = os.path.relpath(full, src)
+                if os.path.islink(full):
+                    pack.add_link(rel, os.readlink(full))
+                elif os.path.isdir(full):
+                    pack.add_dir(rel)
+                else:
+                    pack.add_file(rel, full)
+
+
+def test_pack_index(tmpdir):
+    src = _make_tree(tmpdir)
+    path = tmpdir.join("archive.pack").strpath
+    _make_pack(src, path)
+
+    with open_archive(path) as index:
+        assert isinstance(index, PackIndex)
+        assert sorted(index.all_files()) == sorted(
+            os.path.join(index.root, os.path.relpath(f, src)) for f in get_all_files(src)
+        )
+        uname = os.path.join(index.root, "insights-host/etc/uname")
+        assert index.read(uname) == b"Linux host 3.10.0\n"
+        assert index.getsize(uname) == 18
+        view = index.view(uname)
+        assert bytes(view) == b"Linux host 3.10.0\n"
+        view.release()
+        assert index.isdir(os.path.join(index.root, "insights-host/empty"))
+        assert not index.exists(os.path.join(index.root, "insights-host/etc/passwd"))
+        assert index._cached_bytes == 0
+
+    with extract(path) as ex:
+        assert ex.content_type == "application/x-insights-pack"
+        assert sorted(get_all_files(ex.tmp_dir)) == sorted(
+            os.path.join(ex.tmp_dir, os.path.relpath(f, src)) for f in get_all_files(src)
+            if not f.endswith("passwd")
+        )
+        with open(os.path.join(ex.tmp_dir, "insights-host/etc/repos/a.repo")) as f:
+            assert f.read() == "[a]\n"
+
+
+def test_pack_index_invalid(tmpdir):
+    path = tmpdir.join("archive.pack").strpath
+    _make_pack(_make_tree(tmpdir), path)
+    with open(path, "rb") as f:
+        content = f.read()
+    with open(path, "wb") as f:
+        f.write(content[:-1])
+    with pytest.raises(InvalidContentType):
+        PackIndex(path)
+
+
+def test_member_filter():
+    members = MemberFilter(["etc/hosts", "etc/yum.repos.d/*.repo", "/*.tar.gz", "data/**"], ["insights_commands"])
+    assert members("insights-host/etc/hosts")
+    assert members("etc/hosts")
+    assert not members("insights-host/etc/hostsx")
+    assert members("insights-host/etc/yum.repos.d/a.repo")
+    assert not members("insights-host/etc/yum.repos.d/sub/a.repo")
+    assert members("cluster.tar.gz")
+    assert not members("insights-host/cluster.tar.gz")
+    assert members("archive/data/etc/hosts")
+    # only the first member under a marker
+    assert members("insights-host/insights_commands/date")
+    assert not members("insights-host/insights_commands/uname_-a")
+    assert members("other-host/insights_commands/uname_-a")
+
+
+@pytest.mark.parametrize("kind", ["tar", "zip", "pack"])
+def test_extract_members(tmpdir, kind):
+    src = _make_tree(tmpdir)
+    if kind == "tar":
+        path = tmpdir.join("archive.tar.gz").strpath
+        with tarfile.open(path, "w:gz") as tf:
+            tf.add(os.path.join(src, "insights-host"), arcname="insights-host")
+    elif kind == "zip":
+        path = tmpdir.join("archive.zip").strpath
+        with closing(zipfile.ZipFile(path, "w")) as zf:
+            for root, dirs, files in os.walk(src):
+                for name in dirs + files:
+                    full = os.path.join(root, name)
+                    if os.path.islink(full):
+                        info = zipfile.ZipInfo(os.path.relpath(full, src))
+                        info.external_attr = 0o120777 << 16
+                        zf.writestr(info, os.readlink(full))
+                    else:
+                        zf.write(full, os.path.relpath(full, src))
+    else:
+        path = tmpdir.join("archive.pack").strpath
+        _make_pack(src, path)
+
+    members = MemberFilter(["etc/yum.repos.d/*.repo", "dev/null"], ["insights_commands"])
+    with extract(path, members=members) as ex:
+        top = os.path.join(ex.tmp_dir, "insights-host")
+        # like the tar command, */dev/* is excluded from tar archives only
+        assert sorted(os.path.relpath(f, top) for f in get_all_files(ex.tmp_dir)) == ([] if kind == "tar" else ["dev/null"]) + [
+            "etc/yum.repos.d/a.repo",
+            "etc/yum.repos.d/b.repo",
+            "insights_commands/uname_-a",
+        ]
+        assert os.path.isdir(os.path.join(top, "empty"))
+        with open(os.path.join(top, "etc/repos/a.repo")) as f:
+            assert f.read() == "[a]\n"
+
+
+def _tar_member(tf, name, content=None, sym=None, hard=None):
+    info = tarfile.TarInfo(name)
+    if sym is not None:
+        info.type, info.linkname = tarfile.SYMTYPE, sym
+    elif hard is not None:
+        info.type, info.linkname = tarfile.LNKTYPE, hard
+    elif content is None:
+        info.type = tarfile.DIRTYPE
+    else:
+        info.size = len(content)
+        tf.addfile(info, io.BytesIO(content))
+        return
+    tf.addfile(info)
+
+
+@pytest.mark.parametrize("kind", ["tar", "tar without filter", "zip", "pack"])
+def test_extract_members_outside(tmpdir, monkeypatch, kind):
+    outside = tmpdir.mkdir("outside")
+    outside.join("secret").write("secret\n")
+    members = MemberFilter(["**"], [])
+    if kind.startswith("tar"):
+        if kind == "tar without filter":
+            monkeypatch.delattr(tarfile, "tar_filter", raising=False)
+        path = tmpdir.join("archive.tar").strpath
+        with tarfile.open(path, "w") as tf:
+            _tar_member(tf, "root", None)
+            _tar_member(tf, "root/evil", sym=outside.strpath)
+            _tar_member(tf, "root/evil/pwned", b"pwned\n")
+            _tar_member(tf, "root/up", sym="../../outside")
+            _tar_member(tf, "root/self", sym=".")
+            _tar_member(tf, "root/escape", sym="self/..")
+            _tar_member(tf, "root/escape/pwned", b"pwned\n")
+            _tar_member(tf, "root/../pwned", b"pwned\n")
+            _tar_member(tf, "/pwned", b"pwned\n")
+            _tar_member(tf, "root/secret", hard=outside.join("secret").strpath)
+            _tar_member(tf, "root/file", b"ok\n")
+    elif kind == "zip":
+        path = tmpdir.join("archive.zip").strpath
+        with closing(zipfile.ZipFile(path, "w")) as zf:
+            for name, target in [("root/evil", outside.strpath), ("root/up", "../../outside")]:
+                info = zipfile.ZipInfo(name)
+                info.external_attr = 0o120777 << 16
+                zf.writestr(info, target)
+            zf.writestr("root/evil/pwned", "pwned\n")
+            zf.writestr("root/file", "ok\n")
+    else:
+        path = tmpdir.join("archive.pack").strpath
+        with PackWriter(path) as pack:
+            pack.add_link("root/evil", outside.strpath)
+            pack.add_link("root/up", "../../outside")
+            pack.add("root/file", b"ok\n")
+
+    with extract(path, members=members, extract_dir=tmpdir.mkdir("extract").strpath) as ex:
+        root = os.path.realpath(ex.tmp_dir)
+        for dirpath, dirs, files in os.walk(ex.tmp_dir):
+            for name in dirs + files:
+                full = os.path.join(dirpath, name)
+                real = os.path.realpath(full)
+                assert real == root or real.startswith(root + os.sep), full
+        with open(os.path.join(ex.tmp_dir, "root/file")) as f:
+            assert f.read() == "ok\n"
+    assert outside.listdir() == [outside.join("secret")]
+    assert not tmpdir.join("pwned").exists()
+    assert not tmpdir.join("extract", "pwned").exists()
+
+
+def test_archive_index_cache_and_realpath(tmpdir):
+    src = _make_tree(tmpdir)
+    path = tmpdir.join("archive.tar.gz").strpath
+    with tarfile.open(path, "w:gz") as tf:
+        tf.add(os.path.join(src, "insights-host"), arcname="insights-host")
+
+    with open_archive(path, cache_size=30) as index:
+        assert index._cached_bytes <= 30
+        hosts = os.path.join(index.root, "insights-host/etc/hosts")
+        uname = os.path.join(index.root, "insights-host/insights_commands/uname_-a")
+        assert index.read(hosts) == b"127.0.0.1 localhost\n"
+        assert index.read(uname) == b"Linux host 3.10.0\n"
+        assert list(index._cache) == ["insights-host/insights_commands/uname_-a"]
+
+        real = index.realpath(os.path.join(index.root, "insights-host/etc"))
+        assert sorted(os.listdir(real)) == [".hidden", "hosts", "yum.repos.d"]
+        with open(index.realpath(hosts)) as f:
+            assert f.read() == "127.0.0.1 localhost\n"
+        tmp_dir = index.tmp_dir
+
+    assert not os.path.exists(tmp_dir)
+
+
+def test_archive_index_specs(tmpdir):
+    src = _make_tree(tmpdir)
+    path = tmpdir.join("archive.tar.gz").strpath
+    with tarfile.open(path, "w:gz") as tf:
+        tf.add(os.path.join(src, "insights-host"), arcname="insights-host")
+
+    hosts = simple_file("/etc/hosts", context=HostArchiveContext)
+    uname = simple_file("/etc/uname", context=HostArchiveContext)
+    repos = glob_file("/etc/yum.repos.d/*.repo", context=HostArchiveContext)
+    repo = first_file(["/etc/missing.repo", "/etc/repos/b.repo"], context=HostArchiveContext)
+    raw = simple_file("/etc/hosts", context=HostArchiveContext, kind=RawFileProvider)
+    etc = listdir("/etc", context=HostArchiveContext)
+
+    with open_archive(path) as index:
+        ctx = create_context(index)
+        assert isinstance(ctx, HostArchiveContext)
+        assert ctx.index is index
+        assert ctx.root == os.path.join(index.root, "insights-host")
+
+        broker = dr.Broker()
+        broker[HostArchiveContext] = ctx
+        assert hosts(broker).content == ["127.0.0.1 localhost"]
+        assert uname(broker).content == ["Linux host 3.10.0"]
+        assert [r.content for r in repos(broker)] == [["[a]"], ["[b]"]]
+        assert repo(broker).relative_path == "etc/repos/b.repo"
+        assert raw(broker).content == b"127.0.0.1 localhost\n"
+        assert etc(broker) == [".hidden", "hosts", "passwd", "repos", "uname", "yum.repos.d"]
+
+        dst = tmpdir.join("out", "hosts").strpath
+        raw(broker).write(dst)
+        with open(dst, "rb") as f:
+            assert f.read() == b"127.0.0.1 localhost\n"
+        assert index.tmp_dir is None
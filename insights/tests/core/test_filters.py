@@ -246,3 +246,98 @@ def test_get_filters():
 
     assert filters.get_filters(None) == set()
     assert filters.get_filters(None, True) == dict()
+
+
+def _brute_filter(lines, allowlist):
+    # the line by line algorithm the FilterMatcher must stay equivalent to
+    allowlist = dict(allowlist)
+    result = []
+    for line in reversed(lines):
+        for key in list(allowlist):
+            if key in line:
+                allowlist[key] -= 1
+                allowlist.pop(key) if allowlist[key] == 0 else None
+                result.append(line)
+                break
+    result.reverse()
+    return result
+
+
+MATCHER_LINES = [
+    "she sells sea shells",
+    "hers and his",
+    "ushers",
+    "nothing here",
+    "",
+    "he",
+    "shells by the sea shore",
+    "his hers she he",
+]
+MATCHER_FILTERS = {"he": 2, "she": 1, "his": 3, "hers": 2, "shore": 1, "zzz": 1}
+
+
+@pytest.mark.parametrize("threshold", [1, 1000])
+def test_filter_matcher(threshold, monkeypatch):
+    monkeypatch.setattr(filters, "AUTOMATON_THRESHOLD", threshold)
+    matcher = filters.FilterMatcher(MATCHER_FILTERS)
+    assert (matcher._goto is not None) is (threshold == 1)
+
+    for line in MATCHER_LINES:
+        expected = set(k for k in MATCHER_FILTERS if k in line)
+        assert matcher.matches(line) == expected
+        assert matcher.search(line) is bool(expected)
+
+    assert matcher.first_match("ushers", MATCHER_FILTERS) == "he"
+    assert matcher.first_match("ushers", {"hers": 1, "she": 1}) == "hers"
+    assert matcher.first_match("ushers", {"his": 1}) is None
+    assert matcher.first_match("nothing", MATCHER_FILTERS) is None
+
+    assert matcher.filter(MATCHER_LINES, MATCHER_FILTERS) == _brute_filter(
+        MATCHER_LINES, MATCHER_FILTERS
+    )
+    allowlist = {"he": 1, "his": 1}
+    assert matcher.filter(MATCHER_LINES, allowlist) == ["hers and his", "his hers she he"]
+    assert allowlist == {"he": 1, "his": 1}
+
+
+@pytest.mark.parametrize("threshold", [1, 10000])
+def test_filter_matcher_grep(threshold, monkeypatch):
+    monkeypatch.setattr(filters, "AUTOMATON_THRESHOLD", threshold)
+    matcher = filters.FilterMatcher(MATCHER_FILTERS)
+    text = "\n".join(MATCHER_LINES) + "\r\nsea\n"
+    lines = text.splitlines(True)
+    expected = [l for l in lines if any(k in l for k in MATCHER_FILTERS)]
+    assert matcher.grep(text) == expected
+    # the last line may not end with a line break
+    assert matcher.grep(text.rstrip()) == expected
+    assert matcher.grep("nothing\nat all") == []
+    assert matcher.grep("") == []
+
+
+def test_filter_matcher_many_filters():
+    patterns = dict(("key%d" % i, i % 3 + 1) for i in range(filters.AUTOMATON_THRESHOLD * 2))
+    matcher = filters.FilterMatcher(patterns)
+    assert matcher._goto is not None
+
+    lines = ["line %d has key%d and key%d" % (i, i * 7 % 250, i) for i in range(500)]
+    assert matcher.filter(lines, patterns) == _brute_filter(lines, patterns)
+    assert matcher.matches(lines[3]) == set(["key21", "key2", "key3"])
+
+
+def test_get_matcher():
+    assert filters.get_matcher(Specs.ps_aux) is None
+
+    filters.add_filter(Specs.ps_aux, "COMMAND")
+    matcher = filters.get_matcher(Specs.ps_aux)
+    assert matcher.patterns == ("COMMAND",)
+    assert filters.get_matcher(Specs.ps_aux) is matcher
+
+    filters.add_filter(Specs.ps_aux, "PID")
+    new_matcher = filters.get_matcher(Specs.ps_aux)
+    assert new_matcher is not matcher
+    assert set(new_matcher.patterns) == set(["COMMAND", "PID"])
+
+    assert list(filters.apply_filters(Specs.ps_aux, ["PID", "USER", "COMMAND"])) == [
+        "PID",
+        "COMMAND",
+    ]
@@ -12,8 +12,11 @@ from insights.core.context import (
     SerializedArchiveContext,
     SosArchiveContext,
 )
+from insights.core import dr
 from insights.core.exceptions import InvalidArchive
-from insights.core.hydration import get_all_files, create_context
+from insights.core.hydration import get_all_files, create_context, initialize_broker
+from insights.parsers.redhat_release import RedhatRelease
+from insights.specs.default import DefaultSpecs
 
 
 def test_get_all_files():
@@ -305,3 +308,17 @@ def test_create_context_empty_path(caplog, tmpdir, context, message):
     """Raises an exception when the path is empty."""
     with pytest.raises(InvalidArchive, match=message):
         create_context(tmpdir, context=context)
+
+
+def test_create_context_relative_root(monkeypatch, tmpdir):
+    """The files of an archive at a relative path are found by its specs."""
+    create_file(tmpdir, join(HOST_ARCHIVE_CONTEXT_MARKER, "uname_-a"))
+    create_file(tmpdir, "etc/redhat-release", "Red Hat Enterprise Linux release 8.4 (Ootpa)")
+    monkeypatch.chdir(tmpdir)
+
+    ctx, broker = initialize_broker(".")
+    assert type(ctx) is HostArchiveContext
+    assert ctx.root == tmpdir
+    broker = dr.run(dr.get_dependency_graph(RedhatRelease), broker=broker)
+    assert broker[DefaultSpecs.redhat_release].path == join(tmpdir, "etc/redhat-release")
+    assert broker[RedhatRelease].major == 8
@@ -0,0 +1,118 @@
+import os
+
+from insights import package_info
+from insights.core import LogFileOutput, Parser, StreamParser, dr, spec_factory
+from insights.core.parser_cache import _SOURCE_DIGESTS, ParserCache, _source_digest, _source_paths
+from insights.core.plugins import parser
+from insights.core.spec_factory import RegistryPoint, SpecSet
+from insights.tests import context_wrap
+
+PARSED = []
+
+
+class Specs(SpecSet):
+    release = RegistryPoint()
+
+
+@parser(Specs.release)
+class Release(Parser):
+    def parse_content(self, content):
+        PARSED.append(content)
+        self.release = content[0]
+
+
+@parser(Specs.release)
+class StreamRelease(StreamParser):
+    def parse_content(self, content):
+        PARSED.append(content)
+        self.release = next(content)
+
+
+@parser(Specs.release)
+class ScannedRelease(LogFileOutput):
+    streaming = True
+
+
+ScannedRelease.keep_scan("rhel", "RHEL")
+
+
+def _run(cache, content, path="/etc/redhat-release"):
+    broker = dr.Broker()
+    broker.parser_cache = cache
+    broker[Specs.release] = context_wrap(content, path=path)
+    return dr.run([Release], broker=broker)[Release]
+
+
+def test_parser_cache():
+    del PARSED[:]
+    cache = ParserCache()
+    first = _run(cache, "RHEL 8.4")
+    second = _run(cache, "RHEL 8.4")
+    assert PARSED == [["RHEL 8.4"]]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second is not first
+    assert second.release == first.release == "RHEL 8.4"
+    assert second.file_path == "/etc/redhat-release"
+
+    assert _run(cache, "RHEL 9.0").release == "RHEL 9.0"
+    assert _run(cache, "RHEL 8.4", path="/etc/other-release").file_path == "/etc/other-release"
+    assert len(PARSED) == 3
+
+
+def test_parser_cache_not_cached():
+    del PARSED[:]
+    cache = ParserCache()
+    value = context_wrap("RHEL 8.4")
+    for i in range(2):
+        assert cache.parse(StreamRelease, value).release == "RHEL 8.4"
+    assert cache.key(StreamRelease, value) is None
+    assert len(PARSED) == 2
+    assert cache.misses == 0
+
+
+def test_parser_cache_streaming(tmpdir):
+    tmpdir.join("redhat-release").write("RHEL 8.4\n")
+    cache = ParserCache()
+    for i in range(2):
+        value = spec_factory.TextFileProvider("redhat-release", root=tmpdir.strpath)
+        assert cache.key(ScannedRelease, value) is None
+        assert cache.parse(ScannedRelease, value).rhel == [{"raw_message": "RHEL 8.4"}]
+        assert not value.loaded
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_parser_cache_max_bytes():
+    cache = ParserCache(max_bytes=1)
+    _run(cache, "RHEL 8.4")
+    _run(cache, "RHEL 8.4")
+    assert cache.hits == 0
+    assert cache._bytes == 0
+
+
+def test_parser_cache_path(tmpdir):
+    del PARSED[:]
+    path = tmpdir.join("cache").strpath
+    _run(ParserCache(path), "RHEL 8.4")
+    cache = ParserCache(path)
+    assert cache._bytes > 0
+    assert _run(cache, "RHEL 8.4").release == "RHEL 8.4"
+    assert cache.hits == 1
+    assert len(PARSED) == 1
+
+    # the least recently used are removed
+    cache = ParserCache(path, max_bytes=cache._bytes * 3 // 2)
+    _run(cache, "RHEL 9.0")
+    files = [f for _, _, fs in os.walk(path) for f in fs]
+    assert files == [cache.key(Release, context_wrap("RHEL 9.0", path="/etc/redhat-release"))]
+
+
+def test_parser_cache_source_digest(monkeypatch):
+    paths = _source_paths(Release)
+    assert __file__.replace(".pyc", ".py") in paths
+    # helper modules imported by the parser's module
+    assert spec_factory.__file__.replace(".pyc", ".py") in paths
+
+    digest = _source_digest(Release)
+    monkeypatch.setitem(_SOURCE_DIGESTS, Release, None)
+    monkeypatch.setitem(package_info, "RELEASE", "changed")
+    assert _source_digest(Release) != digest
@@ -0,0 +1,126 @@
+import glob
+import os
+
+import pytest
+
+from insights.core.hydration import get_all_files
+from insights.core.path_index import DirectoryIndex, PathIndex
+
+
+@pytest.fixture
+def root(tmpdir):
+    top = tmpdir.mkdir("root")
+    etc = top.mkdir("etc")
+    etc.join("hosts").write("127.0.0.1 localhost\n")
+    etc.join(".hidden").write("")
+    etc.mkdir("yum.repos.d").join("a.repo").write("[a]\n")
+    etc.join("yum.repos.d", "b.repo").write("[b]\n")
+    top.mkdir("empty")
+    os.symlink("yum.repos.d", etc.join("repos").strpath)
+    os.symlink("etc/hosts", top.join("hosts").strpath)
+    os.symlink(etc.join("hosts").strpath, top.join("abs_hosts").strpath)
+    os.symlink("missing", top.join("dangling").strpath)
+    os.symlink("loop", top.join("loop").strpath)
+    os.symlink("../outside", top.join("outside").strpath)
+    tmpdir.join("outside").write("outside\n")
+    return top.strpath
+
+
+PATHS = [
+    "",
+    "etc",
+    "etc/hosts",
+    "etc/.hidden",
+    "etc/repos",
+    "etc/repos/a.repo",
+    "etc/repos/../hosts",
+    "empty",
+    "hosts",
+    "abs_hosts",
+    "dangling",
+    "loop",
+    "missing",
+    "etc/hosts/missing",
+]
+
+PATTERNS = [
+    "*",
+    "etc/*",
+    "etc/.*",
+    "etc/*/*.repo",
+    "etc/repos/[ab].repo",
+    "*/hosts",
+    "*hosts",
+    "missing/*",
+]
+
+
+def test_directory_index(root):
+    index = DirectoryIndex(root)
+    assert sorted(index.all_files()) == sorted(get_all_files(root))
+
+    for name in PATHS:
+        path = os.path.join(root, name)
+        assert index.isfile(path) is os.path.isfile(path), name
+        assert index.isdir(path) is os.path.isdir(path), name
+        assert index.exists(path) is os.path.exists(path), name
+        if os.path.exists(path):
+            assert index.resolve(path) == os.path.realpath(path), name
+        if os.path.isdir(path):
+            assert sorted(index.listdir(path)) == sorted(os.listdir(path)), name
+
+    for pattern in PATTERNS:
+        pattern = os.path.join(root, pattern)
+        assert sorted(index.glob(pattern)) == sorted(glob.glob(pattern)), pattern
+        assert index.glob(pattern) == index.glob(pattern)
+
+
+def test_directory_index_outside(root):
+    index = DirectoryIndex(root)
+    outside = os.path.join(root, "outside")
+    # it's a file, but not under the root
+    assert os.path.isfile(outside)
+    assert not index.exists(outside)
+    assert index.resolve(outside) == os.path.realpath(outside)
+    assert not index.exists(os.path.dirname(root))
+
+    with pytest.raises(OSError):
+        index.listdir(os.path.join(root, "etc", "hosts"))
+    with pytest.raises(IOError):
+        index.getsize(os.path.join(root, "missing"))
+
+
+def test_directory_index_content(root):
+    index = DirectoryIndex(root + "/")
+    assert index.root == root
+    hosts = os.path.join(root, "hosts")
+    assert index.read(hosts) == b"127.0.0.1 localhost\n"
+    assert index.getsize(hosts) == 20
+    assert index.access(hosts)
+    assert index.realpath(hosts) == hosts
+
+
+def test_directory_index_relative(root, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(root))
+    index = DirectoryIndex("./root")
+    assert index.root == root
+    assert sorted(index.all_files()) == sorted(get_all_files(root))
+    assert index.isfile("./root/etc/hosts")
+    assert index.isfile(os.path.join(root, "etc", "hosts"))
+    assert index.read("root/hosts") == b"127.0.0.1 localhost\n"
+    assert sorted(index.glob("root/etc/*.repo")) == []
+    assert sorted(index.glob("./root/etc/repos/*")) == sorted(glob.glob(os.path.join(root, "etc/repos/*")))
+    assert not index.exists("./outside")
+
+
+def test_path_index_system_root():
+    index = PathIndex("/")
+    index._add("etc/hosts")
+    index._add("etc/localhost", link="hosts")
+    assert index.root == "/"
+    assert index.isfile("/etc/hosts")
+    assert index.isdir("/etc")
+    assert index.resolve("/etc/localhost") == "/etc/hosts"
+    assert index.listdir("/") == ["etc"]
+    assert sorted(index.glob("/etc/*")) == ["/etc/hosts", "/etc/localhost"]
+    assert not index.exists("/usr")
@@ -1,10 +1,14 @@
 import json
 import os
 
+from concurrent.futures import ThreadPoolExecutor
 from tempfile import mkdtemp
 
 from insights.core import dr
+from insights.core.archives import open_archive
+from insights.core.context import SerializedArchiveContext
 from insights.core.exceptions import ContentException
+from insights.core.hydration import create_context
 from insights.core.plugins import component, datasource, make_info, rule
 from insights.core.serde import Hydration, deserializer, marshal, serializer, unmarshal
 from insights.core.spec_factory import RegistryPoint, SpecSet
@@ -265,3 +269,61 @@ def test_dehydrate():
             assert "Fake Datasource" in tb
     finally:
         fs.remove(tmp_path)
+
+
+def test_round_trip_compact_with_pool():
+    tmp_path = mkdtemp()
+    try:
+        h = Hydration(tmp_path, compact=True)
+
+        broker = dr.Broker()
+        broker[thing] = Foo()
+        broker.exec_times[thing] = 0.5
+        h.dehydrate(thing, broker)
+        h.dehydrate(Specs.the_data, dr.run(report))
+        assert os.listdir(h.meta_root) == []
+        with open(h.meta_file) as f:
+            names = [json.loads(line)["name"] for line in f]
+        assert names == [dr.get_name(thing), dr.get_name(Specs.the_data)]
+
+        with ThreadPoolExecutor() as pool:
+            broker = Hydration(tmp_path, pool=pool).hydrate()
+        assert thing in broker
+        assert broker.exec_times[thing] >= 0.5
+        assert broker[thing].a == 1
+        assert Specs.the_data not in broker
+    finally:
+        fs.remove(tmp_path)
+
+
+def test_pack_round_trip():
+    tmp_path = mkdtemp()
+    try:
+        root = os.path.join(tmp_path, "archive")
+        h = Hydration(root)
+        broker = dr.Broker()
+        broker[thing] = Foo()
+        broker.exec_times[thing] = 0.5
+        h.dehydrate(thing, broker)
+        with open(os.path.join(root, "insights_archive.txt"), "w") as f:
+            f.write("")
+
+        path = os.path.join(tmp_path, "archive.pack")
+        h.pack(path)
+        with open_archive(path) as index:
+            ctx = create_context(index)
+            assert isinstance(ctx, SerializedArchiveContext)
+            assert sorted(index.all_files()) == [
+                os.path.join(index.root, "insights_archive.txt"), os.path.join(index.root, "meta_data.jsonl")
+            ]
+            broker = Hydration(ctx.root, ctx).hydrate()
+            assert broker[thing].a == 1
+            assert broker.exec_times[thing] >= 0.5
+
+        export = Hydration(os.path.join(tmp_path, "export"))
+        export.unpack(path)
+        assert not os.path.exists(export.meta_file)
+        assert os.listdir(export.meta_root) == [".".join([dr.get_name(thing), h.ser_name])]
+        assert export.hydrate()[thing].b == 2
+    finally:
+        fs.remove(tmp_path)
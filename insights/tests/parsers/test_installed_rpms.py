@@ -105,6 +105,15 @@ kernel-devel-3.10.0-327.el7.x86_64
 kernel-devel-3.10.0-327.36.1.el7.x86_64
 '''
 
+RPMS_MULTIPLE_ARCH = '''
+glibc-2.17-326.el7_9.x86_64
+glibc-2.17-326.el7_9.i686
+glibc-2.17-317.el7.x86_64
+glibc-2.17-317.el7.i686
+glibc-2.18-1.el7.x86_64
+glibc-1:2.16-1.el7.x86_64
+'''
+
 ERROR_DB = '''
 error: rpmdbNextIterator: skipping h#     753 Header V3 DSA signature: BAD, key ID db42a6
 yum-security-1.1.16-21.el5.noarch
@@ -318,6 +327,53 @@ def test_max_min_kernel():
     assert rpms.get_max('kernel-devel').package == 'kernel-devel-3.10.0-327.36.1.el7'
 
 
+def test_max_min_arch():
+    rpms = InstalledRpms(context_wrap(RPMS_MULTIPLE_ARCH))
+    assert rpms.get_max('glibc') is max(rpms.packages['glibc'])
+    assert rpms.get_min('glibc') is min(rpms.packages['glibc'])
+    assert rpms.get_max('glibc').nevra == 'glibc-1:2.16-1.el7.x86_64'
+    assert rpms.get_min('glibc').nevra == 'glibc-0:2.17-317.el7.x86_64'
+
+    # the index follows changes to the packages
+    rpms.packages['glibc'].append(InstalledRpm.from_package('glibc-2:1.0-1.el7.x86_64'))
+    assert rpms.get_max('glibc').epoch == '2'
+
+
+def test_get_range():
+    rpms = InstalledRpms(context_wrap(RPMS_MULTIPLE_ARCH))
+    assert rpms.get_range('abc') == []
+    assert rpms.get_range('glibc') == sorted(rpms.packages['glibc'])
+    assert [p.nvra for p in rpms.get_range('glibc', '2.17-317.el7', '2.17-326.el7_9')] == [
+        'glibc-2.17-317.el7.x86_64',
+        'glibc-2.17-317.el7.i686',
+    ]
+    assert [p.nvra for p in rpms.get_range('glibc', '2.17', '2.18')] == [
+        'glibc-2.17-317.el7.x86_64',
+        'glibc-2.17-317.el7.i686',
+        'glibc-2.17-326.el7_9.x86_64',
+        'glibc-2.17-326.el7_9.i686',
+    ]
+    assert [p.nvr for p in rpms.get_range('glibc', start='2.18')] == [
+        'glibc-2.18-1.el7',
+        'glibc-2.16-1.el7',
+    ]
+    newest = rpms.get_max('glibc')
+    assert rpms.get_range('glibc', start=newest) == [newest]
+    assert rpms.get_range('glibc', end=newest) == rpms.get_range('glibc', end='1:2.16-1.el7')
+
+
+def test_slots():
+    rpm = InstalledRpm.from_package('kernel-3.10.0-327.el7.x86_64')
+    assert vars(rpm) == {}
+    assert rpm.version_key == InstalledRpm.from_package('kernel-3.10.0-327.el7.i686').version_key
+    assert rpm.version_key < InstalledRpm.from_package('kernel-3.10.0-327.1.el7.x86_64').version_key
+
+    rpm = InstalledRpm.from_line(RPMS_LINE.splitlines()[-1])
+    assert rpm.name == 'yum'
+    assert 'installtime' in vars(rpm)
+    assert 'name' not in vars(rpm)
+
+
 def test_release_compare():
     rpm1 = InstalledRpm.from_package('kernel-rt-debug-3.10.0-327.rt56.204.el7_2.1')
     rpm2 = InstalledRpm.from_package('kernel-rt-debug-3.10.0-327.rt56.204.el7_2.2')
@@ -49,3 +49,18 @@ def test_messages():
         == "May 18 15:13:36 lxc-rhel68-sat56 wrapper[11375]: Launching a JVM..."
     )
     assert 2 == len(msg_info.get('yum'))
+
+
+class MessagesScan(messages.Messages):
+    streaming = True
+
+
+MessagesScan.keep_scan('crond', 'CROND')
+MessagesScan.token_scan('daemon_start', 'Wrapper Started as Daemon')
+
+
+def test_messages_streaming():
+    msg_info = MessagesScan(context_wrap(iter(MSGINFO.splitlines()), split=False, strip=False))
+    assert msg_info.lines == []
+    assert msg_info.daemon_start
+    assert [l['procname'] for l in msg_info.crond] == ['CROND[27921]', 'CROND[30677]']
@@ -0,0 +1,138 @@
+import os
+import pytest
+import tarfile
+import time
+
+from collections import defaultdict
+
+from insights import batch, dr, load_default_plugins, make_pass, rule
+from insights.core.context import ExecutionContext
+from insights.core.hydration import get_all_files
+from insights.core.parser_cache import ParserCache
+from insights.parsers.redhat_release import RedhatRelease
+from insights.specs import Specs
+
+REDHAT_RELEASE = "Red Hat Enterprise Linux Server release 7.3 (Maipo)"
+
+
+@rule(Specs.redhat_release)
+def release_report(rr):
+    return make_pass("RELEASE", release=rr.content[0])
+
+
+def _make_archive(tmpdir, name, release=REDHAT_RELEASE):
+    root = tmpdir / name
+    root.mkdir()
+    (root / "insights_archive.txt").write("")
+    etc = root / "etc"
+    etc.mkdir()
+    (etc / "redhat-release").write(release)
+    return root.strpath
+
+
+@pytest.fixture(autouse=True)
+def single_group():
+    # other tests reset dr.COMPONENTS, so run with a copy of the group that
+    # has the rules' graphs in it, and put the original back afterwards
+    load_default_plugins()
+    group = dr.COMPONENTS[dr.GROUPS.single]
+    copy = defaultdict(set, ((k, set(v)) for k, v in group.items()))
+    for r in (release_report, parsed_release_report):
+        copy.update(dr.get_dependency_graph(r))
+    dr.COMPONENTS[dr.GROUPS.single] = copy
+    yield
+    dr.COMPONENTS[dr.GROUPS.single] = group
+
+
+def _run(paths, **kwargs):
+    return dict(
+        (r.archive, r) for r in batch.process_archives(paths, [release_report], **kwargs)
+    )
+
+
+def test_process_archives(tmpdir):
+    paths = [_make_archive(tmpdir, "a%d" % i, REDHAT_RELEASE + str(i)) for i in range(3)]
+    results = _run(iter(paths), max_in_flight=2)
+    assert set(results) == set(paths)
+    name = "insights.tests.test_batch.release_report"
+    for i, path in enumerate(paths):
+        res = results[path]
+        assert res.ok
+        assert res.value[name]["release"] == REDHAT_RELEASE + str(i)
+
+
+def test_process_archives_error(tmpdir):
+    good = _make_archive(tmpdir, "good")
+    missing = os.path.join(tmpdir.strpath, "missing.tar.gz")
+    results = _run([good, missing])
+    assert results[good].ok
+    assert not results[missing].ok
+    assert "Traceback" in results[missing].error
+
+
+def _crash(broker):
+    os._exit(3)
+
+
+def test_process_archives_crash(tmpdir):
+    results = _run([_make_archive(tmpdir, "crash")], result_fn=_crash)
+    res = list(results.values())[0]
+    assert res.error == "Worker exited with code 3"
+
+
+def _hang(broker):
+    time.sleep(30)
+
+
+def test_process_archives_timeout(tmpdir):
+    start = time.time()
+    results = _run([_make_archive(tmpdir, "hang")], result_fn=_hang, timeout=0.5)
+    res = list(results.values())[0]
+    assert res.error.startswith("Timed out")
+    assert time.time() - start < 10
+
+
+def test_process_archives_not_extracted(tmpdir):
+    root = _make_archive(tmpdir, "packed")
+    path = os.path.join(tmpdir.strpath, "packed.tar.gz")
+    with tarfile.open(path, "w:gz") as tf:
+        tf.add(root, arcname="packed")
+
+    results = _run([path], extract_archives=False)
+    name = "insights.tests.test_batch.release_report"
+    assert results[path].ok
+    assert results[path].value[name]["release"] == REDHAT_RELEASE
+
+
+def _extracted(broker):
+    ctx = [v for k, v in broker.instances.items() if isinstance(v, ExecutionContext)][0]
+    return sorted(os.path.relpath(f, ctx.root) for f in get_all_files(ctx.root))
+
+
+def test_process_archives_filter_members(tmpdir):
+    root = _make_archive(tmpdir, "filtered")
+    (tmpdir / "filtered" / "etc" / "hosts").write("127.0.0.1 localhost\n")
+    path = os.path.join(tmpdir.strpath, "filtered.tar.gz")
+    with tarfile.open(path, "w:gz") as tf:
+        tf.add(root, arcname="filtered")
+
+    assert _run([path], result_fn=_extracted)[path].value == ["etc/hosts", "etc/redhat-release", "insights_archive.txt"]
+    results = _run([path], result_fn=_extracted, filter_members=True)
+    assert results[path].value == ["etc/redhat-release", "insights_archive.txt"]
+
+
+@rule(RedhatRelease)
+def parsed_release_report(rr):
+    return make_pass("RELEASE", release=rr.product)
+
+
+def test_process_archives_parser_cache(tmpdir):
+    paths = [_make_archive(tmpdir, "cached%d" % i) for i in range(2)]
+    cache = ParserCache(tmpdir.join("cache").strpath)
+    results = dict(
+        (r.archive, r) for r in batch.process_archives(paths, [parsed_release_report], parser_cache=cache)
+    )
+    name = "insights.tests.test_batch.parsed_release_report"
+    assert all(results[p].value[name]["release"] == "Red Hat Enterprise Linux Server" for p in paths)
+    # both archives have the same release, so it's kept once
+    assert len([f for _, _, fs in os.walk(cache.path) for f in fs]) == 1
@@ -1,8 +1,11 @@
 # -*- coding: UTF-8 -*-
+import pickle
 import pytest
 
 from datetime import datetime
+from types import SimpleNamespace
 
+from insights import core
 from insights.core import LogFileOutput
 from insights.core.exceptions import ParseException
 from insights.tests import context_wrap
@@ -321,3 +324,64 @@ def test_logs_with_milliseconds():
     log = FakeTowerLog(ctx)
     assert len(log.lines) == 4
     assert len(list(log.get_after(datetime(2020, 5, 28, 19, 25, 46, 944)))) == 3
+
+
+UNORDERED_LOG = """
+2020-05-28 19:25:36 first
+  continued
+2020-05-28 19:33:03 second
+2020-05-28 19:20:00 earlier
+  continued
+2020-05-28 19:40:00 last
+""".strip()
+
+
+class FakeUnorderedLog(LogFileOutput):
+    time_format = '%Y-%m-%d %H:%M:%S'
+
+
+def test_get_after_repeated():
+    log = FakeUnorderedLog(context_wrap(UNORDERED_LOG))
+    expected = {
+        datetime(2020, 5, 28, 19, 0): 6,
+        datetime(2020, 5, 28, 19, 25, 36): 4,
+        datetime(2020, 5, 28, 19, 30): 2,
+        datetime(2020, 5, 28, 19, 50): 0,
+    }
+    for i in range(2):
+        for timestamp, count in expected.items():
+            assert len(list(log.get_after(timestamp))) == count, timestamp
+        assert [l['raw_message'] for l in log.get_after(datetime(2020, 5, 28, 19, 30), 'continued')] == []
+        assert len(list(log.get_after(datetime(2020, 5, 28, 19, 10), 'st'))) == 2
+
+    index = log._timestamps
+    assert index.keys == [datetime(2020, 5, 28, 19, 25, 36), datetime(2020, 5, 28, 19, 33, 3)]
+    assert index.start(datetime(2020, 5, 28, 19, 30)) == 2
+    assert index.start(datetime(2020, 5, 28, 19, 50)) == 3
+
+
+def test_get_after_bad_timestamp():
+    log = FakeUnorderedLog(context_wrap(UNORDERED_LOG + "\n2020-02-30 10:00:00 bad"))
+    for i in range(2):
+        assert len(list(log.get_after(datetime(2020, 5, 28, 19, 30), 'first'))) == 0
+        with pytest.raises(ValueError):
+            list(log.get_after(datetime(2020, 5, 28, 19, 30)))
+
+
+def test_get_after_pickle():
+    log = FakeUnorderedLog(context_wrap(UNORDERED_LOG))
+    assert len(list(log.get_after(datetime(2020, 5, 28, 19, 30)))) == 2
+    copy = pickle.loads(pickle.dumps(log))
+    assert '_timestamps' not in copy.__dict__
+    assert '_timestamps' in log.__dict__
+    assert len(list(copy.get_after(datetime(2020, 5, 28, 19, 30)))) == 2
+
+
+def test_get_after_without_fromisoformat(monkeypatch):
+    class OldDatetime(object):
+        # datetime before python 3.7
+        strptime = datetime.strptime
+
+    monkeypatch.setattr(core, 'datetime', SimpleNamespace(datetime=OldDatetime))
+    parse = core._strptime_parser('%Y-%m-%d %H:%M:%S')
+    assert parse('2020-05-28 19:25:36') == datetime(2020, 5, 28, 19, 25, 36)
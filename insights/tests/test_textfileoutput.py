@@ -1,4 +1,5 @@
 # -*- coding: UTF-8 -*-
+import pickle
 import pytest
 
 from insights.core import TextFileOutput
@@ -162,3 +163,143 @@ def test_lines_2():
     ctx = context_wrap(MESSAGES_ROLLOVER_YEAR, path='/var/log/messages')
     log = FakeMessagesClass(ctx)
     assert len(log.lines) == 18
+
+
+class StreamingMessages(TextFileOutput):
+    streaming = True
+
+
+StreamingMessages.keep_scan('puppet_master_logs', ' puppet-master')
+StreamingMessages.keep_scan('last_two_pulp', 'pulp', num=2, reverse=True)
+StreamingMessages.keep_scan('first_rsyslogd', 'rsyslogd', num=1)
+StreamingMessages.token_scan('cron_present', 'CRONTAB')
+StreamingMessages.token_scan('pulp_or_cron', ['pulp', 'CRONTAB'], check=any)
+StreamingMessages.last_scan('last_imuxsock', 'imuxsock')
+StreamingMessages.last_scan('last_kernel', 'kernel')
+
+
+class KeptMessages(TextFileOutput):
+    pass
+
+
+for key, scanner in StreamingMessages.scanners.items():
+    KeptMessages.scanners[key] = scanner
+
+
+def test_streaming_scanners():
+    ctx = context_wrap(MESSAGES)
+    streamed = StreamingMessages(ctx)
+    kept = KeptMessages(ctx)
+    assert streamed.lines == []
+    assert kept.lines == ctx.content
+    for key in StreamingMessages.scanners:
+        assert getattr(streamed, key) == getattr(kept, key), key
+    assert len(streamed.puppet_master_logs) == 6
+    assert len(streamed.last_two_pulp) == 2
+    assert streamed.last_two_pulp[-1]['raw_line'].startswith('Mar 27 03:49:10 system pulp')
+    assert streamed.cron_present is False
+    assert streamed.pulp_or_cron is True
+    assert streamed.last_kernel == {}
+
+
+def test_streaming_with_scan_keeps_lines():
+    class Mixed(TextFileOutput):
+        streaming = True
+
+    Mixed.token_scan('has_pulp', 'pulp')
+    Mixed.scan('line_count', lambda self: len(self.lines))
+    mixed = Mixed(context_wrap(MESSAGES))
+    assert mixed.has_pulp is True
+    assert mixed.line_count == len(mixed.lines) > 0
+
+
+class IndexedMessages(TextFileOutput):
+    search_index = True
+
+
+for key, scanner in StreamingMessages.scanners.items():
+    IndexedMessages.scanners[key] = scanner
+
+
+def test_search_index():
+    ctx = context_wrap(MESSAGES)
+    indexed = IndexedMessages(ctx)
+    kept = KeptMessages(ctx)
+    for key in StreamingMessages.scanners:
+        assert getattr(indexed, key) == getattr(kept, key), key
+    assert indexed._line_index().nbytes > 0
+
+    searches = ['pulp', 'rate-limiting', 'Mar 27', ' 03:18:2', 'CRONTAB', 'n', ['pulp', 'ERROR'],
+                ['imuxsock', 'lost', '145'], ['kernel', 'pulp'], ['puppet', 'nothing']]
+    for s in searches:
+        assert (s in indexed) == (s in kept)
+        for check in (all, any):
+            for num in (None, -1, 0, 1, 3, 100):
+                for reverse in (False, True):
+                    expected = kept.get(s, check=check, num=num, reverse=reverse)
+                    assert indexed.get(s, check=check, num=num, reverse=reverse) == expected
+
+    # searches the index can't answer fall back to the lines
+    assert indexed.get('') == kept.get('')
+    assert indexed.get(['pulp', ''], check=any) == kept.get(['pulp', ''], check=any)
+    with pytest.raises(TypeError):
+        indexed.get([1])
+
+    # the index follows the lines
+    indexed.lines = indexed.lines[:2]
+    assert indexed.get('rsyslogd') == kept.get('rsyslogd')[:2]
+    indexed.lines.append('a\nCRONTAB')
+    assert indexed._line_index() is None
+    assert 'CRONTAB' in indexed
+
+
+def test_search_index_pickle():
+    indexed = IndexedMessages(context_wrap(MESSAGES))
+    copied = pickle.loads(pickle.dumps(indexed))
+    assert '_search_index' in indexed.__dict__
+    assert '_search_index' not in copied.__dict__
+    assert copied.get('imuxsock') == indexed.get('imuxsock')
+
+
+def test_scanners_share_index():
+    class Scanned(TextFileOutput):
+        pass
+
+    for key, scanner in StreamingMessages.scanners.items():
+        Scanned.scanners[key] = scanner
+    Scanned.keep_scan('pulp_errors', ['ERROR', 'pulp'])
+    Scanned.keep_scan('first_two_drops', ['drop', 'imuxsock'], num=2)
+    Scanned.last_scan('last_lost', ['lost', 'imuxsock'])
+    Scanned.token_scan('file_or_cron', ['File', 'CRONTAB'], check=any)
+    Scanned.scan('scanned_lines', lambda self: len(self.lines))
+
+    class Plain(TextFileOutput):
+        pass
+
+    ctx = context_wrap(MESSAGES)
+    scanned, plain = Scanned(ctx), Plain(ctx)
+    for key, scanner in Scanned.scanners.items():
+        scanner(plain)
+        assert getattr(scanned, key) == getattr(plain, key), key
+    assert len(scanned.first_two_drops) == 2
+    assert scanned.last_lost['raw_line'].startswith('Mar 27 03:39:46')
+    assert '_search_index' not in scanned.__dict__
+
+    # a parser that changes get is still scanned with it
+    class ChangedGet(Scanned):
+        def get(self, s, check=all, num=None, reverse=False):
+            return ['changed']
+
+    for key, scanner in Scanned.scanners.items():
+        ChangedGet.scanners[key] = scanner
+    changed = ChangedGet(ctx)
+    assert changed.pulp_errors == ['changed']
+    assert changed.file_or_cron is True
+
+    class BadNum(TextFileOutput):
+        pass
+
+    BadNum.keep_scan('pulp', 'pulp')
+    BadNum.keep_scan('bad', 'pulp', num='1')
+    with pytest.raises(TypeError):
+        BadNum(ctx)
@@ -0,0 +1,82 @@
+"""
+Compares the speed of evaluating the scanners of a parser together with
+evaluating them one after another.  Run with ``TEST_BENCHMARKS=True pytest -s``
+to see the timings.
+"""
+import random
+import timeit
+
+import pytest
+
+from insights.parsers.journalctl import JournalAll
+from insights.parsers.messages import Messages
+from insights.tests import context_wrap
+from insights.tests.helpers import getenv_bool
+
+TEST_BENCHMARKS = getenv_bool("TEST_BENCHMARKS", False)
+
+pytestmark = pytest.mark.skipif(
+    not TEST_BENCHMARKS, reason="Use TEST_BENCHMARKS=True to run the benchmarks"
+)
+
+PROCS = ["kernel", "systemd[1]", "sshd[2211]", "crond[871]", "NetworkManager[912]", "rsyslogd[1020]"]
+MESSAGES = ["Started Session 12 of user root.", "Removed slice User Slice of root.", "link is up"]
+ERRORS = ["error: connection reset", "failed to start unit", "blk_update_request: I/O error"]
+
+
+def _content(count):
+    rand = random.Random(0)
+    return "\n".join(
+        "Mar 27 %02d:%02d:%02d host %s: %s" % (
+            i // 3600 % 24, i // 60 % 60, i % 60, rand.choice(PROCS),
+            rand.choice(ERRORS if rand.random() < 0.01 else MESSAGES)
+        )
+        for i in range(count)
+    )
+
+
+def _scanners(cls):
+    cls.token_scan("oom", "Out of memory")
+    cls.token_scan("sshd_errors", ["sshd", "error"])
+    cls.token_scan("segfaults", ["segfault", "general protection"], check=any)
+    cls.keep_scan("failed", "failed to start")
+    cls.keep_scan("kernel", "kernel:", num=10, reverse=True)
+    cls.keep_scan("io_errors", ["I/O error", "blk_update_request"], check=any)
+    cls.keep_scan("nm_errors", ["NetworkManager", "error"])
+    cls.last_scan("last_session", "Started Session")
+    cls.last_scan("last_crond", ["crond", "error"])
+    cls.last_scan("last_panic", "Kernel panic")
+    return cls
+
+
+def _benchmark(base, name):
+    class Plain(base):
+        pass
+
+    Scanned = _scanners(type("Scanned", (base,), {}))
+    ctx = context_wrap(_content(200000))
+
+    def old():
+        plain = Plain(ctx)
+        for scanner in Scanned.scanners.values():
+            scanner(plain)
+        return plain
+
+    def new():
+        return Scanned(ctx)
+
+    expected, fused = old(), new()
+    for key in Scanned.scanners:
+        assert getattr(fused, key) == getattr(expected, key), key
+    old_time = min(timeit.repeat(old, number=1, repeat=3))
+    new_time = min(timeit.repeat(new, number=1, repeat=3))
+    print("\n%s: %.2f ms -> %.2f ms (%.1fx)" % (name, old_time * 1000, new_time * 1000, old_time / new_time))
+    assert new_time < old_time
+
+
+def test_benchmark_messages():
+    _benchmark(Messages, "10 scanners of 200000 lines of messages")
+
+
+def test_benchmark_journal():
+    _benchmark(JournalAll, "10 scanners of 200000 lines of journal")
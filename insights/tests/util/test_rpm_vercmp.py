@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import pytest
-from insights.util.rpm_vercmp import _rpm_vercmp, version_compare
+from insights.parsers.installed_rpms import InstalledRpm
+from insights.util.rpm_vercmp import _rpm_vercmp, compare_versions, evr_key, version_compare, version_key
 
 
 # data copied from
@@ -178,6 +179,21 @@ def test_rpm_vercmp(rpm_data):
         assert actual == expected, (l, r, actual, expected)
 
 
+def test_version_key(rpm_data):
+    for l, r, expected in rpm_data:
+        left, right = version_key(l), version_key(r)
+        actual = (left > right) - (left < right)
+        assert actual == expected, (l, r, actual, expected)
+    assert version_key(None) == version_key("")
+
+
+def test_evr_key():
+    assert evr_key("3.10.0-327.el7") == (version_key("0"), version_key("3.10.0"), version_key("327.el7"))
+    assert evr_key("1:3.10.0") == (version_key("1"), version_key("3.10.0"))
+    assert evr_key("3.10.0") < evr_key("3.10.0-1") < evr_key("3.10.1")
+    assert evr_key("3.10.1") < evr_key("1:3.10.0")
+
+
 def test_version_compare():
     rpm1 = 'kernel-rt-debug-3.10.0-327.rt56.204.el7_2.1'
     rpm2 = 'kernel-rt-debug-3.10.0-327.rt56.204.el7_2.2'
@@ -187,3 +203,25 @@ def test_version_compare():
     assert version_compare(rpm1, rpm2) == -1
     assert version_compare(rpm3, rpm4) == 1
     assert version_compare(rpm4, rpm5) == -1
+
+
+def test_version_key_cache():
+    version_key.cache_clear()
+    version_key("3.10.0")
+    version_key("3.10.0")
+    assert version_key.cache_info().hits == 1
+
+
+def test_compare_versions():
+    rpm = InstalledRpm.from_package('kernel-3.10.0-327.el7.x86_64')
+    assert compare_versions(rpm, '3.10.0-327.el7') == 0
+    assert compare_versions(rpm, '1:3.10.0-1.el7') == -1
+    assert compare_versions(rpm, '3.10.0') == 1
+    assert compare_versions(rpm, ['3.10.0-327.1.el7', rpm, '3.10.0-229.el7']) == [-1, 0, 1]
+
+    newer = InstalledRpm.from_package('kernel-3.10.0-514.el7.x86_64')
+    assert compare_versions([rpm, newer], '3.10.0-400.el7') == [-1, 1]
+    assert compare_versions([rpm, newer], newer) == [-1, 0]
+
+    with pytest.raises(ValueError):
+        compare_versions([rpm], [newer])
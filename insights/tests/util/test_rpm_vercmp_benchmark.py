@@ -0,0 +1,98 @@
+"""
+Compares the speed of the version keys with the pairwise comparisons they
+replaced.  Run with ``TEST_BENCHMARKS=True pytest -s`` to see the timings.
+"""
+import random
+import timeit
+
+from functools import cmp_to_key
+
+import pytest
+
+from insights.parsers.installed_rpms import InstalledRpm, InstalledRpms
+from insights.tests import context_wrap
+from insights.tests.helpers import getenv_bool
+from insights.util.rpm_vercmp import _rpm_vercmp, compare_versions, version_key
+
+TEST_BENCHMARKS = getenv_bool("TEST_BENCHMARKS", False)
+
+pytestmark = pytest.mark.skipif(
+    not TEST_BENCHMARKS, reason="Use TEST_BENCHMARKS=True to run the benchmarks"
+)
+
+
+def _old_compare(left, right):
+    for attr in ('epoch', 'version', 'release'):
+        rc = _rpm_vercmp(getattr(left, attr, ''), getattr(right, attr, ''))
+        if rc != 0:
+            return rc
+    return 0
+
+
+def _versions(count):
+    rand = random.Random(0)
+    return [
+        "%d.%d.%d-%d.el8_%d" % (
+            rand.randint(0, 5), rand.randint(0, 20), rand.randint(0, 99),
+            rand.randint(1, 500), rand.randint(0, 9)
+        )
+        for _ in range(count)
+    ]
+
+
+def _rpms(name, count):
+    return [InstalledRpm.from_package("%s-%s.x86_64" % (name, v)) for v in _versions(count)]
+
+
+def _report(name, old, new):
+    print("\n%s: %.2f ms -> %.2f ms (%.1fx)" % (name, old * 1000, new * 1000, old / new))
+    assert new < old
+
+
+def test_benchmark_version_pairs():
+    versions = _versions(200)
+    pairs = [(a, b) for a in versions[:50] for b in versions]
+
+    def old():
+        for a, b in pairs:
+            _rpm_vercmp(a, b)
+
+    def new():
+        for a, b in pairs:
+            version_key(a) < version_key(b)
+
+    new()
+    _report("10000 version pairs", min(timeit.repeat(old, number=1, repeat=3)),
+            min(timeit.repeat(new, number=1, repeat=3)))
+
+
+def test_benchmark_thresholds():
+    installed = _rpms("kernel", 1)[0]
+    thresholds = _rpms("kernel", 500)
+
+    def old():
+        return [_old_compare(installed, t) for t in thresholds]
+
+    def new():
+        return compare_versions(installed, thresholds)
+
+    assert old() == new()
+    _report("1 version against 500 thresholds", min(timeit.repeat(old, number=10, repeat=3)),
+            min(timeit.repeat(new, number=10, repeat=3)))
+
+
+def test_benchmark_max():
+    content = "\n".join(r.nvra for r in _rpms("kernel", 50))
+
+    def old():
+        rpms = InstalledRpms(context_wrap(content))
+        for _ in range(100):
+            max(rpms.packages["kernel"], key=cmp_to_key(_old_compare))
+
+    def new():
+        rpms = InstalledRpms(context_wrap(content))
+        for _ in range(100):
+            rpms.get_max("kernel")
+
+    _report("100 get_max of 50 kernels", min(timeit.repeat(old, number=1, repeat=3)),
+            min(timeit.repeat(new, number=1, repeat=3)))
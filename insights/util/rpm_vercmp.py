@@ -12,11 +12,116 @@ Handles all of the cases in the rpm test file, including the "buggy" tests
 and non-ascii characters.
 
 https://raw.githubusercontent.com/rpm-software-management/rpm/master/tests/rpmvercmp.at
+
+The `version_key` turns a version into a tuple that sorts the same way, so
+many versions can be sorted or searched without comparing them pair by pair.
+The keys of the most recently used versions are kept, since rules compare the
+same installed packages with the same fixed versions again and again, and
+`compare_versions` compares one version with many in a single call.
 """
+import re
 
 from collections import deque
+from functools import lru_cache
 from itertools import takewhile
 
+KEY_CACHE_SIZE = 65536
+""" The number of versions whose keys are kept by `version_key` and `evr_key`. """
+
+_VERSION_SEGMENTS = re.compile(r"[0-9]+|[a-zA-Z]+|~|\^")
+# A tilde sorts before the end of a version, which sorts before a caret, and
+# alpha segments sort before numeric ones.
+_TILDE, _END, _CARET, _ALPHA, _NUMERIC = range(5)
+_SEPARATORS = {"~": (_TILDE, 0), "^": (_CARET, 0)}
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def version_key(version):
+    """
+    Returns a tuple for the `version` string such that comparing the tuples
+    of two versions gives the same result as comparing the versions with
+    `_rpm_vercmp`.  ``None`` is the same as an empty version.
+    """
+    key = []
+    for seg in _VERSION_SEGMENTS.findall(version or ""):
+        if seg in _SEPARATORS:
+            key.append(_SEPARATORS[seg])
+        elif seg[0].isdigit():
+            key.append((_NUMERIC, int(seg)))
+        else:
+            key.append((_ALPHA, seg))
+    key.append((_END, 0))
+    return tuple(key)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def evr_key(evr):
+    """
+    Returns a tuple of the keys of the epoch, version and release in a
+    ``[epoch:]version[-release]`` string.  The epoch is ``0`` when it's left
+    out.  Without a release the tuple has only two keys, which sorts before
+    every release of the same version.
+    """
+    epoch, _, rest = evr.rpartition(":")
+    version, sep, release = rest.partition("-")
+    key = (version_key(epoch or "0"), version_key(version))
+    return key + (version_key(release),) if sep else key
+
+
+def rpm_version_key(rpm):
+    """
+    Returns a tuple of the keys of the epoch, version and release attributes
+    of `rpm`, such as an :class:`insights.parsers.installed_rpms.InstalledRpm`.
+    """
+    return (
+        version_key(getattr(rpm, "epoch", None)),
+        version_key(getattr(rpm, "version", None)),
+        version_key(getattr(rpm, "release", None)),
+    )
+
+
+def _key(value):
+    if isinstance(value, str):
+        return evr_key(value)
+    key = getattr(value, "version_key", None)
+    return key if key is not None else rpm_version_key(value)
+
+
+def _cmp(left, right):
+    return -1 if left < right else 1 if left > right else 0
+
+
+def compare_versions(left, right):
+    """
+    Compares versions like `rpm_version_compare` does, where each version is
+    an object with ``epoch``, ``version`` and ``release`` attributes, such as
+    an :class:`insights.parsers.installed_rpms.InstalledRpm`, or a
+    ``[epoch:]version[-release]`` string.  A version without a release is
+    lower than every release of it.
+
+    Either side can be a list of versions, then the other side is compared
+    with each of them and a list of the results is returned, so one
+    installed version is compared with many thresholds, or many installed
+    versions with one threshold, by one call.
+
+    Returns:
+        int or list: -1, 0 or 1 when `left` is lower than, equal to or higher
+        than `right`, or a list of them.
+
+    Raises:
+        ValueError: when both sides are lists.
+    """
+    left_many, right_many = isinstance(left, list), isinstance(right, list)
+    if left_many and right_many:
+        raise ValueError("Only one side of the comparison can be a list")
+    if left_many:
+        key = _key(right)
+        return [_cmp(_key(v), key) for v in left]
+    if right_many:
+        key = _key(left)
+        return [_cmp(key, _key(v)) for v in right]
+    return _cmp(_key(left), _key(right))
+
 
 def _rpm_vercmp(a, b):
     if a == b: